@@ -0,0 +1,213 @@
+# ann_index.py
+"""
+Approximate nearest-neighbour index over a hybrid track feature space.
+
+Each track is embedded as its 16 genre one-hots plus z-scored `release_year`,
+`duration_seconds`, `popularity` and the `is_explicit` flag (weights are
+configurable). The index is an IVF-Flat in pure NumPy: a k-means coarse
+quantizer splits the catalog into `n_lists` inverted lists whose vectors are
+stored contiguously; a query scans the `nprobe` closest lists only.
+
+Tuning knobs:
+- `n_lists` (build time): more lists -> shorter scans, lower recall per probe.
+  Defaults to ~2 * sqrt(N).
+- `nprobe` (query time): more probed lists -> higher recall, higher latency.
+
+The index is persisted as memory-mapped `.npy` files plus `meta.json` and is
+rebuilt when the catalog's feature matrix changes.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from catalog_store import GENRE_COLUMNS, genre_flags
+
+NUMERIC_FEATURES = ['release_year', 'duration_seconds', 'popularity']
+DEFAULT_WEIGHTS = {"genre": 1.0, "numeric": 0.5, "explicit": 0.25}
+DEFAULT_NPROBE = 8
+_ARRAYS = ("centroids", "list_offsets", "row_ids", "vectors", "vector_norms")
+
+
+def feature_stats(songs_df):
+    """
+    Mean/std of the numeric features, used to z-score catalog rows and queries.
+    """
+    values = songs_df[NUMERIC_FEATURES].to_numpy(dtype=np.float64)
+    std = values.std(axis=0)
+    std[std == 0] = 1.0
+    return {"mean": values.mean(axis=0).tolist(), "std": std.tolist()}
+
+
+def hybrid_features(songs_df, stats, weights=DEFAULT_WEIGHTS):
+    """
+    Embed every catalog row into the hybrid feature space (float32, N x 20).
+    """
+    genres = songs_df[GENRE_COLUMNS].to_numpy(dtype=np.float32)
+    numeric = (songs_df[NUMERIC_FEATURES].to_numpy(dtype=np.float64) - stats["mean"]) / stats["std"]
+    explicit = songs_df['is_explicit'].to_numpy(dtype=np.float32)[:, None]
+    return np.hstack([
+        genres * weights["genre"],
+        numeric.astype(np.float32) * weights["numeric"],
+        explicit * weights["explicit"],
+    ]).astype(np.float32)
+
+
+def song_features(song_details, stats, weights=DEFAULT_WEIGHTS):
+    """
+    Embed an identified song (api_handler dict) that may not be in the catalog.
+    Missing numeric fields fall back to the catalog mean.
+    """
+    mean = np.asarray(stats["mean"], dtype=np.float64)
+    numeric = mean.copy()
+    release_date = str(song_details.get("Release_date") or "")
+    if release_date[:4].isdigit():
+        numeric[0] = int(release_date[:4])
+    if song_details.get("Duration"):
+        numeric[1] = float(song_details["Duration"]) * 60  # Minutes to seconds
+    if song_details.get("popularity") is not None:
+        numeric[2] = float(song_details["popularity"])
+    numeric = (numeric - mean) / np.asarray(stats["std"], dtype=np.float64)
+    return np.concatenate([
+        genre_flags(song_details.get("Genre", "") or "").astype(np.float32) * weights["genre"],
+        numeric.astype(np.float32) * weights["numeric"],
+        np.float32([float(bool(song_details.get("is_explicit", False)))]) * weights["explicit"],
+    ])
+
+
+def features_fingerprint(features):
+    return hashlib.sha1(np.ascontiguousarray(features).tobytes()).hexdigest()
+
+
+def _assign(points, centroids, chunk_size=16384):
+    # argmin ||x - c||^2 = argmin (||c||^2 - 2 x.c), chunked to bound memory
+    centroid_norms = (centroids * centroids).sum(axis=1)
+    labels = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        block = points[start:start + chunk_size]
+        labels[start:start + chunk_size] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return labels
+
+
+def train_kmeans(points, n_clusters, n_iter=10, sample_size=None, seed=0):
+    """
+    Plain Lloyd's k-means on a random sample of `points`; returns centroids.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(points), sample_size or max(64 * n_clusters, 10000))
+    sample = points[rng.choice(len(points), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random sample points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+
+class AnnIndex:
+    """
+    IVF-Flat index; see the module docstring for the tuning knobs.
+    """
+
+    def __init__(self, centroids, list_offsets, row_ids, vectors, vector_norms, meta):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.row_ids = row_ids
+        self.vectors = vectors
+        self.vector_norms = vector_norms
+        self.meta = meta
+        self.nprobe = meta.get("nprobe", DEFAULT_NPROBE)
+        self._centroid_norms = (centroids * centroids).sum(axis=1)
+        self._positions = None
+
+    @classmethod
+    def build(cls, features, n_lists=None, n_iter=10, seed=0, meta=None):
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        n_lists = min(len(features), n_lists or max(1, int(2 * np.sqrt(len(features)))))
+        centroids = train_kmeans(features, n_lists, n_iter=n_iter, seed=seed)
+        labels = _assign(features, centroids)
+
+        # Store each inverted list contiguously
+        row_ids = np.argsort(labels, kind='stable')
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=n_lists))))
+        vectors = features[row_ids]
+        meta = dict(meta or {}, n_lists=n_lists, num_rows=len(features), dims=features.shape[1])
+        return cls(centroids, list_offsets, row_ids, vectors, (vectors * vectors).sum(axis=1), meta)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS]
+        return cls(*arrays, meta)
+
+    def search(self, query, k=10, nprobe=None, exclude=()):
+        """
+        Return (row_ids, squared L2 distances) of the ~k nearest catalog rows.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_dist = self._centroid_norms - 2 * (self.centroids @ query)
+        probes = np.argpartition(centroid_dist, nprobe - 1)[:nprobe] if nprobe < len(centroid_dist) \
+            else np.arange(len(centroid_dist))
+
+        candidates = np.concatenate([np.arange(self.list_offsets[p], self.list_offsets[p + 1]) for p in probes])
+        distances = self.vector_norms[candidates] - 2 * (self.vectors[candidates] @ query) + query @ query
+        rows = self.row_ids[candidates]
+        if len(exclude):
+            keep = ~np.isin(rows, np.asarray(list(exclude)))
+            rows, distances = rows[keep], distances[keep]
+
+        k = min(k, len(rows))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(distances, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(distances[top], kind='stable')]
+        return rows[top].astype(np.int64), np.maximum(distances[top], 0)
+
+    def search_row(self, row, k=10, nprobe=None):
+        """
+        Neighbours of catalog row `row` (excluding itself).
+        """
+        if self._positions is None:
+            self._positions = np.empty(len(self.row_ids), dtype=np.int64)
+            self._positions[self.row_ids] = np.arange(len(self.row_ids))
+        position = self._positions[row]
+        return self.search(self.vectors[position], k=k, nprobe=nprobe, exclude=(row,))
+
+
+def load_or_build(songs_df, path, n_lists=None, weights=DEFAULT_WEIGHTS):
+    """
+    Load the persisted index at `path` if it matches the catalog's features,
+    otherwise build and persist a new one. Feature stats and weights for
+    embedding queries are kept in `index.meta`.
+    """
+    stats = feature_stats(songs_df)
+    features = hybrid_features(songs_df, stats, weights)
+    fingerprint = features_fingerprint(features)
+    try:
+        index = AnnIndex.load(path)
+        if index.meta.get("fingerprint") == fingerprint and (n_lists is None or index.meta["n_lists"] == n_lists):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    index = AnnIndex.build(features, n_lists=n_lists,
+                           meta={"fingerprint": fingerprint, "weights": weights, "stats": stats})
+    index.save(path)
+    return index
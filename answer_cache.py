@@ -0,0 +1,210 @@
+# answer_cache.py
+"""
+Cache of Music Expert chat answers keyed on the prompt and its context.
+
+Many prompts repeat (the example questions above the chat, first questions
+of new sessions), and a cached answer is returned without calling Groq.
+The key is the normalized prompt (lowercased, punctuation and emoji
+dropped, whitespace collapsed) plus a hash of the context it is asked in:
+the model, system prompt and history window the caller sends with it. A
+first question therefore hits whoever asked it before, while a follow-up
+only hits within the same conversation state.
+
+Close paraphrases hit too: each entry stores the prompt's content words
+(stopwords and request verbs such as "suggest" or "create" removed,
+plurals folded), and a prompt in the same context whose content words
+have a Jaccard similarity of at least `min_similarity` with a cached one
+shares its answer. The threshold is strict on purpose: for short prompts
+any differing content word ("jazz" vs "classical") is a miss.
+
+Entries expire after `ttl` and the table holds at most `max_entries`
+answers, evicting the least recently used.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from response_cache import connect
+
+DEFAULT_PATH = os.path.join("data", "cache", "answers.sqlite3")
+DEFAULT_TTL = 3 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MIN_SIMILARITY = 0.85
+STOPWORDS = frozenset("""
+a about an and any are as at be best can could do does for from give good great have how i in is it its list
+make me my need of on or please recommend recommendations show some suggest suggestions tell that the
+them this to want what which with would you your create build find get
+""".split())
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    context TEXT NOT NULL,
+    terms TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_context ON answers (context);
+CREATE INDEX IF NOT EXISTS answers_accessed_at ON answers (accessed_at);
+"""
+
+
+def normalize_prompt(prompt):
+    """
+    Lowercased prompt without punctuation or emoji, whitespace collapsed.
+    """
+    return " ".join(_NON_WORD.sub(" ", prompt.lower()).split())
+
+
+def content_terms(prompt):
+    """
+    Sorted distinct content words of `prompt`, plurals folded ("songs" -> "song").
+    """
+    terms = set()
+    for word in normalize_prompt(prompt).split():
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return sorted(terms)
+
+
+def context_hash(context):
+    """
+    Hash of any JSON-serializable context (model, system prompt, history window).
+    """
+    payload = json.dumps(context, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class AnswerCache:
+    """
+    SQLite-backed chat answer cache; see the module docstring.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 min_similarity=DEFAULT_MIN_SIMILARITY):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0, "stored": 0}
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path, _SCHEMA)
+        return connection
+
+    @staticmethod
+    def _key(prompt, context):
+        return hashlib.sha1(f"{context}\0{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+    def lookup(self, prompt, context):
+        """
+        Cached answer to `prompt` asked in `context`: the exact prompt first,
+        then the closest paraphrase. Returns (answer or None, kind) with kind
+        in "hits", "near_hits", "misses".
+        """
+        now = time.time()
+        context = context_hash(context)
+        try:
+            connection = self._connection()
+            key = self._key(prompt, context)
+            row = connection.execute("SELECT key, answer FROM answers WHERE key = ? AND expires_at > ?",
+                                     (key, now)).fetchone()
+            kind = "hits"
+            if row is None:
+                terms, best = content_terms(prompt), None
+                for candidate, other, answer in connection.execute(
+                        "SELECT key, terms, answer FROM answers WHERE context = ? AND expires_at > ?",
+                        (context, now)):
+                    similarity = jaccard(terms, other.split())
+                    if similarity >= self.min_similarity and (best is None or similarity > best[0]):
+                        best = (similarity, candidate, answer)
+                row, kind = (best[1:], "near_hits") if best and terms else (None, "misses")
+            if row is not None:
+                try:
+                    connection.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (now, row[0]))
+                except sqlite3.Error:
+                    pass
+        except sqlite3.Error:
+            row, kind = None, "misses"
+        with self._lock:
+            self._stats[kind] += 1
+        return (row[1] if row else None), kind
+
+    def store(self, prompt, context, answer):
+        now = time.time()
+        context = context_hash(context)
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO answers (key, context, terms, answer, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self._key(prompt, context), context, " ".join(content_terms(prompt)), answer,
+                     now + self.ttl, now))
+                connection.execute("DELETE FROM answers WHERE expires_at <= ?", (now,))
+                connection.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            return
+        with self._lock:
+            self._stats["stored"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM answers")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    The process-wide cache at SONG_RADAR_ANSWER_CACHE (or DEFAULT_PATH).
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = AnswerCache(os.getenv("SONG_RADAR_ANSWER_CACHE", DEFAULT_PATH))
+    return _default
+
+
+def lookup(prompt, context):
+    return default_cache().lookup(prompt, context)
+
+
+def store(prompt, context, answer):
+    return default_cache().store(prompt, context, answer)
+
+
+def stats():
+    return default_cache().stats()
@@ -7,9 +7,21 @@ import os
 import base64
 import hashlib
 import hmac
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from itertools import chain, islice
 import streamlit as st
 from dotenv import load_dotenv
 
+import http_client
+from audio_processing import reduced_wav
+import recording_cache
+import lyrics_index
+import response_cache
+from resources import get_landmark_index
+from fuzzy_index import normalize_text, normalize_title, split_artists
+from lyrics_index import lyrics_key
+
 # Load environment variables
 load_dotenv()
 
@@ -20,42 +32,138 @@ MUSIXMATCH_API_KEY = os.getenv("MUSIXMATCH_API_KEY")
 ACRCLOUD_TOKEN = os.getenv("ACRCLOUD_TOKEN")
 
 # Rest of the constants
-REQ_URL = "https://identify-ap-southeast-1.acrcloud.com/v1/identify"
-METADATA_URL = "https://eu-api-v2.acrcloud.com/api/external-metadata/tracks"
-LRCLIB_BASE_URL = "https://lrclib.net/api"
+# Overridable to point at a stand-in server (benchmarks/mock_upstream.py)
+REQ_URL = os.getenv("ACRCLOUD_IDENTIFY_URL", "https://identify-ap-southeast-1.acrcloud.com/v1/identify")
+METADATA_URL = os.getenv("ACRCLOUD_METADATA_URL", "https://eu-api-v2.acrcloud.com/api/external-metadata/tracks")
+LRCLIB_BASE_URL = os.getenv("LRCLIB_BASE_URL", "https://lrclib.net/api")
+SHAZAM_SEARCH_URL = os.getenv("SHAZAM_SEARCH_URL", "https://shazam-api6.p.rapidapi.com/shazam/search_track/")
+IDENTIFY_TIMEOUT = (3.05, 20)  # Uploads a recording, so allow a longer read
+IDENTIFY_SAMPLE_RATE = int(os.getenv("IDENTIFY_SAMPLE_RATE", 8000))  # What ACRCloud fingerprints
+IDENTIFY_MAX_SECONDS = float(os.getenv("IDENTIFY_MAX_SECONDS", 12))
+LYRICS_SEARCH_STRATEGIES = ("q", "track_name")  # LRCLIB /search parameters raced per query
+LYRICS_MERGE_WAIT = 1.0  # Seconds to wait for every search before showing the ones that answered
+LRCLIB_DURATION_TOLERANCE = 2  # Seconds; LRCLIB /get only matches durations this close
+
+# Shared by every session; upstream calls are I/O bound. Work submitted here
+# must not call `st.*` (pool threads have no script context): raise instead
+# and let the session's thread report the error.
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="api")
 
 def search_by_lyrics(query):
     """
-    Search for songs using lyrics via LRCLIB API
+    Search for songs using lyrics, via the local index and the LRCLIB API
+    """
+    return list(stream_search_by_lyrics(query))
+
+def stream_search_by_lyrics(query, limit=None):
+    """
+    Yield formatted lyrics matches for `query`, best first. A strong phrase
+    match in the local lyrics index is answered on its own; otherwise the
+    LRCLIB `q=` and `track_name=` searches run concurrently and their results
+    are ranked together with the local ones. If a search is still running
+    after LYRICS_MERGE_WAIT, the finished sources are shown first, each
+    limited to its share of `limit` so the late one still gets a place.
+    Duplicates (same track, artist and duration) are dropped, and only the
+    results actually consumed (at most `limit`) are formatted.
     """
+    try:
+        for item in islice(_lyrics_matches(query, limit), limit):
+            yield format_lrclib_result(item)
+    except Exception as e:
+        st.error(f"Error searching lyrics: {e}")
+
+def _lyrics_matches(query, limit=None):
+    local, strong = lyrics_index.search(query)
+    if strong:
+        yield from local
+    else:
+        yield from _race_lyrics_searches(query, local, limit)
+
+def _rank_lyrics(query, items):
+    return sorted(items, key=lambda item: -lyrics_match_score(query, item))
+
+def _race_lyrics_searches(query, local=(), limit=None):
+    futures = [_executor.submit(_lrclib_search, strategy, query) for strategy in LYRICS_SEARCH_STRATEGIES]
+    share = -(-limit // (len(futures) + 1)) if limit else None  # Per source, the local results included
+    seen, errors = set(), []
+
+    def fresh(items):
+        new = []
+        for item in items:
+            key = lyrics_key(item)
+            if key not in seen:
+                seen.add(key)
+                new.append(item)
+        return new
+
+    def results(future):
+        try:
+            return fresh(future.result())
+        except Exception as e:
+            errors.append(e)
+            return []
+
+    try:
+        done, pending = wait(futures, timeout=LYRICS_MERGE_WAIT)
+        batches = [fresh(local)] + [results(future) for future in futures if future in done]
+        if pending and share is not None:
+            # A search is late: show each finished source's best `share` results
+            # now and hold back the rest, to be ranked with the late results
+            held = []
+            for late in chain([None], as_completed(pending)):
+                if late is not None:
+                    batches = [results(late)]
+                shown = []
+                for batch in batches:
+                    ranked = _rank_lyrics(query, batch)
+                    shown += ranked[:share]
+                    held += ranked[share:]
+                yield from _rank_lyrics(query, shown)
+            batches = [held]
+        else:
+            batches += [results(future) for future in as_completed(pending)]
+        yield from _rank_lyrics(query, [item for batch in batches for item in batch])
+    finally:
+        for future in futures:
+            future.cancel()  # Consumer stopped early: drop a search that has not started
+    if errors and not seen:
+        raise errors[0]
+
+def _lrclib_search(strategy, query):
+    # Raw LRCLIB results of one search strategy, through the response cache
+    return response_cache.fetch("lrclib.search", {"strategy": strategy, "query": query},
+                                lambda: _request_lrclib_search({strategy: query}))
+
+def _request_lrclib_search(params):
     headers = {
         'User-Agent': 'SONG-RADAR v1.0 (https://github.com/your-repo/song-radar)'
     }
-    
-    # First try searching by general query
-    try:
-        response = requests.get(f"{LRCLIB_BASE_URL}/search", 
-            headers=headers,
-            params={'q': query})
-        
-        if response.status_code == 200:
-            results = response.json()
-            return [format_lrclib_result(item) for item in results]
-            
-        # If no results, try searching by track name
-        response = requests.get(f"{LRCLIB_BASE_URL}/search", 
-            headers=headers,
-            params={'track_name': query})
-            
-        if response.status_code == 200:
-            results = response.json()
-            return [format_lrclib_result(item) for item in results]
-            
-        return []
+    response = http_client.get(f"{LRCLIB_BASE_URL}/search", endpoint="lrclib.search",
+        headers=headers,
+        params=params)
         
-    except Exception as e:
-        st.error(f"Error searching lyrics: {e}")
-        return []
+    if response.status_code == 200:
+        results = response.json()
+        lyrics_index.add(results)
+        return results
+    _raise_unless_not_found(response)
+    return []
+
+def lyrics_match_score(query, item):
+    """
+    How well an LRCLIB result matches a lyrics query: the whole phrase in the
+    lyrics beats scattered words, and words found in the title count too.
+    """
+    query = normalize_text(query)
+    words = set(query.split())
+    if not words:
+        return 0.0
+    lyrics = normalize_text(item.get("plainLyrics"))
+    title = normalize_text(item.get("trackName"))
+    score = len(words & set(lyrics.split())) / len(words) + 0.5 * len(words & set(title.split())) / len(words)
+    if query in lyrics or query == title:
+        score += 1.0
+    return score
 
 def format_lrclib_result(result):
     """
@@ -75,6 +183,17 @@ def get_lyrics_by_track(track_name, artist_name, album_name=None, duration=None)
     """
     Get lyrics for a specific track using LRCLIB API
     """
+    try:
+        return fetch_lyrics(track_name, artist_name, album_name, duration)
+    except Exception as e:
+        st.error(f"Error fetching lyrics: {e}")
+    return None
+
+def fetch_lyrics(track_name, artist_name, album_name=None, duration=None):
+    """
+    `get_lyrics_by_track` without the Streamlit error reporting: raises on
+    request failures, so it can run on the shared pool.
+    """
     headers = {
         'User-Agent': 'SONG-RADAR v1.0 (https://github.com/your-repo/song-radar)'
     }
@@ -88,21 +207,49 @@ def get_lyrics_by_track(track_name, artist_name, album_name=None, duration=None)
     if duration:
         params["duration"] = int(duration)
 
-    try:
-        response = requests.get(f"{LRCLIB_BASE_URL}/get", 
-            headers=headers, 
-            params=params)
-            
-        if response.status_code == 200:
-            return format_lrclib_result(response.json())
-    except Exception as e:
-        st.error(f"Error fetching lyrics: {e}")
+    return response_cache.fetch("lrclib.get", params, lambda: _request_lyrics(headers, params))
+
+def _request_lyrics(headers, params):
+    response = http_client.get(f"{LRCLIB_BASE_URL}/get", endpoint="lrclib.get",
+        headers=headers, 
+        params=params)
+        
+    if response.status_code == 200:
+        result = response.json()
+        lyrics_index.add([result])
+        return format_lrclib_result(result)
+    _raise_unless_not_found(response)
     return None
 
+def _raise_unless_not_found(response):
+    # Only a 404 is a real miss (cached for NEGATIVE_TTL). Throttled (429 after
+    # retries), rejected or down: raise so the cache serves a stale answer and
+    # stores nothing
+    if response.status_code != 404:
+        raise requests.HTTPError(f"{response.status_code} from {response.url}", response=response)
+
 def make_api_call(audio_file_path):
     """
     Make an API call to ACRCloud to identify the song from the audio file.
+    The local landmark index answers first; identical (or near-identical)
+    recordings reuse the cached identification.
     """
+    index = get_landmark_index()
+    if index is not None and len(index):
+        try:
+            local = index.identify(audio_file_path)
+        except (wave.Error, ValueError, EOFError):
+            local = None  # Not PCM WAV: only ACRCloud can decode it
+        if local is not None:
+            return local
+    return recording_cache.identify(audio_file_path, lambda: _identify_recording(audio_file_path),
+                                    should_store=_is_identified)
+
+def _is_identified(response_data):
+    # Cache only successful matches; "no result" may succeed on the next try
+    return response_data.get('status', {}).get('code') == 0 and bool(response_data.get('metadata', {}).get('music'))
+
+def _identify_recording(audio_file_path):
     timestamp = int(time.time())
     string_to_sign = f"POST\n/v1/identify\n{ACCESS_KEY}\naudio\n1\n{str(timestamp)}"
     sign = base64.b64encode(
@@ -113,23 +260,30 @@ def make_api_call(audio_file_path):
         ).digest()
     ).decode('ascii')
     
-    with open(audio_file_path, 'rb') as audio_file:
-        files = [('sample', ('audio.wav', audio_file, 'audio/wav'))]
-        data = {
-            'access_key': ACCESS_KEY,
-            'sample_bytes': os.path.getsize(audio_file_path),
-            'timestamp': str(timestamp),
-            'signature': sign,
-            'data_type': 'audio',
-            'signature_version': '1'
-        }
-        try:
-            response = requests.post(REQ_URL, files=files, data=data)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            st.error(f"An error occurred while identifying the song: {e}")
-            return {}
+    # Upload a reduced copy (8 kHz mono, silence trimmed, capped length) from
+    # memory; a retried upload then resends the same bytes
+    try:
+        audio_bytes = reduced_wav(audio_file_path, IDENTIFY_SAMPLE_RATE, IDENTIFY_MAX_SECONDS)
+    except (wave.Error, ValueError, EOFError):
+        with open(audio_file_path, 'rb') as audio_file:  # Not PCM WAV: send it unchanged
+            audio_bytes = audio_file.read()
+    files = [('sample', ('audio.wav', audio_bytes, 'audio/wav'))]
+    data = {
+        'access_key': ACCESS_KEY,
+        'sample_bytes': len(audio_bytes),
+        'timestamp': str(timestamp),
+        'signature': sign,
+        'data_type': 'audio',
+        'signature_version': '1'
+    }
+    try:
+        response = http_client.post(REQ_URL, endpoint="acrcloud.identify", timeout=IDENTIFY_TIMEOUT,
+                                    files=files, data=data)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        st.error(f"An error occurred while identifying the song: {e}")
+        return {}
 
 def get_song_metadata(acr_id=None, query=None):
     """
@@ -150,36 +304,45 @@ def get_song_metadata(acr_id=None, query=None):
         params['format'] = 'json'
     
     try:
-        response = requests.get(METADATA_URL, headers=headers, params=params)
-        response.raise_for_status()
-        metadata = response.json()
-        
-        if metadata.get("data") and len(metadata["data"]) > 0:
-            track_data = metadata["data"][0]
-            external_metadata = track_data.get("external_metadata", {})
-            
-            return {
-                "track_name": track_data.get("name"),
-                "artist": ", ".join([artist.get("name", "") for artist in track_data.get("artists", [])]),
-                "album": track_data.get("album", {}).get("name"),
-                "Duration": track_data.get("duration_ms", 0) / 60000,  # Convert to minutes
-                "Genre": ", ".join(track_data.get("genres", [])),
-                "Language": track_data.get("language", "N/A"),
-                "Release_date": track_data.get("release_date"),
-                "spotify_url": external_metadata.get("spotify", [{}])[0].get("link"),
-                "youtube_url": external_metadata.get("youtube", [{}])[0].get("link"),
-                "apple_music_url": external_metadata.get("applemusic", [{}])[0].get("link"),
-                "preview_url": external_metadata.get("spotify", [{}])[0].get("preview"),
-                "album_art_url": track_data.get("album", {}).get("cover"),
-                "similar_songs": []
-            }
+        key = {"acr_id": acr_id} if acr_id else {"track": (query or {}).get("title"), "artist": (query or {}).get("artist")}
+        return response_cache.fetch("acrcloud.metadata", key, lambda: _fetch_song_metadata(headers, params))
     except Exception as e:
         st.error(f"Error fetching metadata: {e}")
         return {}
 
+def _fetch_song_metadata(headers, params):
+    response = http_client.get(METADATA_URL, endpoint="acrcloud.metadata", headers=headers, params=params)
+    response.raise_for_status()
+    metadata = response.json()
+    
+    if metadata.get("data") and len(metadata["data"]) > 0:
+        track_data = metadata["data"][0]
+        external_metadata = track_data.get("external_metadata", {})
+        
+        return {
+            "track_name": track_data.get("name"),
+            "artist": ", ".join([artist.get("name", "") for artist in track_data.get("artists", [])]),
+            "album": track_data.get("album", {}).get("name"),
+            "Duration": track_data.get("duration_ms", 0) / 60000,  # Convert to minutes
+            "Genre": ", ".join(track_data.get("genres", [])),
+            "Language": track_data.get("language", "N/A"),
+            "Release_date": track_data.get("release_date"),
+            "spotify_url": external_metadata.get("spotify", [{}])[0].get("link"),
+            "youtube_url": external_metadata.get("youtube", [{}])[0].get("link"),
+            "apple_music_url": external_metadata.get("applemusic", [{}])[0].get("link"),
+            "preview_url": external_metadata.get("spotify", [{}])[0].get("preview"),
+            "album_art_url": track_data.get("album", {}).get("cover"),
+            "similar_songs": []
+        }
+
 def identify_song(audio_file_path):
     """
-    Identify song and then search by name for additional details
+    Identify song and then search by name for additional details.
+
+    The lyrics lookup starts as soon as ACRCloud returns title and artist and
+    runs alongside the metadata search; it is repeated with the metadata's
+    name, artist, album and duration if it found nothing or failed, or if
+    the metadata describes another recording.
     """
     response_data = make_api_call(audio_file_path)
     if 'metadata' in response_data and 'music' in response_data['metadata'] and len(response_data['metadata']['music']) > 0:
@@ -187,20 +350,34 @@ def identify_song(audio_file_path):
         
         # Get song name from initial identification
         song_name = music_info.get('title', '')
+        artists = [artist.get('name', '') for artist in music_info.get('artists', [])]
+        duration = music_info.get('duration_ms', 0) / 1000 or None
+        lyrics_future = _executor.submit(fetch_lyrics, song_name, ", ".join(artists),
+                                         music_info.get('album', {}).get('name'), duration)
         
         # Search for detailed metadata using the song name
         search_results = search_song_by_name(song_name)
         
+        if not search_results and music_info.get('source') == "local":
+            # Matched offline and the metadata API is unreachable: use the reference track's own
+            search_results = [_local_metadata(music_info)]
+        
         if search_results and len(search_results) > 0:
-            # Get the first matching result
-            metadata = search_results[0]
-            # Try to get lyrics using LRCLIB
-            lyrics_data = get_lyrics_by_track(
-                metadata['track_name'],
-                metadata['artist'],
-                metadata.get('album'),
-                metadata.get('Duration') * 60  # Convert minutes to seconds
-            )
+            # Get the first matching result (a copy: search results may be shared via the cache)
+            metadata = dict(search_results[0])
+            try:
+                lyrics_data = lyrics_future.result()
+            except Exception:
+                lyrics_data = None  # Retried below, which reports its own failure
+            if not lyrics_data or not _same_recording(metadata, song_name, artists, duration):
+                # Try to get lyrics for the song the metadata describes (its album
+                # or duration may match LRCLIB where ACRCloud's did not)
+                lyrics_data = get_lyrics_by_track(
+                    metadata['track_name'],
+                    metadata['artist'],
+                    metadata.get('album'),
+                    metadata.get('Duration') * 60  # Convert minutes to seconds
+                )
             if lyrics_data:
                 metadata['lyrics'] = lyrics_data['lyrics']
                 metadata['synced_lyrics'] = lyrics_data['synced_lyrics']
@@ -209,8 +386,27 @@ def identify_song(audio_file_path):
             
     return {"error": "No song identified"}
 
+def _local_metadata(music_info):
+    return {
+        "track_name": music_info.get('title'),
+        "artist": ", ".join(artist.get('name', '') for artist in music_info.get('artists', [])),
+        "album": music_info.get('album', {}).get('name'),
+        "Duration": music_info.get('duration_ms', 0) / 60000,
+        "Genre": ", ".join(music_info.get('genres', [])),
+        "Release_date": music_info.get('release_date'),
+    }
+
+def _same_recording(metadata, title, artists, duration):
+    # Did the early lyrics lookup ask for the song the metadata describes?
+    if normalize_title(metadata.get('track_name')) != normalize_title(title):
+        return False
+    if not set(split_artists(metadata.get('artist'))) & {name for a in artists for name in split_artists(a)}:
+        return False
+    metadata_duration = (metadata.get('Duration') or 0) * 60
+    return not duration or not metadata_duration or abs(metadata_duration - duration) <= LRCLIB_DURATION_TOLERANCE
+
 def search_shazam_songs(query):
-    url = "https://shazam-api6.p.rapidapi.com/shazam/search_track/"
+    url = SHAZAM_SEARCH_URL
     headers = {
         "x-rapidapi-key": "78511c49b3msh2f58007da81da20p16ab40jsn70bc07dee00c",
         "x-rapidapi-host": "shazam-api6.p.rapidapi.com"
@@ -220,7 +416,7 @@ def search_shazam_songs(query):
         "limit": "10"
     }
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, endpoint="shazam.search", headers=headers, params=params)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -242,26 +438,31 @@ def search_song_by_name(song_name):
     }
     
     try:
-        response = requests.get(METADATA_URL, headers=headers, params=params)
-        response.raise_for_status()
-        results = response.json()
-        
-        if results.get("data"):
-            return [{
-                "track_name": track.get("name"),
-                "artist": ", ".join([artist.get("name", "") for artist in track.get("artists", [])]),
-                "album": track.get("album", {}).get("name"),
-                "Duration": track.get("duration_ms", 0) / 60000,
-                "Genre": ", ".join(track.get("genres", [])),
-                "Release_date": track.get("release_date"),
-                "spotify_url": track.get("external_metadata", {}).get("spotify", [{}])[0].get("link"),
-                "youtube_url": track.get("external_metadata", {}).get("youtube", [{}])[0].get("link"),
-                "apple_music_url": track.get("external_metadata", {}).get("applemusic", [{}])[0].get("link"),
-                "preview_url": track.get("external_metadata", {}).get("spotify", [{}])[0].get("preview"),
-                "album_art_url": track.get("album", {}).get("cover") or 
-                                track.get("album", {}).get("covers", {}).get("large") or 
-                                track.get("album", {}).get("covers", {}).get("medium")
-            } for track in results["data"]]
+        return response_cache.fetch("acrcloud.search", {"track": song_name},
+                                    lambda: _search_song_by_name(headers, params))
     except Exception as e:
         st.error(f"Error searching songs: {e}")
         return []
+
+def _search_song_by_name(headers, params):
+    response = http_client.get(METADATA_URL, endpoint="acrcloud.metadata", headers=headers, params=params)
+    response.raise_for_status()
+    results = response.json()
+    
+    if results.get("data"):
+        return [{
+            "track_name": track.get("name"),
+            "artist": ", ".join([artist.get("name", "") for artist in track.get("artists", [])]),
+            "album": track.get("album", {}).get("name"),
+            "Duration": track.get("duration_ms", 0) / 60000,
+            "Genre": ", ".join(track.get("genres", [])),
+            "Release_date": track.get("release_date"),
+            "spotify_url": track.get("external_metadata", {}).get("spotify", [{}])[0].get("link"),
+            "youtube_url": track.get("external_metadata", {}).get("youtube", [{}])[0].get("link"),
+            "apple_music_url": track.get("external_metadata", {}).get("applemusic", [{}])[0].get("link"),
+            "preview_url": track.get("external_metadata", {}).get("spotify", [{}])[0].get("preview"),
+            "album_art_url": track.get("album", {}).get("cover") or 
+                            track.get("album", {}).get("covers", {}).get("large") or 
+                            track.get("album", {}).get("covers", {}).get("medium")
+        } for track in results["data"]]
+    return []
@@ -0,0 +1,99 @@
+# audio_processing.py
+"""
+PCM decoding and the size reduction applied to recordings before upload.
+
+The recorder captures 44.1 kHz WAV (stereo in practice), while ACRCloud's
+fingerprinting works on 8 kHz mono audio and needs no more than ~10-12
+seconds. `reduce_recording` downmixes, trims leading and trailing silence,
+caps the clip at `max_seconds` and resamples with a polyphase anti-aliasing
+filter; `wav_bytes` encodes the result as 16-bit PCM WAV in memory.
+"""
+
+import io
+import math
+import wave
+
+import numpy as np
+
+TARGET_RATE = 8000
+MAX_SECONDS = 12.0
+SILENCE_DB = -40.0  # Frames this far below the loudest frame count as silence
+_FRAME_SECONDS = 0.02
+_PAD_SECONDS = 0.1
+
+
+def read_pcm(path):
+    """
+    Decode a PCM WAV file to (mono float32 samples in [-1, 1], sample rate).
+    """
+    with wave.open(path, 'rb') as wav:
+        rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+    else:
+        raise ValueError(f"Unsupported sample width: {width} bytes")
+    return samples.reshape(-1, channels).mean(axis=1), rate
+
+
+def trim_silence(samples, rate, silence_db=SILENCE_DB):
+    """
+    Drop leading and trailing frames quieter than `silence_db` relative to
+    the loudest frame (keeping a short pad). All-silent clips are returned as is.
+    """
+    frame = max(1, int(rate * _FRAME_SECONDS))
+    num_frames = len(samples) // frame
+    if num_frames == 0:
+        return samples
+    rms = np.sqrt((samples[:num_frames * frame].reshape(num_frames, frame) ** 2).mean(axis=1))
+    peak = rms.max()
+    if peak == 0:
+        return samples
+    loud = np.flatnonzero(rms >= peak * 10 ** (silence_db / 20))
+    pad = int(rate * _PAD_SECONDS)
+    start = max(0, loud[0] * frame - pad)
+    stop = min(len(samples), (loud[-1] + 1) * frame + pad)
+    return samples[start:stop]
+
+
+def reduce_recording(samples, rate, target_rate=TARGET_RATE, max_seconds=MAX_SECONDS, silence_db=SILENCE_DB):
+    """
+    Trimmed, capped and resampled mono copy of `samples` (float32); pass
+    None to skip a step. Returns (samples, rate).
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if silence_db is not None:
+        samples = trim_silence(samples, rate, silence_db)
+    if max_seconds:
+        samples = samples[:int(rate * max_seconds)]
+    if target_rate and target_rate < rate:
+        from scipy.signal import resample_poly  # ~1 s to import; keep it off the app's startup path
+        divisor = math.gcd(int(rate), int(target_rate))
+        samples = resample_poly(samples, target_rate // divisor, rate // divisor).astype(np.float32)
+        rate = target_rate
+    return samples, rate
+
+
+def wav_bytes(samples, rate):
+    """
+    Encode mono float samples as a 16-bit PCM WAV file in memory.
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def reduced_wav(path, target_rate=TARGET_RATE, max_seconds=MAX_SECONDS):
+    """
+    Read a WAV recording and return the reduced upload as WAV bytes.
+    """
+    samples, rate = read_pcm(path)
+    return wav_bytes(*reduce_recording(samples, rate, target_rate, max_seconds))
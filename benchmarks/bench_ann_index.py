@@ -0,0 +1,68 @@
+# benchmarks/bench_ann_index.py
+"""
+IVF index over hybrid track features: build time, recall@k and latency per nprobe.
+
+Uses synthetic catalogs shaped like the hybrid feature space (16 genre
+one-hots + 3 z-scored numerics + explicit flag). Run from the repository root:
+    python benchmarks/bench_ann_index.py
+    python benchmarks/bench_ann_index.py --rows 1000000 --nprobe 1 4 8 16 32
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import DEFAULT_WEIGHTS, AnnIndex  # noqa: E402
+
+
+def synthetic_features(num_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    genres = (rng.random((num_rows, 16)) < 0.12).astype(np.float32) * DEFAULT_WEIGHTS["genre"]
+    numeric = rng.standard_normal((num_rows, 3)).astype(np.float32) * DEFAULT_WEIGHTS["numeric"]
+    explicit = (rng.random((num_rows, 1)) < 0.2).astype(np.float32) * DEFAULT_WEIGHTS["explicit"]
+    return np.hstack([genres, numeric, explicit])
+
+
+def exact_neighbours(features, query, k):
+    distances = ((features - query) ** 2).sum(axis=1)
+    return set(np.argpartition(distances, k)[:k + 1].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[7282, 100_000, 1_000_000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        features = synthetic_features(num_rows)
+        start = time.perf_counter()
+        index = AnnIndex.build(features)
+        build = time.perf_counter() - start
+        print(f"\n{num_rows} rows, {index.meta['n_lists']} lists, built in {build:.1f}s")
+
+        query_rows = np.random.default_rng(1).integers(0, num_rows, args.queries)
+        truth = [exact_neighbours(features, features[row], args.k) - {int(row)} for row in query_rows]
+
+        print(f"{'nprobe':>7} {'recall@k':>9} {'p50':>9} {'p99':>9}")
+        for nprobe in args.nprobe:
+            latencies, hits = [], 0
+            for row, expected in zip(query_rows, truth):
+                start = time.perf_counter()
+                found, _ = index.search_row(int(row), k=args.k, nprobe=nprobe)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected.intersection(found.tolist()))
+            recall = hits / sum(len(expected) for expected in truth)
+            print(f"{nprobe:>7} {recall:>9.3f} {np.percentile(latencies, 50) * 1e3:>7.3f}ms "
+                  f"{np.percentile(latencies, 99) * 1e3:>7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
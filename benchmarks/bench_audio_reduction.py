@@ -0,0 +1,45 @@
+# benchmarks/bench_audio_reduction.py
+"""
+Identify upload size before/after audio reduction, and the transfer time it
+implies on slow uplinks.
+
+Run from the repository root:
+    python benchmarks/bench_audio_reduction.py
+    python benchmarks/bench_audio_reduction.py my_recording.wav --rate 8000 --max-seconds 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_processing import MAX_SECONDS, TARGET_RATE, reduced_wav  # noqa: E402
+
+UPLINKS_MBIT = (0.5, 2, 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=[os.path.join(ROOT, "song.wav"), os.path.join(ROOT, "test.wav")])
+    parser.add_argument("--rate", type=int, default=TARGET_RATE)
+    parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS)
+    args = parser.parse_args()
+
+    header = " ".join(f"{f'@{mbit} Mbit/s':>16}" for mbit in UPLINKS_MBIT)
+    print(f"{'file':<12} {'original':>10} {'reduced':>10} {'ratio':>7} {'reduce':>8} {header}")
+    for path in args.paths:
+        original = os.path.getsize(path)
+        start = time.perf_counter()
+        reduced = len(reduced_wav(path, args.rate, args.max_seconds))
+        elapsed = time.perf_counter() - start
+        transfers = " ".join(f"{original * 8 / (mbit * 1e6):>6.2f}s -> {reduced * 8 / (mbit * 1e6):>5.2f}s"
+                             for mbit in UPLINKS_MBIT)
+        print(f"{os.path.basename(path):<12} {original / 1024:>8.0f}KB {reduced / 1024:>8.0f}KB "
+              f"{original / reduced:>6.1f}x {elapsed * 1e3:>6.1f}ms {transfers}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_catalog_load.py
+"""
+Catalog cold start: CSV + ast.literal_eval vs. the compiled columnar cache.
+
+Run from the repository root:
+    python benchmarks/bench_catalog_load.py
+    python benchmarks/bench_catalog_load.py data/local/spotify_million_tracks.csv
+"""
+
+import ast
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import catalog_store  # noqa: E402
+
+
+def load_csv(csv_path):
+    df = pd.read_csv(csv_path)
+    df['genres'] = df['genres'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else [])
+    df['genres_str'] = df['genres'].apply(lambda x: ', '.join(x) if isinstance(x, list) else '')
+    return df
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "data", "clean", "7_clustered_dataset.csv")
+    cache_dir = tempfile.mkdtemp(prefix="catalog-bench-")
+    try:
+        compile_time = timed(lambda: catalog_store.compile_catalog(csv_path, cache_dir), repeat=1)
+        csv_time = timed(lambda: load_csv(csv_path))
+        arrays_time = timed(lambda: catalog_store.load_catalog_arrays(csv_path, cache_dir))
+        frame_time = timed(lambda: catalog_store.load_catalog(csv_path, cache_dir))
+        cache_bytes = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"source:              {csv_path} ({os.path.getsize(csv_path) / 2**20:.1f} MB)")
+    print(f"compiled cache:      {cache_bytes / 2**20:.1f} MB, built in {compile_time * 1e3:.0f} ms")
+    print(f"CSV + literal_eval:  {csv_time * 1e3:8.1f} ms")
+    print(f"mmap column arrays:  {arrays_time * 1e3:8.1f} ms")
+    print(f"cache -> DataFrame:  {frame_time * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
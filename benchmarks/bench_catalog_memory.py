@@ -0,0 +1,61 @@
+# benchmarks/bench_catalog_memory.py
+"""
+Catalog memory per row: the default DataFrame vs. the compact one.
+
+Sizes are deep (string and list payloads included; Python objects shared
+between rows are counted once). Run from the repository root:
+    python benchmarks/bench_catalog_memory.py
+    python benchmarks/bench_catalog_memory.py data/local/spotify_million_tracks.csv
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import catalog_store  # noqa: E402
+
+
+def deep_bytes(series, seen):
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype != object:
+        return int(series.memory_usage(index=False, deep=True))
+    total = series.memory_usage(index=False, deep=False)
+    for value in series.tolist():
+        for obj in ([value, *value] if isinstance(value, list) else [value]):
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+    return total
+
+
+def column_bytes(songs_df):
+    seen = set()
+    return {name: deep_bytes(songs_df[name], seen) for name in songs_df.columns}
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "data", "clean", "7_clustered_dataset.csv")
+    manifest, arrays = catalog_store.load_catalog_arrays(csv_path)
+    default = column_bytes(catalog_store.catalog_to_dataframe(manifest, arrays))
+    compact_df = catalog_store.catalog_to_dataframe(manifest, arrays, compact=True)
+    compact = column_bytes(compact_df)
+    compact["genres (CSR)"] = catalog_store.GenreLists.from_arrays(arrays).nbytes
+    num_rows = manifest["num_rows"]
+
+    print(f"{'column':<18} {'default B/row':>14} {'compact B/row':>14}  compact dtype")
+    for name in dict.fromkeys([*default, *compact]):
+        dtype = str(compact_df[name].dtype) if name in compact_df else ("int32 CSR" if name in compact else "dropped")
+        print(f"{name:<18} {default.get(name, 0) / num_rows:>14.1f} {compact.get(name, 0) / num_rows:>14.1f}  {dtype}")
+
+    before, after = sum(default.values()), sum(compact.values())
+    print(f"\n{num_rows} rows: {before / num_rows:.0f} -> {after / num_rows:.0f} bytes/row "
+          f"({before / after:.1f}x smaller)")
+    print(f"projected at 1M rows: {before / num_rows * 1e6 / 2**20:.0f} MB -> {after / num_rows * 1e6 / 2**20:.0f} MB "
+          "(categorical vocabularies grow with distinct values, not rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_chat_history.py
+"""
+Prompt size of the Music Expert chat: full history vs the token-budgeted window.
+
+Replays a synthetic conversation of --turns turns (user prompts of ~30
+words, replies of ~150-500 words) through `chat_history.ChatHistory` with a
+stand-in summarizer capped at the real summary size, and prints the
+estimated prompt tokens per turn (system prompt + history + new prompt)
+with and without the window, how often the summary was recomputed, and the
+time spent building windows. Offline; no Groq calls.
+Run from the repository root:
+    python benchmarks/bench_chat_history.py
+    python benchmarks/bench_chat_history.py --turns 100 --budget 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chat_history import ChatHistory, estimate_tokens, message_tokens  # noqa: E402
+from music_llm import SUMMARY_TOKENS, SYSTEM_PROMPT  # noqa: E402
+
+WORDS = "song artist album jazz rock playlist mood tempo chorus verse melody rhythm guitar synth".split()
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS, count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=2000, help="History token budget")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    summaries = []
+
+    def summarize(summary, messages):
+        summaries.append(len(messages))
+        return words(rng, SUMMARY_TOKENS // 2)
+
+    window = ChatHistory(summarize, budget=args.budget)
+    system = estimate_tokens(SYSTEM_PROMPT)
+    history, full, windowed, seconds = [], [], [], []
+    for _ in range(args.turns):
+        prompt = {"role": "user", "content": words(rng, 30)}
+        start = time.perf_counter()
+        messages = window.window(history)
+        seconds.append(time.perf_counter() - start)
+        full.append(system + sum(map(message_tokens, history)) + message_tokens(prompt))
+        windowed.append(system + sum(map(message_tokens, messages)) + message_tokens(prompt))
+        history += [prompt, {"role": "assistant", "content": words(rng, int(rng.integers(150, 500)))}]
+
+    print(f"{args.turns} turns, history budget {args.budget} tokens (system prompt ~{system} tokens)")
+    print(f"{'turn':>6} {'full':>8} {'window':>8}")
+    for turn in sorted({0, 4, 9, 19, 49, 99, args.turns - 1} & set(range(args.turns))):
+        print(f"{turn + 1:>6} {full[turn]:>8} {windowed[turn]:>8}")
+    print(f"prompt tokens over the conversation: {sum(full)} full, {sum(windowed)} windowed "
+          f"({sum(windowed) / sum(full):.0%}); max per turn {max(full)} vs {max(windowed)}")
+    print(f"summaries: {len(summaries)} (every {args.turns / max(1, len(summaries)):.1f} turns, "
+          f"{np.mean(summaries or [0]):.1f} messages folded each); "
+          f"window build p50 {np.median(seconds) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
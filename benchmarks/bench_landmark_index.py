@@ -0,0 +1,104 @@
+# benchmarks/bench_landmark_index.py
+"""
+Landmark index build throughput, lookup latency and accuracy.
+
+References are song.wav, test.wav and synthetic "songs" (random pitch and
+duration note sequences with harmonics); queries are noisy excerpts at
+random offsets. Unseen queries are noisy synthetic clips that are not in
+the index: any match there is a false positive, which would skip ACRCloud
+and report the wrong song.
+Run from the repository root:
+    python benchmarks/bench_landmark_index.py
+    python benchmarks/bench_landmark_index.py --tracks 500 --seconds 60
+    python benchmarks/bench_landmark_index.py --tracks 200 --unseen 500 --query-seconds 20
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_processing import read_pcm, wav_bytes  # noqa: E402
+from landmark_index import LandmarkIndex  # noqa: E402
+
+RATE = 16000
+
+
+def synthetic_song(rng, seconds):
+    parts, total = [], 0
+    while total < seconds * RATE:
+        # Notes of 0.15-0.4 s anywhere in 110-880 Hz, three harmonics, decaying
+        t = np.arange(int(rng.uniform(0.15, 0.4) * RATE)) / RATE
+        freq = 110 * 2 ** rng.uniform(0, 3)
+        tone = sum(np.sin(2 * np.pi * freq * h * t) / h for h in (1, 2, 3))
+        parts.append(tone * np.exp(-3 * t))
+        total += len(t)
+    return (0.3 * np.concatenate(parts)[:int(seconds * RATE)]).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=100, help="Synthetic reference tracks")
+    parser.add_argument("--seconds", type=float, default=30, help="Length of each synthetic track")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--query-seconds", type=float, default=5)
+    parser.add_argument("--unseen", type=int, default=100, help="Queries of songs that are not indexed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp(prefix="landmarks-bench-")
+    try:
+        for name in ("song.wav", "test.wav"):
+            shutil.copy(os.path.join(ROOT, name), os.path.join(directory, f"Fixture - {name[:-4]}.wav"))
+        for i in range(args.tracks):
+            with open(os.path.join(directory, f"Synthetic - Track {i:05d}.wav"), 'wb') as f:
+                f.write(wav_bytes(synthetic_song(rng, args.seconds), RATE))
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        audio_seconds = sum(len(read_pcm(path)[0]) / read_pcm(path)[1] for path in paths)
+
+        start = time.perf_counter()
+        index = LandmarkIndex.build(paths)
+        build = time.perf_counter() - start
+        print(f"indexed {len(index)} tracks, {audio_seconds / 60:.0f} min of audio, {len(index.hashes)} hashes "
+              f"in {build:.1f}s ({audio_seconds / build:.0f}x realtime, "
+              f"{(index.hashes.nbytes + index.track_ids.nbytes + index.offsets.nbytes) / 2**20:.1f} MB)")
+
+        latencies, correct = [], 0
+        for _ in range(args.queries):
+            track_id = int(rng.integers(len(paths)))
+            samples, rate = read_pcm(paths[track_id])
+            length = int(min(args.query_seconds, len(samples) / rate - 0.5) * rate)
+            offset = int(rng.integers(0, len(samples) - length))
+            clip = samples[offset:offset + length] * 0.5 + rng.normal(0, 0.02, length).astype(np.float32)
+            start = time.perf_counter()
+            found = index.match(clip, rate)
+            latencies.append(time.perf_counter() - start)
+            correct += found is not None and found[0] == track_id
+        print(f"{args.queries} noisy {args.query_seconds:.0f}s queries: accuracy {correct / args.queries:.2%}, "
+              f"p50 {np.percentile(latencies, 50) * 1e3:.1f} ms, p99 {np.percentile(latencies, 99) * 1e3:.1f} ms, "
+              f"{args.queries / sum(latencies):.0f} queries/s")
+
+        false_positives, chance_scores = 0, []
+        for _ in range(args.unseen):
+            length = int(args.query_seconds * RATE)
+            clip = synthetic_song(rng, args.query_seconds) * 0.5 + rng.normal(0, 0.02, length).astype(np.float32)
+            found = index.match(clip, RATE)
+            false_positives += found is not None
+            best = index.match(clip, RATE, min_matches=0, min_rate=0, min_margin=0, per_doubling=0)
+            chance_scores.append(best[1] if best is not None else 0)
+        if args.unseen:
+            print(f"{args.unseen} unseen {args.query_seconds:.0f}s queries: false positives {false_positives} "
+                  f"({false_positives / args.unseen:.2%}), best chance alignment {max(chance_scores)} hashes")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_lyrics_index.py
+"""
+Lyrics index bulk-load throughput and query latency.
+
+Documents are synthetic songs: ~40 lines of 6-8 words drawn from a 20k-word
+vocabulary with Zipf's law frequencies (p ~ 1/rank, so the top word is ~10%
+of all tokens, like "the" in English), and a --common-share of them also
+contain the line "i love you baby". Queries are 4-6 word phrases cut from
+random documents, that common phrase, single common words, and word sets
+that never occur together.
+Run from the repository root:
+    python benchmarks/bench_lyrics_index.py
+    python benchmarks/bench_lyrics_index.py --docs 200000 --queries 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lyrics_index import LyricsIndex  # noqa: E402
+
+VOCABULARY = 20000
+COMMON_PHRASE = "i love you baby"
+
+
+def synthetic_lyrics(rng, words, frequencies):
+    ids = rng.choice(VOCABULARY, size=(int(rng.integers(30, 50)), 8), p=frequencies)
+    return "\n".join(" ".join(words[line[:rng.integers(6, 9)]]) for line in ids)
+
+
+def percentiles(samples):
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+    return f"p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  p99 {p99:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50000)
+    parser.add_argument("--common-share", type=float, default=0.2, help="Share of songs with the common phrase")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    words = np.array([f"w{i:x}" for i in range(VOCABULARY)])
+    frequencies = 1 / np.arange(1, VOCABULARY + 1)
+    frequencies /= frequencies.sum()
+    path = os.path.join(tempfile.mkdtemp(prefix="lyrics-bench-"), "lyrics.sqlite3")
+    index = LyricsIndex(path)
+
+    items = [{"trackName": f"Track {i}", "artistName": f"Artist {i % 5000}", "albumName": None,
+              "duration": 120 + i % 240, "plainLyrics": synthetic_lyrics(rng, words, frequencies)}
+             for i in range(args.docs)]
+    for item in items[::max(1, round(1 / args.common_share))] if args.common_share else ():
+        item["plainLyrics"] += "\n" + COMMON_PHRASE
+    documents = [item["plainLyrics"] for item in items[::max(1, args.docs // 1000)]]
+    start = time.perf_counter()
+    index.bulk_load(items, args.batch)
+    load = time.perf_counter() - start
+    del items
+    print(f"Indexed {len(index)} documents in {load:.1f}s ({len(index) / load:.0f} docs/s, optimize included), "
+          f"file {os.path.getsize(path) / 2**20:.0f} MB")
+
+    phrases = []
+    for _ in range(args.queries):
+        line = rng.choice(documents[rng.integers(len(documents))].splitlines()).split()
+        length = min(len(line), int(rng.integers(4, 7)))
+        offset = int(rng.integers(0, len(line) - length + 1))
+        phrases.append(" ".join(line[offset:offset + length]))
+    common = [words[int(i)] for i in rng.integers(0, 20, args.queries)]
+    absent = [" ".join(words[rng.integers(VOCABULARY // 2, VOCABULARY, 5)]) for _ in range(args.queries)]
+
+    for label, queries in (("phrase", phrases), ("common phrase", [COMMON_PHRASE] * args.queries),
+                           ("common word", common), ("no match", absent)):
+        timings, strong, found = [], 0, 0
+        for query in queries:
+            tick = time.perf_counter()
+            results, is_strong = index.search(query)
+            timings.append(time.perf_counter() - tick)
+            strong += is_strong
+            found += bool(results)
+        print(f"{label:<13} {percentiles(timings)}  found {found}/{len(queries)}, strong {strong}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_neighbour_table.py
+"""
+Neighbour table build time and serving latency on synthetic catalogs.
+
+Run from the repository root:
+    python benchmarks/bench_neighbour_table.py --rows 100000 1000000 --workers 8
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_store import GENRE_COLUMNS  # noqa: E402
+from neighbour_table import NeighbourTable, build_table  # noqa: E402
+
+
+def synthetic_catalog(num_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    flags = (rng.random((num_rows, len(GENRE_COLUMNS))) < 0.12).astype(np.int64)
+    songs_df = pd.DataFrame(flags, columns=GENRE_COLUMNS)
+    songs_df['popularity'] = rng.integers(0, 101, num_rows)
+    return songs_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[7282, 100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'patterns':>9} {'build':>9} {'table size':>11} {'p50 read':>10} {'p99 read':>10}")
+    for num_rows in args.rows:
+        songs_df = synthetic_catalog(num_rows)
+        path = tempfile.mkdtemp(prefix="neighbours-bench-")
+        try:
+            meta = build_table(songs_df, path, top_n=args.top, workers=args.workers)
+            table = NeighbourTable.load(path)
+            size = table.ids.nbytes + table.scores.nbytes
+            latencies = []
+            for row in np.random.default_rng(0).integers(0, num_rows, 1000):
+                start = time.perf_counter()
+                table.neighbours(int(row), k=10)
+                latencies.append(time.perf_counter() - start)
+            del table
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        print(f"{num_rows:>9} {meta['num_patterns']:>9} {meta['build_seconds']:>8.1f}s {size / 2**20:>9.1f}MB "
+              f"{np.percentile(latencies, 50) * 1e6:>8.1f}us {np.percentile(latencies, 99) * 1e6:>8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
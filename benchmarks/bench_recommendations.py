@@ -0,0 +1,100 @@
+# benchmarks/bench_recommendations.py
+"""
+Recommendation latency: full-catalog pandas scan vs. prebuilt inverted indexes.
+
+The clustered catalog is tiled to larger sizes to show how p99 latency grows.
+Run from the repository root:
+    python benchmarks/bench_recommendations.py --scales 1 10 50
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog_index import CatalogIndex  # noqa: E402
+
+CATALOG_CSV = os.path.join(ROOT, "data", "clean", "7_clustered_dataset.csv")
+
+
+def load_catalog(scale):
+    df = pd.read_csv(CATALOG_CSV)
+    df['genres'] = df['genres'].apply(ast.literal_eval)
+    df['genres_str'] = df['genres'].apply(lambda x: ', '.join(x))
+    if scale > 1:
+        df = pd.concat([df] * scale, ignore_index=True)
+        # Keep tiles distinct so de-duplication does not collapse them
+        df['track_name'] = df['track_name'] + " #" + (df.index // (len(df) // scale)).astype(str)
+    return df
+
+
+def scan_recommendations(songs_df, song_details, num_recommendations=5):
+    """
+    The original per-request implementation from main.get_recommendations.
+    """
+    artist_name = song_details.get("artist", "").strip().lower()
+    song_genres = song_details.get("Genre", "").strip()
+    track_name = song_details.get("track_name", "").strip().lower()
+    artist_songs = songs_df[songs_df['artist'].str.lower().str.strip() == artist_name]
+    if song_genres:
+        song_genres_list = [g.strip().lower() for g in song_genres.split(",")]
+        genre_songs = songs_df[songs_df['genres'].apply(lambda x: any(g in x for g in song_genres_list))]
+        recommended = pd.concat([artist_songs, genre_songs]).drop_duplicates(subset=['track_name', 'genres_str'])
+    else:
+        recommended = artist_songs
+    recommended = recommended[recommended['track_name'].str.lower().str.strip() != track_name]
+    return recommended.sort_values(by='popularity', ascending=False).head(num_recommendations)
+
+
+def sample_queries(songs_df, count, seed=0):
+    rows = songs_df.sample(count, random_state=seed)
+    return [{
+        "artist": row['artist'],
+        "track_name": row['track_name'],
+        "Genre": ", ".join(row['genres'][:2]),
+    } for _, row in rows.iterrows()]
+
+
+def percentiles(fn, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+    return np.percentile(latencies, 50) * 1e3, np.percentile(latencies, 99) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--scan-queries", type=int, default=20,
+                        help="Queries for the (slow) full-scan baseline")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} | {'index build':>11} | {'scan p50':>10} {'scan p99':>10} | "
+          f"{'index p50':>10} {'index p99':>10}")
+    for scale in args.scales:
+        songs_df = load_catalog(scale)
+        start = time.perf_counter()
+        index = CatalogIndex(songs_df)
+        build = time.perf_counter() - start
+
+        queries = sample_queries(songs_df, args.queries)
+        scan = percentiles(lambda q: scan_recommendations(songs_df, q), queries[:args.scan_queries])
+        indexed = percentiles(lambda q: songs_df.iloc[index.recommend(
+            q["artist"], [g.strip() for g in q["Genre"].split(",") if g.strip()],
+            exclude_track=q["track_name"])], queries)
+        print(f"{len(songs_df):>9} | {build:>10.2f}s | {scan[0]:>8.2f}ms {scan[1]:>8.2f}ms | "
+              f"{indexed[0]:>8.3f}ms {indexed[1]:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_shared_catalog.py
+"""
+Per-worker memory: private catalog load vs. attaching to the shared segment.
+
+Each worker process builds the app's Catalog and song resolver and reports
+the private (unshared) memory they add, from /proc/self/smaps_rollup, so
+Linux only. pandas and pyarrow are imported before measuring: every worker
+pays for them either way (~68 MB), and they would hide the catalog data.
+Run from the repository root:
+    python benchmarks/bench_shared_catalog.py --workers 4
+    python benchmarks/bench_shared_catalog.py --workers 4 --compact
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import shared_catalog  # noqa: E402
+
+SEGMENT_NAME = "song-radar-bench"
+
+
+def private_kb():
+    total = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+
+def worker(shared, compact, results):
+    os.chdir(ROOT)
+    os.environ["SONG_RADAR_COMPACT_CATALOG"] = "1" if compact else ""
+    if shared:
+        os.environ[shared_catalog.ENV_VAR] = SEGMENT_NAME
+    else:
+        os.environ.pop(shared_catalog.ENV_VAR, None)
+    import pandas  # noqa: F401
+    import pyarrow  # noqa: F401
+    import resources
+    before = private_kb()
+    catalog = resources.get_catalog()
+    catalog.similarity.top_k(0)
+    resources.get_song_resolver().best_match("Yesterday", "The Beatles")
+    results.put(private_kb() - before)
+
+
+def run_workers(count, shared, compact):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(shared, compact, results)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    deltas = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--compact", action="store_true", help="Workers load the compact catalog")
+    args = parser.parse_args()
+
+    # Publish from a separate loader process, as in a real deployment
+    publisher = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "shared_catalog.py"), "publish", "--name", SEGMENT_NAME],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        print(publisher.stdout.readline().strip())
+        private = run_workers(args.workers, False, args.compact)
+        shared = run_workers(args.workers, True, args.compact)
+    finally:
+        publisher.terminate()
+        publisher.wait()
+
+    private_mb, shared_mb = sum(private) / len(private) / 1024, sum(shared) / len(shared) / 1024
+    print(f"private load:   {private_mb:6.1f} MB private per worker")
+    print(f"shared attach:  {shared_mb:6.1f} MB private per worker ({1 - shared_mb / private_mb:.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
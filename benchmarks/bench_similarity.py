@@ -0,0 +1,90 @@
+# benchmarks/bench_similarity.py
+"""
+Compare the dense N x N cosine matrix with the on-demand top-k engine.
+
+Run from the repository root:
+    python benchmarks/bench_similarity.py
+    python benchmarks/bench_similarity.py --sizes 7282 100000 --dense-limit 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity import GenreSimilarity  # noqa: E402
+
+NUM_GENRES = 16
+
+
+def synthetic_genre_matrix(num_rows, seed=42):
+    """
+    Random sparse binary genre flags, roughly matching the catalog density.
+    """
+    rng = np.random.default_rng(seed)
+    return (rng.random((num_rows, NUM_GENRES)) < 0.12).astype(np.int64)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_dense(genre_matrix):
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    _, elapsed, peak = measure(lambda: cosine_similarity(genre_matrix))
+    return elapsed, peak
+
+
+def bench_engine(genre_matrix, queries, k):
+    engine, build_time, peak = measure(lambda: GenreSimilarity(genre_matrix))
+    rows = np.random.default_rng(0).integers(0, len(engine), size=queries)
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        engine.top_k(int(row), k=k)
+        latencies.append(time.perf_counter() - start)
+    return build_time, peak, engine.nbytes, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[7282, 100_000, 1_000_000])
+    parser.add_argument("--dense-limit", type=int, default=10_000,
+                        help="Only build the dense matrix up to this many rows")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'dense build':>12} {'dense mem':>12} | "
+          f"{'engine build':>12} {'engine mem':>11} {'p50 query':>10} {'p99 query':>10}")
+    for num_rows in args.sizes:
+        genre_matrix = synthetic_genre_matrix(num_rows)
+
+        if num_rows <= args.dense_limit:
+            dense_time, dense_peak = bench_dense(genre_matrix)
+            dense_cols = f"{dense_time:>11.3f}s {dense_peak / 2**20:>10.1f}MB"
+        else:
+            projected = num_rows * num_rows * 8
+            dense_cols = f"{'skipped':>12} {projected / 2**20:>9.0f}MB*"
+
+        build_time, peak, resident, latencies = bench_engine(genre_matrix, args.queries, args.k)
+        print(f"{num_rows:>10} | {dense_cols} | {build_time:>11.3f}s {resident / 2**20:>10.1f}MB "
+              f"{np.percentile(latencies, 50) * 1e3:>8.3f}ms {np.percentile(latencies, 99) * 1e3:>8.3f}ms")
+
+    print("* projected size of the float64 N x N matrix (not built)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_startup.py
+"""
+App startup cost: `-X importtime` breakdown of `import main` and first paint.
+
+Each run uses a fresh interpreter. The import report aggregates
+`python -X importtime -c "import main"` per top-level package (cumulative
+time of the outermost import) and lists the modules that must stay off the
+startup path. First paint runs `main.py` once headless through Streamlit's
+AppTest, which is what a new browser session waits for.
+Run from the repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --top 15
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use by the features that need them, never at startup
+DEFERRED = ("pandas", "scipy", "sklearn", "groq", "PIL")
+# Kept out of `import main` too, but loaded at the end of the first run (sidebar timings)
+NOT_IMPORTED = DEFERRED + ("numpy",)
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+_FIRST_PAINT = f"""
+import sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py", default_timeout=120)
+app.run()
+elapsed = time.perf_counter() - start
+loaded = [name for name in {DEFERRED!r} if name in sys.modules]
+print(f"{{elapsed}}|{{len(app.exception)}}|{{','.join(loaded)}}")
+"""
+
+
+def import_report():
+    """
+    (total seconds, {package: cumulative seconds}, {deferred module: seconds})
+    for one `import main` in a fresh interpreter.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            entries.append((match.group(4), len(match.group(3)) // 2, int(match.group(2)) / 1e6))
+    # Children are printed before their parent: main's subtree is the run of
+    # nested entries right above its own line
+    end = max(i for i, (name, depth, _) in enumerate(entries) if name == "main" and depth == 0)
+    start = end
+    while start > 0 and entries[start - 1][1] > 0:
+        start -= 1
+    total = entries[end][2]
+    packages, deferred = {}, {}
+    for name, depth, cumulative in entries[start:end]:
+        if depth == 1:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0.0) + cumulative
+        if name in NOT_IMPORTED:
+            deferred[name] = cumulative
+    return total, packages, deferred
+
+
+def first_paint():
+    result = subprocess.run([sys.executable, "-c", _FIRST_PAINT], cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+    elapsed, errors, loaded = result.stdout.strip().splitlines()[-1].split("|")
+    return float(elapsed), int(errors), [name for name in loaded.split(",") if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports of main to list")
+    parser.add_argument("--no-paint", action="store_true", help="Skip the AppTest first-paint run")
+    args = parser.parse_args()
+
+    reports = [import_report() for _ in range(args.runs)]
+    totals = [total for total, _, _ in reports]
+    print(f"import main: median {np.median(totals) * 1000:.0f} ms "
+          f"(min {min(totals) * 1000:.0f}, max {max(totals) * 1000:.0f}) over {args.runs} runs")
+    packages = {name: np.median([report[1].get(name, 0.0) for report in reports]) for name in reports[0][1]}
+    for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<28} {seconds * 1000:>7.0f} ms")
+    deferred = reports[-1][2]
+    print("deferred modules at startup: " +
+          (", ".join(f"{name} ({seconds * 1000:.0f} ms)" for name, seconds in deferred.items()) or "none"))
+
+    if not args.no_paint:
+        runs = [first_paint() for _ in range(args.runs)]
+        print(f"first paint (AppTest run of main.py): median {np.median([run[0] for run in runs]) * 1000:.0f} ms, "
+              f"{runs[-1][1]} exceptions, deferred modules loaded: {', '.join(runs[-1][2]) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# benchmarks/bench_upstream_load.py
+"""
+End-to-end load test of the upstream-bound paths against the mock server.
+
+Starts `mock_upstream.py` in-process, points the app's clients and caches
+at it (fresh cache files in a temporary directory unless --cache-dir is
+given), then runs N concurrent sessions, each issuing --requests calls of
+`identify_song`, `search_song_by_name`, `search_by_lyrics` (and optionally
+the streamed Groq chat) over a pool of --distinct songs / recordings / phrases.
+Reports p50/p95/p99 latency and throughput per call, the requests the mock
+upstream actually received, the client's retries and cache counters, and
+the chat's time to first token.
+Run from the repository root:
+    python benchmarks/bench_upstream_load.py
+    python benchmarks/bench_upstream_load.py --sessions 32 --requests 50 --latency 0.3 --latency identify=1.0
+    python benchmarks/bench_upstream_load.py --error-rate 0.05 --throttle-rate 0.05 --scenarios identify,chat
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio_processing import wav_bytes  # noqa: E402
+from mock_upstream import MockUpstream, parse_latencies  # noqa: E402
+
+SCENARIOS = ("identify", "search", "lyrics", "chat")
+RATE = 16000
+
+
+def synthetic_recordings(directory, count, rng):
+    # Distinct takes: different lengths (the mock keys its answer on upload size) and content
+    paths = []
+    for i in range(count):
+        seconds = rng.uniform(6, 10)
+        t = np.arange(int(seconds * RATE)) / RATE
+        tone = sum(np.sin(2 * np.pi * rng.uniform(110, 880) * t * h) / h for h in (1, 2, 3))
+        samples = 0.2 * tone + 0.02 * rng.standard_normal(len(t))
+        path = os.path.join(directory, f"take_{i:03d}.wav")
+        with open(path, 'wb') as f:
+            f.write(wav_bytes(samples.astype(np.float32), RATE))
+        paths.append(path)
+    return paths
+
+
+def workloads(mock, distinct, directory, rng):
+    import api_handler
+    import music_llm
+
+    titles = [song["title"] for song in mock.songs]
+    titles += [f"Trending Song {i}" for i in range(max(0, distinct - len(titles)))]
+    lines = [line for song in mock.songs for line in song["lyrics"].splitlines() if len(line.split()) >= 3]
+    phrases = [" ".join(lines[i % len(lines)].split()[:3 + i // len(lines)]) for i in range(distinct)]
+    recordings = synthetic_recordings(directory, distinct, rng)
+    prompts = [f"Suggest songs like {title}" for title in titles[:distinct]]
+    return {
+        "identify": (recordings, lambda path: "error" not in api_handler.identify_song(path)),
+        "search": (titles[:distinct], lambda title: bool(api_handler.search_song_by_name(title))),
+        "lyrics": (phrases, lambda phrase: bool(api_handler.search_by_lyrics(phrase))),
+        "chat": (prompts, lambda prompt: not "".join(music_llm.stream_music_chat_response(prompt)).startswith("Error")),
+    }
+
+
+def session(calls, scenarios, requests, seed, results):
+    rng = random.Random(seed)
+    for _ in range(requests):
+        scenario = rng.choice(scenarios)
+        keys, call = calls[scenario]
+        start = time.perf_counter()
+        try:
+            ok = call(rng.choice(keys))
+        except Exception:
+            ok = False
+        results.append((scenario, time.perf_counter() - start, ok))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions (threads)")
+    parser.add_argument("--requests", type=int, default=25, help="Calls per session")
+    parser.add_argument("--scenarios", default="identify,search,lyrics", help=f"Comma list of {', '.join(SCENARIOS)}")
+    parser.add_argument("--distinct", type=int, default=20, help="Distinct songs / recordings / phrases")
+    parser.add_argument("--latency", action="append", metavar="[ROUTE=]SECONDS",
+                        help="Mock latency, default or per route (default 0.1, identify=0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--cache-dir", help="Reuse cache files from here (default: fresh, cold caches)")
+    parser.add_argument("--rate-limits", help="SONG_RADAR_RATE_LIMITS for the run (default: the app's limits)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    latency, route_latency = parse_latencies(args.latency or ["0.1", "identify=0.5"])
+    mock = MockUpstream(0, latency, 0.2, route_latency, args.error_rate, args.throttle_rate, seed=args.seed).start()
+    directory = tempfile.mkdtemp(prefix="upstream-bench-")
+    cache_dir = args.cache_dir or directory
+    os.environ.update(mock.env())
+    os.environ.update({
+        "SONG_RADAR_RESPONSE_CACHE": os.path.join(cache_dir, "responses.sqlite3"),
+        "SONG_RADAR_RECORDING_CACHE": os.path.join(cache_dir, "recordings.sqlite3"),
+        "SONG_RADAR_LYRICS_INDEX": os.path.join(cache_dir, "lyrics.sqlite3"),
+        "SONG_RADAR_ANSWER_CACHE": os.path.join(cache_dir, "answers.sqlite3"),
+    })
+    for name in ("ACCESS_KEY", "ACCESS_SECRET", "ACRCLOUD_TOKEN", "GROQ_API_KEY"):
+        os.environ.setdefault(name, "mock")
+    if args.rate_limits is not None:
+        os.environ["SONG_RADAR_RATE_LIMITS"] = args.rate_limits
+
+    import http_client
+    import resources
+    import response_cache
+    resources.register("landmark_index", lambda: None)  # Measure the ACRCloud path, not offline matches
+
+    calls = workloads(mock, args.distinct, directory, np.random.default_rng(args.seed))
+    results = []
+    threads = [threading.Thread(target=session, args=(calls, scenarios, args.requests, args.seed + i, results))
+               for i in range(args.sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    mock.stop()
+
+    print(f"{args.sessions} sessions x {args.requests} calls in {wall:.2f}s "
+          f"({len(results) / wall:.1f} calls/s), mock latency {latency:.2f}s {route_latency or ''}")
+    print(f"{'call':<10} {'count':>6} {'failed':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls/s':>8}")
+    for scenario in scenarios:
+        timings = np.array([seconds for name, seconds, _ in results if name == scenario]) * 1000
+        failed = sum(not ok for name, _, ok in results if name == scenario)
+        if len(timings):
+            p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+            print(f"{scenario:<10} {len(timings):>6} {failed:>6} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} "
+                  f"{len(timings) / wall:>8.1f}")
+    print("upstream requests: " + ", ".join(f"{route} {count}" for route, count in sorted(mock.counts.items())))
+    retries = {endpoint: stats["retries"] for endpoint, stats in http_client.stats().items() if stats["retries"]}
+    if retries:
+        print("client retries: " + ", ".join(f"{endpoint} {count}" for endpoint, count in retries.items()))
+    for endpoint, counts in response_cache.stats().items():
+        print(f"cache {endpoint}: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+    if "chat" in scenarios:
+        import music_llm
+        chat = music_llm.chat_stats()
+        if chat["first_token_p50"] is not None:
+            print(f"chat first token: p50 {chat['first_token_p50'] * 1000:.1f} ms, "
+                  f"p95 {chat['first_token_p95'] * 1000:.1f} ms ({chat['completed']}/{chat['streams']} streams completed)")
+        import answer_cache
+        print("chat answer cache: " + ", ".join(f"{name} {count}" for name, count in answer_cache.stats().items()))
+
+
+if __name__ == "__main__":
+    main()
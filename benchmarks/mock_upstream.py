@@ -0,0 +1,307 @@
+# benchmarks/mock_upstream.py
+"""
+Local stand-in for every upstream API the app calls, for offline benchmarks.
+
+Serves ACRCloud identify (POST /v1/identify), ACRCloud metadata
+(GET /api/external-metadata/tracks), LRCLIB (GET /api/get, /api/search),
+Shazam search (GET /shazam/search_track/) and Groq chat completions
+(POST /openai/v1/chat/completions, streaming included). Responses are
+rebuilt in each API's shape from the recorded songs in
+`fixtures/upstream_songs.json`; unknown titles get a copy of the first song
+under the requested name, so distinct queries stay distinct for the caches.
+
+Every route sleeps for its configured latency (+- jitter) and fails with
+503 (`error_rate`) or 429 with Retry-After (`throttle_rate`) at random.
+Point the app at it with the variables printed by `env()`:
+    python benchmarks/mock_upstream.py --port 8765 --latency 0.2 --latency identify=0.8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "upstream_songs.json")
+ROUTES = {
+    ("POST", "/v1/identify"): "identify",
+    ("GET", "/api/external-metadata/tracks"): "metadata",
+    ("GET", "/api/get"): "lrclib_get",
+    ("GET", "/api/search"): "lrclib_search",
+    ("GET", "/shazam/search_track/"): "shazam",
+    ("POST", "/openai/v1/chat/completions"): "chat",
+}
+_SAMPLE_BYTES = re.compile(rb'name="sample_bytes"\r\n\r\n(\d+)')
+
+
+def _stable_id(text):
+    return int(hashlib.md5(text.lower().encode('utf-8')).hexdigest()[:7], 16)
+
+
+class MockUpstream:
+    """
+    Threaded mock server; `start()` serves in the background, `stop()` shuts down.
+    """
+
+    def __init__(self, port=0, latency=0.0, jitter=0.2, route_latency=None, error_rate=0.0,
+                 throttle_rate=0.0, fixtures=FIXTURES, seed=None):
+        with open(fixtures, encoding='utf-8') as f:
+            recorded = json.load(f)
+        self.songs = recorded["songs"]
+        self.chat_reply = recorded["chat_reply"]
+        self.latency = latency
+        self.jitter = jitter
+        self.route_latency = dict(route_latency or {})
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """
+        Environment variables that point the app's clients at this server.
+        """
+        return {
+            "ACRCLOUD_IDENTIFY_URL": f"{self.url}/v1/identify",
+            "ACRCLOUD_METADATA_URL": f"{self.url}/api/external-metadata/tracks",
+            "LRCLIB_BASE_URL": f"{self.url}/api",
+            "SHAZAM_SEARCH_URL": f"{self.url}/shazam/search_track/",
+            "GROQ_BASE_URL": self.url,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _draw(self, route):
+        # (delay seconds, injected status or None), drawn under the lock so seeded runs repeat
+        with self._lock:
+            self.counts[route] += 1
+            base = self.route_latency.get(route, self.latency)
+            delay = max(0.0, base * (1 + self._random.uniform(-self.jitter, self.jitter)))
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return delay, 503
+        if roll < self.error_rate + self.throttle_rate:
+            return delay, 429
+        return delay, None
+
+    def song(self, title=None, acrid=None):
+        for song in self.songs:
+            if (acrid and song["acrid"] == acrid) or (title and song["title"].lower() == title.strip().lower()):
+                return song
+        if not title:
+            return None
+        return dict(self.songs[0], title=title.strip(), acrid=f"mock-{_stable_id(title):x}")
+
+    # Response bodies in each upstream's shape
+
+    def identify(self, body):
+        match = _SAMPLE_BYTES.search(body)
+        song = self.songs[int(match.group(1)) % len(self.songs) if match else 0]
+        return 200, {
+            "status": {"msg": "Success", "code": 0, "version": "1.0"},
+            "metadata": {"timestamp_utc": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), "music": [{
+                "title": song["title"], "acrid": song["acrid"], "duration_ms": song["duration_ms"],
+                "artists": [{"name": name} for name in song["artists"]], "album": {"name": song["album"]},
+                "release_date": song["release_date"], "genres": [{"name": name} for name in song["genres"]],
+                "score": 100, "play_offset_ms": 42000, "result_from": 3,
+            }]},
+            "cost_time": 0.7, "result_type": 0,
+        }
+
+    def metadata(self, params):
+        acrid = params.get("acr_id")
+        query = json.loads(params.get("query") or "{}")
+        song = self.song(query.get("track"), acrid)
+        if song is None:
+            return 200, {"data": []}
+        link = song["title"].lower().replace(" ", "-")
+        return 200, {"data": [{
+            "name": song["title"], "isrc": "XX0000000000", "duration_ms": song["duration_ms"],
+            "artists": [{"name": name} for name in song["artists"]],
+            "album": {"name": song["album"], "cover": f"https://covers.example/{link}.jpg"},
+            "genres": song["genres"], "language": song["language"], "release_date": song["release_date"],
+            "external_metadata": {
+                "spotify": [{"link": f"https://open.spotify.example/track/{link}",
+                             "preview": f"https://p.scdn.example/{link}.mp3"}],
+                "youtube": [{"link": f"https://youtube.example/watch?v={link}"}],
+                "applemusic": [{"link": f"https://music.apple.example/{link}"}],
+            },
+        }]}
+
+    def _lrclib_record(self, song):
+        return {
+            "id": _stable_id(song["acrid"]), "trackName": song["title"], "artistName": ", ".join(song["artists"]),
+            "albumName": song["album"], "duration": song["duration_ms"] / 1000, "instrumental": False,
+            "plainLyrics": song["lyrics"],
+            "syncedLyrics": "\n".join(f"[{4 * i // 60:02d}:{4 * i % 60:02d}.00] {line}"
+                                      for i, line in enumerate(song["lyrics"].splitlines())),
+        }
+
+    def lrclib_get(self, params):
+        song = self.song(params.get("track_name"))
+        if song is None:
+            return 404, {"code": 404, "name": "TrackNotFound", "message": "Failed to find specified track"}
+        return 200, self._lrclib_record(song)
+
+    def lrclib_search(self, params):
+        words = (params.get("q") or params.get("track_name") or "").lower().split()
+        fields = ("title", "lyrics") if "q" in params else ("title",)
+        hits = [song for song in self.songs
+                if words and all(any(word in song[field].lower() for field in fields) for word in words)]
+        return 200, [self._lrclib_record(song) for song in hits]
+
+    def shazam(self, params):
+        hits = [{"heading": {"title": song["title"], "subtitle": ", ".join(song["artists"])},
+                 "artists": [{"alias": name.lower().replace(" ", "-")} for name in song["artists"]],
+                 "url": f"https://www.shazam.example/track/{song['acrid']}"}
+                for song in self.songs if params.get("query", "").lower() in song["title"].lower()]
+        return 200, {"status": True, "result": {"tracks": {"hits": hits}}}
+
+    def chat(self, request):
+        completion = {"id": "chatcmpl-mock", "created": int(time.time()), "model": request.get("model", "mock"),
+                      "system_fingerprint": "fp_mock"}
+        if not request.get("stream"):
+            return 200, dict(completion, object="chat.completion", choices=[{
+                "index": 0, "message": {"role": "assistant", "content": self.chat_reply},
+                "finish_reason": "stop", "logprobs": None}],
+                usage={"prompt_tokens": 50, "completion_tokens": len(self.chat_reply.split()), "total_tokens": 0})
+        chunks = [dict(completion, object="chat.completion.chunk", choices=[{
+            "index": 0, "delta": {"content": piece}, "finish_reason": None, "logprobs": None}])
+            for piece in re.findall(r"\S+\s*|\s+", self.chat_reply)]
+        chunks.append(dict(completion, object="chat.completion.chunk", choices=[{
+            "index": 0, "delta": {}, "finish_reason": "stop", "logprobs": None}]))
+        return 200, chunks
+
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, as the real upstreams
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload, headers=()):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, chunks, delay):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks] + ["data: [DONE]\n\n"]:
+                    data = chunk.encode('utf-8')
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                    time.sleep(delay)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client cancelled the stream
+                with mock._lock:
+                    mock.counts["chat_cancelled"] += 1
+                self.close_connection = True
+
+        def _dispatch(self, method):
+            parts = urlsplit(self.path)
+            route = ROUTES.get((method, parts.path))
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if route is None:
+                return self._send(404, {"code": 404, "message": f"No mock for {method} {parts.path}"})
+            delay, injected = mock._draw(route)
+            time.sleep(delay)
+            if injected == 503:
+                return self._send(503, {"message": "Injected upstream error"})
+            if injected == 429:
+                return self._send(429, {"message": "Injected rate limit"}, [("Retry-After", "1")])
+            params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            if route == "identify":
+                status, payload = mock.identify(body)
+            elif route == "chat":
+                request = json.loads(body or b"{}")
+                status, payload = mock.chat(request)
+                if request.get("stream"):
+                    return self._send_stream(payload, mock.route_latency.get("chat_token", 0.01))
+            else:
+                status, payload = getattr(mock, route)(params)
+            self._send(status, payload)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+
+def parse_latencies(values):
+    """
+    (default latency, per-route latencies) from "0.2" / "identify=0.8" values.
+    """
+    default, routes = 0.0, {}
+    for value in values or ():
+        route, _, seconds = value.rpartition("=")
+        if route:
+            routes[route] = float(seconds)
+        else:
+            default = float(seconds)
+    return default, routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", metavar="[ROUTE=]SECONDS",
+                        help=f"Response delay, default or per route ({', '.join(ROUTES.values())}, chat_token)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    args = parser.parse_args()
+
+    latency, route_latency = parse_latencies(args.latency)
+    mock = MockUpstream(args.port, latency, args.jitter, route_latency, args.error_rate, args.throttle_rate,
+                        args.fixtures)
+    for name, value in mock.env().items():
+        print(f"export {name}={value}")
+    print("export GROQ_API_KEY=mock ACRCLOUD_TOKEN=mock ACCESS_KEY=mock ACCESS_SECRET=mock")
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# catalog_index.py
+
+import heapq
+from array import array
+
+import numpy as np
+
+
+def normalize_name(value):
+    """
+    Normalize an artist, track or genre string for index lookups.
+    """
+    return value.strip().lower() if isinstance(value, str) else ""
+
+
+def sort_vocabulary(vocabulary):
+    """
+    Sort a {str key: id} vocabulary as UTF-8 byte strings, which search like
+    the str keys they encode. Returns (sorted keys, old id -> sorted position).
+    """
+    keys = np.array([key.encode('utf-8') for key in vocabulary], dtype=np.bytes_)
+    order = np.argsort(keys, kind='stable')
+    positions = np.empty(len(order), dtype=np.int32)
+    positions[order] = np.arange(len(order), dtype=np.int32)
+    return keys[order], positions
+
+
+def _lookup(keys, key):
+    # Position of `key` in the sorted byte-string array, or -1
+    key = key.encode('utf-8')
+    position = int(np.searchsorted(keys, key))
+    return position if position < len(keys) and keys[position] == key else -1
+
+
+class _Postings:
+    """
+    Sorted keys -> ascending ranks, as a CSR pair (`offsets`, `ranks`).
+    """
+
+    def __init__(self, keys, offsets, ranks):
+        self.keys = keys
+        self.offsets = offsets
+        self.ranks = ranks
+
+    @classmethod
+    def build(cls, vocabulary, key_ids, ranks):
+        # Posts `ranks[i]` (ascending) under the key with id `key_ids[i]` in `vocabulary`
+        keys, positions = sort_vocabulary(vocabulary)
+        key_ids = positions[np.asarray(key_ids, dtype=np.int64)]
+        by_key = np.argsort(key_ids, kind='stable')  # Stable: ranks stay ascending per key
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(key_ids, minlength=len(keys)))))
+        return cls(keys, offsets, np.asarray(ranks, dtype=np.int32)[by_key])
+
+    def get(self, key):
+        position = _lookup(self.keys, key)
+        if position < 0:
+            return self.ranks[:0]
+        return self.ranks[self.offsets[position]:self.offsets[position + 1]]
+
+
+class CatalogIndex:
+    """
+    Artist and genre inverted indexes over the song catalog.
+
+    Rows are ranked once by popularity (most popular first) and every posting
+    list holds ranks in ascending order, so a query is a lazy k-way merge of
+    the matching postings that stops as soon as enough songs are found.
+
+    Everything is stored in NumPy arrays (sorted byte-string keys, CSR
+    postings, per-rank key ids), so `to_arrays` / `from_arrays` can place a
+    built index in shared memory and attach to it without rebuilding.
+    """
+
+    def __init__(self, songs_df, genres=None):
+        # `genres`: per-row genre lists (e.g. catalog_store.GenreLists), default songs_df['genres']
+        popularity = songs_df['popularity'].to_numpy()
+        # rank -> catalog row position, most popular first
+        self.order = np.argsort(-popularity, kind='stable')
+
+        artists = songs_df['artist'].to_numpy(dtype=object)
+        tracks = songs_df['track_name'].to_numpy(dtype=object)
+        genres = songs_df['genres'].to_numpy(dtype=object) if genres is None else genres
+
+        # Ids go straight into arrays: lists of int objects would outlive the build as heap
+        artist_vocab, genre_vocab, track_vocab = {}, {}, {}
+        artist_ids = np.empty(len(self.order), dtype=np.int32)
+        track_ids = np.empty(len(self.order), dtype=np.int32)
+        genre_ids, genre_ranks = array('i'), array('i')
+        for rank, row in enumerate(self.order):
+            artist_ids[rank] = artist_vocab.setdefault(normalize_name(artists[row]), len(artist_vocab))
+            row_genres = genres[row] if isinstance(genres[row], list) else []
+            for genre in {normalize_name(g) for g in row_genres}:
+                genre_ids.append(genre_vocab.setdefault(genre, len(genre_vocab)))
+                genre_ranks.append(rank)
+            track_ids[rank] = track_vocab.setdefault(normalize_name(tracks[row]), len(track_vocab))
+        # Songs repeated with the same (track_name, genres) share an id
+        groups = songs_df.groupby(['track_name', 'genres_str'], sort=False, dropna=False).ngroup().to_numpy()
+        self.dedupe_ids = groups[self.order].astype(np.int32)
+
+        self.artist_postings = _Postings.build(artist_vocab, artist_ids, range(len(self.order)))
+        self.genre_postings = _Postings.build(genre_vocab, genre_ids, genre_ranks)
+        # rank -> position of its normalized track name in the sorted `track_keys`
+        self.track_keys, positions = sort_vocabulary(track_vocab)
+        self.track_key_ids = positions[track_ids]
+
+    def to_arrays(self):
+        """
+        The index as {name: np.ndarray}, the inverse of `from_arrays`.
+        """
+        arrays = {"order": self.order, "track_keys": self.track_keys,
+                  "track_key_ids": self.track_key_ids, "dedupe_ids": self.dedupe_ids}
+        for name, postings in (("artist", self.artist_postings), ("genre", self.genre_postings)):
+            arrays[f"{name}.keys"] = postings.keys
+            arrays[f"{name}.offsets"] = postings.offsets
+            arrays[f"{name}.ranks"] = postings.ranks
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Wrap the arrays of `to_arrays` (e.g. shared memory views) without copying them.
+        """
+        index = cls.__new__(cls)
+        index.order = arrays["order"]
+        index.track_keys = arrays["track_keys"]
+        index.track_key_ids = arrays["track_key_ids"]
+        index.dedupe_ids = arrays["dedupe_ids"]
+        index.artist_postings, index.genre_postings = (
+            _Postings(arrays[f"{name}.keys"], arrays[f"{name}.offsets"], arrays[f"{name}.ranks"])
+            for name in ("artist", "genre"))
+        return index
+
+    def __len__(self):
+        return len(self.order)
+
+    def artist_rows(self, artist_name):
+        """
+        Catalog row positions for an artist, most popular first.
+        """
+        return self.order[self.artist_postings.get(normalize_name(artist_name))]
+
+    def genre_rows(self, genre):
+        """
+        Catalog row positions tagged with a genre, most popular first.
+        """
+        return self.order[self.genre_postings.get(normalize_name(genre))]
+
+    def find_rows(self, artist_name, track_name):
+        """
+        Catalog row positions whose normalized artist and track name both match.
+        """
+        track_id = _lookup(self.track_keys, normalize_name(track_name))
+        ranks = self.artist_postings.get(normalize_name(artist_name))
+        return self.order[ranks[self.track_key_ids[ranks] == track_id]].tolist() if track_id >= 0 else []
+
+    def recommend(self, artist_name, genres=(), exclude_track=None, limit=5):
+        """
+        Return up to `limit` catalog row positions by the artist or sharing any
+        of `genres`, most popular first, skipping `exclude_track` and duplicate
+        (track_name, genres) entries.
+        """
+        postings = [self.artist_postings.get(normalize_name(artist_name))]
+        postings += [self.genre_postings.get(normalize_name(g)) for g in genres]
+        postings = [p.tolist() for p in postings if len(p)]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        exclude_track = normalize_name(exclude_track)
+        exclude_id = _lookup(self.track_keys, exclude_track) if exclude_track else -1
+
+        merged = postings[0] if len(postings) == 1 else heapq.merge(*postings)
+        rows, seen, last_rank = [], set(), -1
+        for rank in merged:
+            if rank == last_rank:
+                continue  # Same row reached through several postings
+            last_rank = rank
+            if exclude_id >= 0 and self.track_key_ids[rank] == exclude_id:
+                continue
+            dedupe_id = self.dedupe_ids[rank]
+            if dedupe_id in seen:
+                continue
+            seen.add(dedupe_id)
+            rows.append(self.order[rank])
+            if len(rows) >= limit:
+                break
+        return np.asarray(rows, dtype=np.int64)
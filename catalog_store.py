@@ -0,0 +1,426 @@
+# catalog_store.py
+"""
+Compiled columnar cache for the song catalog CSV.
+
+The CSV is parsed once (including the `ast.literal_eval` pass over `genres`)
+and written as one `.npy` file per typed column next to a `manifest.json`:
+
+- numeric / bool columns are stored as-is,
+- string columns are dictionary-encoded: int32 codes plus a UTF-8 vocabulary
+  (`<col>.vocab` blob + `<col>.vocab_offsets`),
+- `genres` lists are CSR-encoded over a shared genre vocabulary
+  (`genres.offsets` + `genres.ids`).
+
+Every file is memory-mapped on load. The cache is rebuilt automatically when
+the source CSV changes (size/mtime first, then a SHA-256 of the contents).
+Each build gets its own file names and the previous build is deleted once
+the new manifest is in place. Checking, compiling and mapping all hold an
+exclusive lock on the cache directory (`.lock`, POSIX only), so worker
+processes starting together compile once and never delete files another
+process is about to map.
+
+`compact=True` assembles a smaller DataFrame from the same arrays: repetitive
+strings (artists, genre strings) become categoricals over the stored codes,
+near-unique ones stay plain strings, integers are downcast to the
+narrowest type holding their range (int8 genre flags), columns duplicating
+another (`Cluster` / `cluster`) are dropped and the `genres` lists are left
+out in favour of the CSR `GenreLists`.
+
+Compile a catalog ahead of time with:
+    python catalog_store.py data/clean/7_clustered_dataset.csv
+"""
+
+import ast
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sys
+import uuid
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not locked
+    fcntl = None
+
+# pandas is imported by the functions that build DataFrames, so importing this
+# module for GENRE_COLUMNS, genre_flags or the cache paths stays cheap
+
+FORMAT_VERSION = 1
+CACHE_ROOT = os.path.join("data", "cache")
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+# Compact mode: string columns with at most this many distinct values per row become categoricals
+CATEGORICAL_MAX_RATIO = 0.5
+
+# Binary genre flag columns of the clustered catalog
+GENRE_COLUMNS = ['rock', 'pop', 'blues', 'metal', 'hip-hop', 'country', 'punk',
+                 'jazz', 'rap', 'reggae', 'folk', 'soul', 'latin', 'dance', 'indie', 'classical']
+
+
+def genre_flags(genres):
+    """
+    Encode a list of genre names (or a comma-separated string) as the 16 binary
+    genre flags, word-splitting like notebooks/4_spotify_data_processing.ipynb.
+    """
+    if isinstance(genres, str):
+        genres = genres.split(",")
+    words = set()
+    for genre in genres:
+        words.update(w for w in re.split(r"[\s\-/&]+", genre.lower()) if w)
+    if 'hip' in words and 'hop' in words:  # Special case for hip-hop
+        words.add('hip-hop')
+    return np.array([1 if column in words else 0 for column in GENRE_COLUMNS], dtype=np.int8)
+
+
+def cache_dir_for(csv_path):
+    """
+    Default cache directory for a CSV: data/cache/<csv stem>/
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_ROOT, stem)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stat(csv_path):
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_dir, manifest):
+    tmp_path = os.path.join(cache_dir, f".{MANIFEST_NAME}.{uuid.uuid4().hex}")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST_NAME))
+
+
+@contextlib.contextmanager
+def _build_lock(cache_dir):
+    # Exclusive across processes; closing the file releases it
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, LOCK_NAME), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def encode_strings(values):
+    """
+    Encode a sequence of Python strings as (utf-8 blob, int64 character offsets).
+    """
+    text = "".join(values)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8), offsets
+
+
+def decode_strings(blob, offsets):
+    """
+    Inverse of `encode_strings`: returns an object array of Python strings.
+    """
+    text = blob.tobytes().decode('utf-8')
+    bounds = offsets.tolist()
+    return np.array([text[a:b] for a, b in zip(bounds[:-1], bounds[1:])], dtype=object)
+
+
+def byte_offsets(blob, offsets):
+    """
+    Byte offsets into `blob` for the character `offsets` of `encode_strings`.
+    """
+    values = decode_strings(blob, offsets)
+    result = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v.encode('utf-8')) for v in values], out=result[1:])
+    return result
+
+
+def _parse_genres(cell):
+    if isinstance(cell, str) and cell.startswith('['):
+        parsed = ast.literal_eval(cell)  # Convert string to list
+        return parsed if isinstance(parsed, list) else []
+    return []
+
+
+def compile_catalog(csv_path, cache_dir=None):
+    """
+    Parse `csv_path` and write the columnar cache. Returns the new manifest.
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    with _build_lock(cache_dir):
+        return _compile(csv_path, cache_dir)
+
+
+def _compile(csv_path, cache_dir):
+    import pandas as pd
+    stat = _source_stat(csv_path)
+    df = pd.read_csv(csv_path)
+
+    arrays, columns = {}, []
+    for name in df.columns:
+        series = df[name]
+        if name == 'genres':
+            genre_lists = series.map(_parse_genres).tolist()
+            codes, vocab = pd.factorize(pd.Series([g for row in genre_lists for g in row], dtype=object))
+            offsets = np.zeros(len(genre_lists) + 1, dtype=np.int64)
+            np.cumsum([len(row) for row in genre_lists], out=offsets[1:])
+            arrays['genres.ids'] = codes.astype(np.int32)
+            arrays['genres.offsets'] = offsets
+            arrays['genres.vocab'], arrays['genres.vocab_offsets'] = encode_strings(list(vocab))
+            columns.append({"name": name, "kind": "genres"})
+        elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            arrays[name] = series.to_numpy()
+            columns.append({"name": name, "kind": "numeric"})
+        else:
+            _encode_string_column(arrays, name, series)
+            columns.append({"name": name, "kind": "string"})
+
+    if 'genres' in df.columns:
+        # Pre-joined display string, so loading never runs the join lambda
+        joined = pd.Series([', '.join(row) for row in genre_lists], dtype=object)
+        _encode_string_column(arrays, 'genres_str', joined)
+        columns.append({"name": 'genres_str', "kind": "string"})
+
+    build_id = uuid.uuid4().hex[:12]
+    for key, array in arrays.items():
+        np.save(os.path.join(cache_dir, f"{key}.{build_id}.npy"), np.ascontiguousarray(array))
+
+    old_manifest = _read_manifest(cache_dir)
+    manifest = {
+        "version": FORMAT_VERSION,
+        "build_id": build_id,
+        "source": os.path.abspath(csv_path),
+        "source_sha256": file_sha256(csv_path),
+        "num_rows": len(df),
+        "columns": columns,
+        "arrays": sorted(arrays),
+        **stat,
+    }
+    _write_manifest(cache_dir, manifest)
+    if old_manifest and old_manifest.get("build_id") != build_id:
+        _remove_build(cache_dir, old_manifest)
+    return manifest
+
+
+def _encode_string_column(arrays, name, series):
+    import pandas as pd
+    codes, vocab = pd.factorize(series.astype(object))  # NaN -> code -1
+    arrays[name] = codes.astype(np.int32)
+    arrays[f"{name}.vocab"], arrays[f"{name}.vocab_offsets"] = encode_strings(list(vocab))
+
+
+def _remove_build(cache_dir, manifest):
+    # Readers that already memory-mapped these files keep their open copies
+    for key in manifest.get("arrays", []):
+        try:
+            os.remove(os.path.join(cache_dir, f"{key}.{manifest['build_id']}.npy"))
+        except OSError:
+            pass
+
+
+def ensure_compiled(csv_path, cache_dir=None):
+    """
+    Return an up-to-date manifest for `csv_path`, rebuilding the cache if the
+    CSV changed since it was compiled.
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    with _build_lock(cache_dir):
+        return _ensure_compiled(csv_path, cache_dir)
+
+
+def _ensure_compiled(csv_path, cache_dir):
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or manifest.get("version") != FORMAT_VERSION:
+        return _compile(csv_path, cache_dir)
+
+    stat = _source_stat(csv_path)
+    if all(manifest.get(key) == value for key, value in stat.items()):
+        return manifest
+
+    # Touched but possibly unchanged (e.g. fresh checkout): compare contents
+    if manifest.get("source_sha256") == file_sha256(csv_path):
+        manifest.update(stat)
+        _write_manifest(cache_dir, manifest)
+        return manifest
+    return _compile(csv_path, cache_dir)
+
+
+def load_catalog_arrays(csv_path, cache_dir=None):
+    """
+    Memory-map every column array of the compiled catalog.
+    Returns (manifest, {array name: np.ndarray}).
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    with _build_lock(cache_dir):  # Until mapped: a rebuild deletes this build's files
+        manifest = _ensure_compiled(csv_path, cache_dir)
+        arrays = {
+            key: np.load(os.path.join(cache_dir, f"{key}.{manifest['build_id']}.npy"), mmap_mode='r')
+            for key in manifest["arrays"]
+        }
+    return manifest, arrays
+
+
+class GenreLists:
+    """
+    Per-row genre lists as a CSR pair (`offsets`, `ids`) over a shared
+    vocabulary; `lists[row]` returns that row's genre names.
+    """
+
+    def __init__(self, offsets, ids, vocab):
+        self.offsets = offsets
+        self.ids = ids
+        self.vocab = vocab
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        vocab = decode_strings(arrays['genres.vocab'], arrays['genres.vocab_offsets'])
+        return cls(arrays['genres.offsets'], arrays['genres.ids'], vocab)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.vocab[self.ids[self.offsets[row]:self.offsets[row + 1]]].tolist()
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.ids.nbytes + sum(sys.getsizeof(name) for name in self.vocab)
+
+
+def genre_lists(arrays):
+    """
+    Rebuild the per-row genre lists from the CSR arrays.
+    """
+    names = decode_strings(arrays['genres.vocab'], arrays['genres.vocab_offsets'])[arrays['genres.ids']].tolist()
+    bounds = arrays['genres.offsets'].tolist()
+    return [names[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def string_column(arrays, name):
+    """
+    Decode a dictionary-encoded string column into an object array (NaN for missing).
+    """
+    vocab = decode_strings(arrays[f"{name}.vocab"], arrays[f"{name}.vocab_offsets"])
+    return np.append(vocab, np.nan)[arrays[name]]  # Code -1 picks the trailing NaN
+
+
+def categorical_column(arrays, name):
+    """
+    A string column as a pandas Categorical over its stored codes (-1 = missing).
+    """
+    import pandas as pd
+    vocab = decode_strings(arrays[f"{name}.vocab"], arrays[f"{name}.vocab_offsets"])
+    return pd.Categorical.from_codes(arrays[name], categories=pd.Index(vocab), validate=False)
+
+
+def arrow_string_column(arrays, name):
+    """
+    A string column as a pandas ArrowExtensionArray that wraps the stored codes
+    and UTF-8 vocabulary without copying them: a dictionary array over
+    `<name>.vocab` with the byte offsets in `<name>.vocab_byte_offsets`.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    codes = arrays[name]
+    missing = codes < 0
+    validity = pa.py_buffer(np.packbits(~missing, bitorder='little')) if missing.any() else None
+    indices = pa.Array.from_buffers(pa.int32(), len(codes), [validity, pa.py_buffer(codes)])
+    offsets = arrays[f"{name}.vocab_byte_offsets"]
+    vocab = pa.LargeStringArray.from_buffers(
+        len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(arrays[f"{name}.vocab"]))
+    return pd.arrays.ArrowExtensionArray(pa.DictionaryArray.from_arrays(indices, vocab))
+
+
+def _is_repetitive(arrays, name):
+    # A categorical only saves memory when values repeat; near-unique columns
+    # (track names, cover URLs) cost more as codes + categories + hash table
+    return len(arrays[f"{name}.vocab_offsets"]) - 1 <= CATEGORICAL_MAX_RATIO * len(arrays[name])
+
+
+def narrowest_int(values):
+    """
+    Downcast an integer array to the narrowest of int8/int16/int32 holding its range.
+    """
+    if values.dtype.kind not in "iu" or len(values) == 0:
+        return values
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def duplicate_columns(manifest, arrays):
+    """
+    Numeric columns whose name and values repeat an earlier column
+    case-insensitively (the clustered CSV carries `Cluster` and `cluster`).
+    """
+    seen, duplicates = {}, set()
+    for column in manifest["columns"]:
+        name = column["name"]
+        if column["kind"] != "numeric":
+            continue
+        previous = seen.setdefault(name.lower(), name)
+        if previous != name and np.array_equal(arrays[previous], arrays[name]):
+            duplicates.add(name)
+    return duplicates
+
+
+def catalog_to_dataframe(manifest, arrays, copy=True, compact=False, arrow_strings=False):
+    """
+    Assemble the songs DataFrame (same columns as the CSV, `genres` as lists,
+    plus `genres_str`) from the compiled arrays. With `copy=False` numeric
+    columns stay views over `arrays` (e.g. shared memory). With `compact=True`
+    see the module docstring; genres are then read through `GenreLists`.
+    `arrow_strings=True` (with `copy=False`) keeps string columns over the
+    stored codes and vocabularies too (see `arrow_string_column`) and also
+    leaves the genre lists to `GenreLists`.
+    """
+    import pandas as pd
+    skip = duplicate_columns(manifest, arrays) if compact else set()
+    data = {}
+    for column in manifest["columns"]:
+        name, kind = column["name"], column["kind"]
+        if name in skip or ((compact or arrow_strings) and kind == "genres"):
+            continue
+        if kind == "genres":
+            data[name] = genre_lists(arrays)
+        elif kind == "string" and arrow_strings:
+            data[name] = arrow_string_column(arrays, name)
+        elif kind == "string":
+            repetitive = compact and _is_repetitive(arrays, name)
+            data[name] = categorical_column(arrays, name) if repetitive else string_column(arrays, name)
+        else:
+            data[name] = narrowest_int(arrays[name]) if compact else arrays[name]
+    return pd.DataFrame(data, copy=copy)
+
+
+def load_catalog(csv_path, cache_dir=None, compact=False):
+    """
+    Load the song catalog through the compiled cache.
+    """
+    manifest, arrays = load_catalog_arrays(csv_path, cache_dir)
+    return catalog_to_dataframe(manifest, arrays, compact=compact)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:] or [os.path.join("data", "clean", "7_clustered_dataset.csv")]:
+        result = compile_catalog(path)
+        print(f"Compiled {path}: {result['num_rows']} rows -> {cache_dir_for(path)}")
@@ -0,0 +1,128 @@
+# chat_history.py
+"""
+Token-budgeted chat history with a rolling summary of older turns.
+
+Every Groq request resends the conversation, so without a bound prompt
+tokens (and cost and latency) grow with each turn until the context limit.
+`ChatHistory.window` keeps the most recent turns within `budget` estimated
+tokens and folds older turns into a running summary sent as one extra
+system message. Tokens are estimated locally (~4 characters per token),
+which is close enough to budget with.
+
+The summary is cached on the ChatHistory (one per conversation, kept in
+the session) and only recomputed when more turns are folded into it. When
+the budget is exceeded the oldest turns are folded until the rest fit in
+`low_water * budget`, so the summarizer runs every few turns rather than on
+every turn once the conversation is long. If the history no longer starts
+with the turns the summary covers (cleared or edited), the summary is
+dropped and rebuilt.
+
+Budget via SONG_RADAR_CHAT_HISTORY_TOKENS (default 2000).
+"""
+
+import hashlib
+import os
+import threading
+
+HISTORY_TOKENS = int(os.getenv("SONG_RADAR_CHAT_HISTORY_TOKENS", "2000"))
+LOW_WATER = 0.6
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4  # Role and separators per chat message
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+
+def estimate_tokens(text):
+    """
+    Rough token count of `text`: ~4 characters per token, at least one per word.
+    """
+    return max(len(text) // CHARS_PER_TOKEN, len(text.split()))
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def _digest(messages, digest=None):
+    digest = digest or hashlib.sha1()
+    for message in messages:
+        digest.update(f"{message['role']}\0{message['content']}\0".encode('utf-8'))
+    return digest
+
+
+class ChatHistory:
+    """
+    Sliding window over one conversation; see the module docstring.
+
+    `summarize(summary, messages)` returns the new summary text given the
+    current one ("" at first) and the turns being folded into it.
+    """
+
+    def __init__(self, summarize, budget=None, low_water=LOW_WATER):
+        self.summarize = summarize
+        self.budget = budget or HISTORY_TOKENS
+        self.low_water = low_water
+        self.summary = ""
+        self.summarized = 0  # history[:summarized] is folded into the summary
+        self._covered = _digest([])
+        self._lock = threading.Lock()
+        self._stats = {"windows": 0, "summaries": 0, "summary_errors": 0, "folded": 0,
+                       "sent_tokens": 0, "history_tokens": 0}
+
+    def window(self, history):
+        """
+        The messages to send ahead of the new prompt: the summary (if any) as a
+        system message followed by the most recent turns of `history`.
+        """
+        with self._lock:
+            if len(history) < self.summarized or \
+                    _digest(history[:self.summarized]).digest() != self._covered.digest():
+                self.summary, self.summarized, self._covered = "", 0, _digest([])
+            recent = list(history[self.summarized:])
+            tokens = sum(message_tokens(message) for message in recent)
+            if tokens + self._summary_tokens() > self.budget:
+                folded = self._fold_point(recent)
+                self._fold(recent[:folded])
+                recent = recent[folded:]
+            messages = [{"role": "system", "content": SUMMARY_HEADER + self.summary}] if self.summary else []
+            messages += [{"role": message["role"], "content": message["content"]} for message in recent]
+            self._stats["windows"] += 1
+            self._stats["sent_tokens"] += sum(message_tokens(message) for message in messages)
+            self._stats["history_tokens"] += sum(message_tokens(message) for message in history)
+            return messages
+
+    def _summary_tokens(self):
+        return message_tokens({"content": SUMMARY_HEADER + self.summary}) if self.summary else 0
+
+    def _fold_point(self, recent):
+        # Fewest leading messages to fold so the rest fit under the low-water
+        # mark, moved forward to the next user message to keep turns whole.
+        # The latest turn is always kept, whatever its size
+        target = self.low_water * self.budget - self._summary_tokens()
+        remaining = sum(message_tokens(message) for message in recent)
+        last_turn = max([i for i, message in enumerate(recent) if message["role"] == "user"], default=len(recent))
+        folded = 0
+        while folded < last_turn and (remaining > target or recent[folded]["role"] != "user"):
+            remaining -= message_tokens(recent[folded])
+            folded += 1
+        return folded
+
+    def _fold(self, messages):
+        if not messages:
+            return
+        try:
+            self.summary = self.summarize(self.summary, messages).strip()
+            self._stats["summaries"] += 1
+        except Exception:
+            # Still drop the turns: an over-long prompt is worse than a stale summary
+            self._stats["summary_errors"] += 1
+        self.summarized += len(messages)
+        self._covered = _digest(messages, self._covered)
+        self._stats["folded"] += len(messages)
+
+    def stats(self):
+        """
+        Windows built, summaries computed (and failed), messages folded, and
+        the estimated tokens sent versus the full history's.
+        """
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,73 @@
+# cluster_recommender.py
+
+import pickle
+
+import numpy as np
+
+from catalog_store import GENRE_COLUMNS, genre_flags
+
+KMEANS_PATH = "models/kmeans_genre_classifier.pkl"
+SCALER_PATH = "models/genre_scaler.pkl"
+
+
+def load_genre_models(kmeans_path=KMEANS_PATH, scaler_path=SCALER_PATH):
+    """
+    Load the KMeans genre classifier and its StandardScaler from
+    notebooks/5_modeling_and_evaluation.ipynb.
+    """
+    with open(kmeans_path, 'rb') as f:
+        kmeans = pickle.load(f)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    return kmeans, scaler
+
+
+class ClusterRecommender:
+    """
+    Same-cluster recommendations served from per-cluster lists of catalog rows,
+    precomputed at load and ordered by popularity (most popular first).
+
+    Catalog rows are labelled with the shipped model rather than the CSV's
+    `cluster` column (which came from a different KMeans run), so catalog songs
+    and songs outside the catalog share one label space.
+    """
+
+    def __init__(self, songs_df, kmeans, scaler):
+        self.kmeans = kmeans
+        self.scaler = scaler
+        self.labels = self._predict(songs_df[GENRE_COLUMNS].to_numpy())
+
+        # Rows grouped by cluster, each group ordered by popularity
+        by_popularity = np.argsort(-songs_df['popularity'].to_numpy(), kind='stable')
+        grouped = by_popularity[np.argsort(self.labels[by_popularity], kind='stable')]
+        counts = np.bincount(self.labels, minlength=kmeans.n_clusters)
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        self.cluster_rows = [grouped[bounds[c]:bounds[c + 1]] for c in range(kmeans.n_clusters)]
+
+    def _predict(self, genre_matrix):
+        import pandas as pd  # Only built once a catalog (and so pandas) is loaded
+        features = pd.DataFrame(np.atleast_2d(genre_matrix), columns=GENRE_COLUMNS)
+        return self.kmeans.predict(self.scaler.transform(features)).astype(np.int64)
+
+    def cluster_for_row(self, row):
+        return int(self.labels[row])
+
+    def cluster_for_genres(self, genres):
+        """
+        Assign a song outside the catalog to a cluster from its genre names.
+        """
+        return int(self._predict(genre_flags(genres))[0])
+
+    def recommend(self, cluster, exclude_rows=(), limit=5):
+        """
+        Return up to `limit` of the most popular catalog rows in `cluster`.
+        """
+        exclude_rows = set(exclude_rows)
+        rows = []
+        for row in self.cluster_rows[cluster]:
+            if row in exclude_rows:
+                continue
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return np.asarray(rows, dtype=np.int64)
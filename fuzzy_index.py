@@ -0,0 +1,185 @@
+# fuzzy_index.py
+"""
+Character-trigram index that resolves identified songs to catalog rows.
+
+ACRCloud and metadata results spell artists and titles differently from the
+catalog ("A, B" joined artists, accents, "feat." credits, "- 2019 Remaster"
+suffixes), so exact lowercase equality misses them. Titles and artists are
+normalized, split into character trigrams and stored as CSR posting lists;
+a lookup counts shared trigrams over the query's postings only and scores
+candidates with the Dice coefficient.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+
+from catalog_index import sort_vocabulary
+
+_FEAT = re.compile(r"\s*[\(\[]\s*(feat|ft|featuring|with)\b[^\)\]]*[\)\]]", re.IGNORECASE)
+_VERSION_SUFFIX = re.compile(r"\s+-\s+[^-]*\b(remaster(ed)?|version|edit|mix|live|mono|stereo)\b.*$", re.IGNORECASE)
+_ARTIST_SPLIT = re.compile(r"\s*(?:,|&|;|/|\bfeat\.?|\bft\.?|\bfeaturing\b|\bx\b|\band\b|\bwith\b)\s*", re.IGNORECASE)
+_NON_WORD = re.compile(r"[^\w]+")
+
+TITLE_WEIGHT = 0.65
+ARTIST_WEIGHT = 0.35
+_DENSE_COUNT_LIMIT = 1 << 18
+
+
+def normalize_text(value):
+    """
+    Lowercase, strip accents and punctuation, collapse whitespace.
+    """
+    if not isinstance(value, str):
+        return ""
+    value = unicodedata.normalize('NFKD', value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", value.lower()).split())
+
+
+def normalize_title(title):
+    """
+    Normalize a track title, dropping "(feat. X)" credits and version suffixes.
+    """
+    if not isinstance(title, str):
+        return ""
+    title = _VERSION_SUFFIX.sub("", _FEAT.sub("", title))
+    return normalize_text(title)
+
+
+def split_artists(artist):
+    """
+    Split a joined artist credit ("A, B feat. C") into normalized names.
+    """
+    if not isinstance(artist, str):
+        return []
+    names = [normalize_text(name) for name in _ARTIST_SPLIT.split(artist)]
+    return [name for name in names if name]
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} if text else set()
+
+
+class _TrigramPostings:
+    """
+    Trigram -> sorted row ids (CSR), plus each row's trigram count. The
+    trigrams are a sorted UTF-8 byte-string array, so the whole index is
+    plain arrays that can live in shared memory.
+    """
+
+    FIELDS = ("grams", "offsets", "rows", "sizes")
+
+    def __init__(self, grams, offsets, rows, sizes):
+        self.grams = grams
+        self.offsets = offsets
+        self.rows = rows
+        self.sizes = sizes
+
+    @classmethod
+    def build(cls, texts):
+        vocabulary, gram_ids, row_ids = {}, [], []
+        sizes = np.zeros(len(texts), dtype=np.int32)
+        for row, text in enumerate(texts):
+            grams = trigrams(text)
+            sizes[row] = len(grams)
+            for gram in grams:
+                gram_ids.append(vocabulary.setdefault(gram, len(vocabulary)))
+                row_ids.append(row)
+        grams, positions = sort_vocabulary(vocabulary)
+        gram_ids = positions[np.asarray(gram_ids, dtype=np.int64)]
+        order = np.argsort(gram_ids, kind='stable')
+        rows = np.asarray(row_ids, dtype=np.int32)[order]
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(gram_ids, minlength=len(grams)))))
+        return cls(grams, offsets, rows, sizes)
+
+    def overlaps(self, text):
+        """
+        Return (row ids, shared trigram counts, query trigram count).
+        """
+        grams = trigrams(text)
+        keys = np.array([gram.encode('utf-8') for gram in grams], dtype=np.bytes_)
+        positions = np.searchsorted(self.grams, keys)
+        found = positions < len(self.grams)
+        found[found] = self.grams[positions[found]] == keys[found]
+        ids = positions[found]
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), len(grams)
+        postings = np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        if len(self.sizes) <= _DENSE_COUNT_LIMIT:
+            # A dense bincount beats sorting the postings on small catalogs
+            counts = np.bincount(postings, minlength=len(self.sizes))
+            rows = np.flatnonzero(counts)
+            return rows, counts[rows], len(grams)
+        rows, counts = np.unique(postings, return_counts=True)
+        return rows, counts, len(grams)
+
+    def dice(self, text):
+        rows, counts, size = self.overlaps(text)
+        return rows, 2.0 * counts / (size + self.sizes[rows])
+
+
+class FuzzySongIndex:
+    """
+    Fuzzy resolution of (track name, artist) to catalog rows.
+    """
+
+    def __init__(self, songs_df):
+        self.titles = _TrigramPostings.build([normalize_title(t) for t in songs_df['track_name'].tolist()])
+        self.artists = _TrigramPostings.build([normalize_text(a) for a in songs_df['artist'].tolist()])
+
+    def to_arrays(self):
+        """
+        The index as {name: np.ndarray}, the inverse of `from_arrays`.
+        """
+        return {f"{name}.{field}": getattr(postings, field)
+                for name, postings in (("titles", self.titles), ("artists", self.artists))
+                for field in _TrigramPostings.FIELDS}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Wrap the arrays of `to_arrays` (e.g. shared memory views) without copying them.
+        """
+        index = cls.__new__(cls)
+        index.titles, index.artists = (
+            _TrigramPostings(*(arrays[f"{name}.{field}"] for field in _TrigramPostings.FIELDS))
+            for name in ("titles", "artists"))
+        return index
+
+    def resolve(self, track_name, artist=None, limit=5, min_score=0.5):
+        """
+        Return up to `limit` (row, score) pairs, best first. The score is the
+        title trigram Dice, blended with the best-matching credited artist
+        when `artist` is given.
+        """
+        rows, scores = self.titles.dice(normalize_title(track_name))
+        if len(rows) == 0:
+            return []
+
+        names = split_artists(artist)
+        if names:
+            artist_scores = np.zeros(len(rows))
+            for name in names:
+                artist_rows, name_scores = self.artists.dice(name)
+                # Both row arrays are sorted: align artist scores onto title candidates
+                positions = np.searchsorted(artist_rows, rows)
+                found = positions < len(artist_rows)
+                found[found] = artist_rows[positions[found]] == rows[found]
+                artist_scores[found] = np.maximum(artist_scores[found], name_scores[positions[found]])
+            scores = TITLE_WEIGHT * scores + ARTIST_WEIGHT * artist_scores
+
+        keep = np.flatnonzero(scores >= min_score)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+        keep = keep[np.argsort(-scores[keep], kind='stable')]
+        return [(int(rows[i]), float(scores[i])) for i in keep]
+
+    def best_match(self, track_name, artist=None, min_score=0.8):
+        """
+        The single best catalog row for a song, or None below `min_score`.
+        """
+        matches = self.resolve(track_name, artist, limit=1, min_score=min_score)
+        return matches[0][0] if matches else None
@@ -0,0 +1,183 @@
+# http_client.py
+"""
+Shared HTTP client for the upstream APIs (ACRCloud, LRCLIB, Shazam).
+
+One `HTTPAdapter` per host keeps a pool of keep-alive connections, so
+repeated calls skip the TCP + TLS handshake. The adapters (and their
+urllib3 pools, which are thread-safe) are shared by the whole process, but
+`requests.Session` is not documented as thread-safe (its cookie jar and
+adapter table are mutated per request), so every thread gets its own
+lightweight Session mounting the shared adapters.
+Every call gets a (connect, read) timeout and is retried a bounded number of
+times with jittered exponential backoff on connection errors, timeouts, 5xx
+and 429 (honouring `Retry-After`). Each attempt first takes a token from
+its upstream's rate limiter (`rate_limit.py`), queueing instead of sending
+a request the provider would answer with 429. Latency, retries and failures
+are recorded per endpoint; `stats()` returns a snapshot.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limit
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25  # Seconds; attempt n sleeps up to BACKOFF_BASE * 2**n
+BACKOFF_MAX = 4.0
+POOL_SIZE = 16
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_LATENCY_WINDOW = 512
+
+_lock = threading.Lock()
+_adapters = {}
+_local = threading.local()
+_stats = {}
+
+
+def _adapter_for(key):
+    adapter = _adapters.get(key)
+    if adapter is None:
+        with _lock:
+            adapter = _adapters.get(key)
+            if adapter is None:
+                # Retries are handled in `request` so they can be timed and jittered
+                adapter = _adapters[key] = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+    return adapter
+
+
+def session_for(url):
+    """
+    This thread's session for `url`'s scheme and host, over the host's
+    shared connection pool.
+    """
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    sessions = getattr(_local, "sessions", None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+    session = sessions.get(key)
+    if session is None:
+        session = sessions[key] = requests.Session()
+        session.mount(key, _adapter_for(key))
+    return session
+
+
+def _backoff(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    # "Full jitter": spreads retries from concurrent callers apart
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(method, url, endpoint=None, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, **kwargs):
+    """
+    Send a request through the pooled session for `url`'s host.
+
+    Retries connection errors, timeouts and RETRY_STATUSES up to `retries`
+    times. Returns the last response (callers check the status as before) or
+    raises the last `requests.RequestException` (`RateLimitExceeded` when
+    the upstream's rate limit queue is too long). `endpoint` names the call in
+    `stats()`; it defaults to the URL without its query string.
+    """
+    endpoint = endpoint or url
+    session = session_for(url)
+    attempt = 0
+    while True:
+        response = None
+        rate_limit.acquire(endpoint)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record(endpoint, time.perf_counter() - start, error=type(e).__name__)
+            if attempt >= retries:
+                raise
+        else:
+            _record(endpoint, time.perf_counter() - start, status=response.status_code)
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            response.close()  # Hand the connection back to the pool before retrying
+        _record_retry(endpoint)
+        time.sleep(_backoff(attempt, response))
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def _endpoint_stats(endpoint):
+    stats = _stats.get(endpoint)
+    if stats is None:
+        stats = _stats.setdefault(endpoint, {
+            "calls": 0, "retries": 0, "errors": 0, "statuses": {},
+            "latencies": deque(maxlen=_LATENCY_WINDOW),
+        })
+    return stats
+
+
+def _record(endpoint, seconds, status=None, error=None):
+    with _lock:
+        stats = _endpoint_stats(endpoint)
+        stats["calls"] += 1
+        stats["latencies"].append(seconds)
+        key = str(status) if status is not None else error
+        stats["statuses"][key] = stats["statuses"].get(key, 0) + 1
+        if error is not None or status >= 500:
+            stats["errors"] += 1
+
+
+def _record_retry(endpoint):
+    with _lock:
+        _endpoint_stats(endpoint)["retries"] += 1
+
+
+def percentile(values, q):
+    """
+    The `q`th percentile (0-100) of sorted `values`, interpolating linearly
+    between the closest ranks like numpy's default; None if empty.
+    """
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def stats():
+    """
+    Per-endpoint snapshot: attempts, retries, errors, status counts and
+    p50/p95/max latency (seconds) over the last calls.
+    """
+    with _lock:
+        snapshot = {}
+        for endpoint, values in _stats.items():
+            latencies = sorted(values["latencies"])
+            snapshot[endpoint] = {
+                "calls": values["calls"],
+                "retries": values["retries"],
+                "errors": values["errors"],
+                "statuses": dict(values["statuses"]),
+                "p50_seconds": percentile(latencies, 50),
+                "p95_seconds": percentile(latencies, 95),
+                "max_seconds": latencies[-1] if latencies else None,
+            }
+        return snapshot
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
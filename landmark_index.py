@@ -0,0 +1,266 @@
+# landmark_index.py
+"""
+Offline song recognition with landmark ("constellation") fingerprints.
+
+Audio is reduced to 8 kHz mono and turned into a log-magnitude spectrogram.
+Local maxima of the spectrogram (peaks) are paired with the next FAN_OUT
+peaks inside a target zone; each pair becomes a 32-bit hash of
+(anchor frequency, target frequency, time delta), stored with the anchor's
+frame offset. A reference track's hashes go into an on-disk index sorted by
+hash (`hashes.npy`, `track_ids.npy`, `offsets.npy`, memory-mapped, plus
+`tracks.json`).
+
+A query looks up all of its hashes with `searchsorted`, and for every hit
+computes (reference offset - query offset). A real match shows up as many
+hits of one track at a single offset difference, so the score is the
+tallest bin of the per-track offset histogram.
+
+Reference tracks are WAV files; an optional `<name>.json` sidecar supplies
+ACRCloud-style metadata (`title`, `artists`, `album`, `duration_ms`),
+otherwise "Artist - Title.wav" file names are parsed.
+
+    python landmark_index.py build data/reference_tracks
+    python landmark_index.py query song.wav
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from audio_processing import read_pcm, reduce_recording
+
+DEFAULT_INDEX_DIR = os.path.join("data", "cache", "landmarks")
+SAMPLE_RATE = 8000
+FFT_SIZE = 512
+HOP = 128  # 62.5 frames per second
+PEAK_NEIGHBOURHOOD = (15, 11)  # (frequency bins, frames)
+PEAK_FLOOR_DB = -60.0  # Ignore peaks this far below the clip's loudest bin
+PEAK_PROMINENCE_DB = 10.0  # Peaks must stand this far above their bin's median (noise floor)
+PEAKS_PER_SECOND = 30
+FAN_OUT = 8
+MAX_DELTA_FRAMES = 63
+MAX_DELTA_BINS = 63
+# Chance alignments of an unseen clip reach ~10-14 hashes in a 500-track
+# index (more for longer clips and larger indexes: 15 at 2000 tracks), while
+# a real match aligns ~7-9% of the clip's hashes; see the unseen queries of
+# benchmarks/bench_landmark_index.py
+MIN_MATCHES = 15  # Aligned hashes needed to accept a match
+MIN_MATCH_RATE = 0.02  # ... and at least this fraction of the query's hashes
+MIN_MATCHES_PER_DOUBLING = 1.0  # ... plus this per doubling of postings hit per query hash above one
+MIN_MARGIN = 1.5  # Best track's score over the runner-up's
+_ARRAYS = ("hashes", "track_ids", "offsets")
+
+
+def spectrogram_peaks(samples, rate):
+    """
+    (frames, bins) of the spectrogram's local maxima, strongest
+    PEAKS_PER_SECOND per second, sorted by frame.
+    """
+    from scipy.ndimage import maximum_filter  # Heavy; only needed once a recording is matched
+
+    samples, rate = reduce_recording(samples, rate, SAMPLE_RATE, max_seconds=None, silence_db=None)
+    if len(samples) < FFT_SIZE:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP]
+    spectrum = np.abs(np.fft.rfft(windows * np.hanning(FFT_SIZE), axis=1)).T  # bins x frames
+    log_spectrum = 20 * np.log10(spectrum + 1e-10)
+
+    is_peak = (log_spectrum == maximum_filter(log_spectrum, size=PEAK_NEIGHBOURHOOD, mode='constant',
+                                              cval=-np.inf))
+    is_peak &= log_spectrum > log_spectrum.max() + PEAK_FLOOR_DB
+    is_peak &= log_spectrum > np.median(log_spectrum, axis=1, keepdims=True) + PEAK_PROMINENCE_DB
+    bins, frames = np.nonzero(is_peak)
+    limit = max(1, int(PEAKS_PER_SECOND * len(samples) / rate))
+    if len(bins) > limit:
+        keep = np.argpartition(-log_spectrum[bins, frames], limit - 1)[:limit]
+        bins, frames = bins[keep], frames[keep]
+    order = np.lexsort((bins, frames))
+    return frames[order], bins[order]
+
+
+def landmark_hashes(samples, rate):
+    """
+    (uint32 hashes, int32 anchor frames) for every peak pair of a clip.
+    """
+    frames, bins = spectrogram_peaks(samples, rate)
+    hashes, anchors = [], []
+    for step in range(1, FAN_OUT + 1):
+        # Pair each peak with the step-th next one (peaks are sorted by frame)
+        delta_t = frames[step:] - frames[:-step]
+        delta_f = bins[step:] - bins[:-step]
+        valid = (delta_t > 0) & (delta_t <= MAX_DELTA_FRAMES) & (np.abs(delta_f) <= MAX_DELTA_BINS)
+        anchor_bins = bins[:-step][valid]
+        hashes.append((anchor_bins << 16) | ((delta_f[valid] + MAX_DELTA_BINS) << 6) | delta_t[valid])
+        anchors.append(frames[:-step][valid])
+    if not hashes:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int32)
+    return np.concatenate(hashes).astype(np.uint32), np.concatenate(anchors).astype(np.int32)
+
+
+def track_metadata(path):
+    """
+    ACRCloud-style metadata for a reference track: its JSON sidecar, or
+    title and artist parsed from an "Artist - Title" file name.
+    """
+    stem = os.path.splitext(path)[0]
+    try:
+        with open(f"{stem}.json", encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    name = os.path.basename(stem)
+    artist, _, title = name.partition(" - ")
+    return {"title": title or artist, "artists": [{"name": artist}] if title else []}
+
+
+class LandmarkIndex:
+    """
+    Sorted landmark hash table over reference tracks; see the module docstring.
+    """
+
+    def __init__(self, hashes, track_ids, offsets, tracks):
+        self.hashes = hashes
+        self.track_ids = track_ids
+        self.offsets = offsets
+        self.tracks = tracks
+
+    @classmethod
+    def build(cls, paths):
+        hashes, track_ids, offsets, tracks = [], [], [], []
+        for track_id, path in enumerate(paths):
+            samples, rate = read_pcm(path)
+            track_hashes, anchors = landmark_hashes(samples, rate)
+            hashes.append(track_hashes)
+            offsets.append(anchors)
+            track_ids.append(np.full(len(track_hashes), track_id, dtype=np.uint32))
+            tracks.append({"path": os.path.abspath(path), "seconds": round(len(samples) / rate, 2),
+                           "metadata": track_metadata(path)})
+        if not tracks:
+            return cls(np.empty(0, np.uint32), np.empty(0, np.uint32), np.empty(0, np.int32), [])
+        hashes = np.concatenate(hashes)
+        order = np.argsort(hashes, kind='stable')
+        return cls(hashes[order], np.concatenate(track_ids)[order], np.concatenate(offsets)[order], tracks)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "tracks.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.tracks, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "tracks.json"), encoding='utf-8') as f:
+            tracks = json.load(f)
+        return cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS), tracks)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def match(self, samples, rate, min_matches=MIN_MATCHES, min_rate=MIN_MATCH_RATE, min_margin=MIN_MARGIN,
+              per_doubling=MIN_MATCHES_PER_DOUBLING):
+        """
+        Best (track id, aligned hash count, offset in seconds) for a clip,
+        or None unless the best track has `min_matches` aligned hashes, at
+        least `min_rate` of the clip's hashes (long clips align more by
+        chance), and `min_margin` times the runner-up's. `min_matches` rises
+        by `per_doubling` for each doubling of the postings hit per query
+        hash, since a denser index offers more chance alignments.
+        """
+        query_hashes, query_offsets = landmark_hashes(samples, rate)
+        starts = np.searchsorted(self.hashes, query_hashes, side='left')
+        stops = np.searchsorted(self.hashes, query_hashes, side='right')
+        counts = stops - starts
+        if counts.sum() == 0:
+            return None
+
+        # Expand every query hash into its postings without a Python loop
+        hit_query = np.repeat(np.arange(len(query_hashes)), counts)
+        hit_rank = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        postings = starts[hit_query] + hit_rank
+        deltas = self.offsets[postings].astype(np.int64) - query_offsets[hit_query]
+
+        # Offset histogram per track: count identical (track, delta) pairs
+        keys = self.track_ids[postings].astype(np.int64) << 32 | (deltas + (1 << 31))
+        bins, bin_counts = np.unique(keys, return_counts=True)
+        bin_tracks = bins >> 32
+        best_per_track = np.zeros(len(self.tracks), dtype=np.int64)
+        np.maximum.at(best_per_track, bin_tracks, bin_counts)
+        ranked = np.argsort(-best_per_track, kind='stable')
+        best = int(ranked[0])
+        score = int(best_per_track[best])
+        runner_up = int(best_per_track[ranked[1]]) if len(ranked) > 1 else 0
+        density = counts.sum() / len(query_hashes)
+        min_score = max(min_matches + per_doubling * max(0.0, np.log2(density)), min_rate * len(query_hashes))
+        if score < min_score or score < min_margin * runner_up:
+            return None
+        best_bin = bins[bin_tracks == best][np.argmax(bin_counts[bin_tracks == best])]
+        offset_frames = int(best_bin & 0xFFFFFFFF) - (1 << 31)
+        return best, score, offset_frames * HOP / SAMPLE_RATE
+
+    def identify(self, path):
+        """
+        ACRCloud-shaped identify response for a recording, or None on a miss.
+        """
+        samples, rate = read_pcm(path)
+        found = self.match(samples, rate)
+        if found is None:
+            return None
+        track_id, score, offset = found
+        track = self.tracks[track_id]
+        music = dict(track["metadata"], score=score, play_offset_ms=int(offset * 1000), source="local")
+        music.setdefault("duration_ms", int(track["seconds"] * 1000))
+        return {"status": {"code": 0, "msg": "Success"}, "metadata": {"music": [music]}}
+
+
+def reference_paths(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(".wav"))
+
+
+def load_index(path=DEFAULT_INDEX_DIR):
+    """
+    The index at `path`, or None if it has not been built.
+    """
+    try:
+        return LandmarkIndex.load(path)
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the local landmark fingerprint index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index every WAV file of a directory")
+    build.add_argument("directory")
+    build.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    query = sub.add_parser("query", help="Identify recordings against the index")
+    query.add_argument("paths", nargs="+")
+    query.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = LandmarkIndex.build(reference_paths(args.directory))
+        index.save(args.index)
+        print(f"Indexed {len(index)} tracks ({len(index.hashes)} hashes) "
+              f"in {time.perf_counter() - start:.1f}s -> {args.index}")
+        return
+
+    index = LandmarkIndex.load(args.index)
+    for path in args.paths:
+        start = time.perf_counter()
+        result = index.identify(path)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result is None:
+            print(f"{path}: no match ({elapsed:.1f} ms)")
+        else:
+            music = result["metadata"]["music"][0]
+            print(f"{path}: {music.get('title')} (score {music['score']}, "
+                  f"at {music['play_offset_ms'] / 1000:.1f}s, {elapsed:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
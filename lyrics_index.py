@@ -0,0 +1,374 @@
+# lyrics_index.py
+"""
+Local full-text index of song lyrics (SQLite FTS5).
+
+Every LRCLIB record the app fetches (`/get` lookups and `/search` results)
+is added as a side effect, and the index can be bulk-loaded from a dump.
+Records are de-duplicated on (normalized title, artist, rounded duration)
+and stored in a plain table; an external-content FTS5 table over title,
+artist and plain lyrics is kept in sync by triggers.
+
+A search first looks for the query as an exact phrase in the lyrics, then
+for documents containing all of its words; both are ranked by BM25 with the
+title weighted above the artist and the lyrics. Queries matching more than
+MAX_RANKED_MATCHES documents are not ranked (BM25 would have to score every
+one of them): the first matches found are returned as they are, and the
+search counts as "broad" in the stats.
+
+A phrase hit of at least MIN_PHRASE_WORDS words counts as a strong match,
+which the Lyrics tab shows without asking LRCLIB, but only when the phrase
+is selective: found in at most STRONG_MATCH_SHARE of the indexed documents.
+A common phrase says little about which song is meant (and a small index
+filled by the app's own lookups may not hold the right one), so its local
+matches are merged with LRCLIB's results instead.
+
+    python lyrics_index.py load lrclib-dump.jsonl
+    python lyrics_index.py search "hello from the other side"
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from fuzzy_index import normalize_text, normalize_title
+from response_cache import connect
+
+DEFAULT_PATH = os.path.join("data", "cache", "lyrics.sqlite3")
+DEFAULT_LIMIT = 20
+MIN_PHRASE_WORDS = 3  # Shorter phrases are too common to trust the local index alone
+BM25_WEIGHTS = (4.0, 2.0, 1.0)  # title, artist, lyrics
+MAX_RANKED_MATCHES = 5000  # Broader queries are too unspecific to rank (BM25 scores every match)
+STRONG_MATCH_SHARE = 0.001  # Phrase hits in at most this share of the documents are selective
+RERANK_CANDIDATES = 4  # Phrase matches fetched per result, ranked by bm25() in SQL, then re-ranked here
+_BATCH_SIZE = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lyrics (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    track_name TEXT,
+    artist TEXT,
+    album TEXT,
+    duration REAL,
+    instrumental INTEGER NOT NULL DEFAULT 0,
+    plain_lyrics TEXT,
+    synced_lyrics TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS lyrics_fts USING fts5(
+    track_name, artist, plain_lyrics,
+    content='lyrics', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS lyrics_ai AFTER INSERT ON lyrics BEGIN
+    INSERT INTO lyrics_fts (rowid, track_name, artist, plain_lyrics)
+    VALUES (new.id, new.track_name, new.artist, new.plain_lyrics);
+END;
+CREATE TRIGGER IF NOT EXISTS lyrics_ad AFTER DELETE ON lyrics BEGIN
+    INSERT INTO lyrics_fts (lyrics_fts, rowid, track_name, artist, plain_lyrics)
+    VALUES ('delete', old.id, old.track_name, old.artist, old.plain_lyrics);
+END;
+CREATE TRIGGER IF NOT EXISTS lyrics_au AFTER UPDATE ON lyrics BEGIN
+    INSERT INTO lyrics_fts (lyrics_fts, rowid, track_name, artist, plain_lyrics)
+    VALUES ('delete', old.id, old.track_name, old.artist, old.plain_lyrics);
+    INSERT INTO lyrics_fts (rowid, track_name, artist, plain_lyrics)
+    VALUES (new.id, new.track_name, new.artist, new.plain_lyrics);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO lyrics (key, track_name, artist, album, duration, instrumental, plain_lyrics, synced_lyrics, indexed_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    track_name = excluded.track_name, artist = excluded.artist, album = excluded.album,
+    duration = excluded.duration, instrumental = excluded.instrumental,
+    plain_lyrics = excluded.plain_lyrics, synced_lyrics = excluded.synced_lyrics,
+    indexed_at = excluded.indexed_at
+WHERE lyrics.plain_lyrics IS NOT excluded.plain_lyrics OR lyrics.synced_lyrics IS NOT excluded.synced_lyrics
+"""
+
+_COUNT = "SELECT COUNT(*) FROM (SELECT rowid FROM lyrics_fts WHERE lyrics_fts MATCH ? LIMIT ?)"
+_COLUMNS = "l.track_name, l.artist, l.album, l.duration, l.instrumental, l.plain_lyrics, l.synced_lyrics"
+# Rank on rowids alone so only the rows kept are read from the lyrics table
+_SELECT_RANKED = f"""
+SELECT {_COLUMNS} FROM (
+    SELECT rowid, bm25(lyrics_fts, ?, ?, ?) AS score FROM lyrics_fts
+    WHERE lyrics_fts MATCH ? ORDER BY score LIMIT ?
+) AS m JOIN lyrics AS l ON l.id = m.rowid ORDER BY m.score
+"""
+_SELECT_FIRST = f"""
+SELECT {_COLUMNS} FROM lyrics_fts JOIN lyrics AS l ON l.id = lyrics_fts.rowid
+WHERE lyrics_fts MATCH ? LIMIT ?
+"""
+BM25_K1 = 1.2  # FTS5's bm25() parameters
+BM25_B = 0.75
+
+
+def lyrics_key(item):
+    """
+    De-duplication key of an LRCLIB record: (title, artist, rounded duration).
+    """
+    return (normalize_title(item.get("trackName")), normalize_text(item.get("artistName")),
+            round(item.get("duration") or 0))
+
+
+def _row(item, now):
+    return ("|".join(map(str, lyrics_key(item))), item.get("trackName"), item.get("artistName"),
+            item.get("albumName"), item.get("duration"), int(bool(item.get("instrumental"))),
+            item.get("plainLyrics"), item.get("syncedLyrics"), now)
+
+
+def _record(row):
+    track_name, artist, album, duration, instrumental, plain, synced = row
+    return {"trackName": track_name, "artistName": artist, "albumName": album, "duration": duration,
+            "instrumental": bool(instrumental), "plainLyrics": plain, "syncedLyrics": synced}
+
+
+def rank_phrase_matches(records, phrase):
+    """
+    Order records by BM25 of `phrase` (normalized) in their lyrics, as
+    counted on the normalized text rather than FTS5's tokens. With a single
+    phrase every record shares the IDF, so this is the order FTS5's bm25()
+    gives, with the average length taken over the candidates.
+    """
+    needle = f" {phrase} "
+    texts = [f" {normalize_text(record.get('plainLyrics'))} " for record in records]
+    lengths = [len(text.split()) for text in texts]
+    average = sum(lengths) / len(lengths) if lengths else 1
+
+    def score(i):
+        frequency = texts[i].count(needle)
+        return frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * lengths[i] / average))
+
+    return [records[i] for i in sorted(range(len(records)), key=score, reverse=True)]
+
+
+def _quoted(words):
+    # Quote every word so FTS5 operators (AND, OR, NOT, NEAR) are taken literally
+    return " ".join(f'"{word}"' for word in words)
+
+
+class LyricsIndex:
+    """
+    SQLite FTS5 lyrics index; see the module docstring.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"indexed": 0, "strong": 0, "weak": 0, "misses": 0, "broad": 0}
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path, _SCHEMA)
+        return connection
+
+    def _count(self, outcome, amount=1):
+        with self._lock:
+            self._stats[outcome] += amount
+
+    def add(self, items):
+        """
+        Index LRCLIB records (dicts with trackName, artistName, plainLyrics, ...);
+        records without lyrics are skipped. Returns the number written.
+        """
+        now = time.time()
+        rows = [_row(item, now) for item in items if isinstance(item, dict) and item.get("plainLyrics")]
+        if not rows:
+            return 0
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for start in range(0, len(rows), _BATCH_SIZE):
+                    connection.executemany(_UPSERT, rows[start:start + _BATCH_SIZE])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            return 0  # Indexing is a side effect; a locked file must not fail the lookup
+        self._count("indexed", len(rows))
+        return len(rows)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Return (LRCLIB-shaped records, strong): phrase matches in the lyrics
+        first, then documents with all query words, each ranked by BM25 (or
+        unranked past MAX_RANKED_MATCHES matches).
+        """
+        words = normalize_text(query).split()
+        if not words:
+            return [], False
+        phrase = " ".join(words)
+        try:
+            connection = self._connection()
+            # Phrase pass: a few matches are all ranked here, more are cut to the
+            # best candidates by bm25() in SQL first (which walks the phrase's
+            # often very common words a second time for its IDF), so a common
+            # phrase reads a few rows rather than every match's lyrics
+            phrase_query = f"plain_lyrics : {_quoted([phrase])}"
+            phrase_hits = connection.execute(_COUNT, (phrase_query, MAX_RANKED_MATCHES + 1)).fetchone()[0]
+            broad = phrase_hits > MAX_RANKED_MATCHES
+            candidates = limit if broad else RERANK_CANDIDATES * limit
+            rows = self._matches(connection, phrase_query, candidates,
+                                 ranked=candidates < phrase_hits <= MAX_RANKED_MATCHES)
+            results = rank_phrase_matches([_record(row) for row in rows], phrase)[:limit]
+            seen = {lyrics_key(record) for record in results}
+            all_words = _quoted(words)
+            if len(results) < limit:
+                word_hits = connection.execute(_COUNT, (all_words, MAX_RANKED_MATCHES + 1)).fetchone()[0]
+                broad = broad or word_hits > MAX_RANKED_MATCHES
+                for row in self._matches(connection, all_words, limit, ranked=word_hits <= MAX_RANKED_MATCHES):
+                    record = _record(row)
+                    key = lyrics_key(record)
+                    if key not in seen:
+                        seen.add(key)
+                        results.append(record)
+            strong = 0 < phrase_hits <= STRONG_MATCH_SHARE * self._documents(connection) and \
+                len(words) >= MIN_PHRASE_WORDS
+        except sqlite3.Error:
+            self._count("misses")
+            return [], False
+        if broad:
+            self._count("broad")
+        self._count("strong" if strong else "weak" if results else "misses")
+        return results[:limit], strong
+
+    @staticmethod
+    def _matches(connection, query, limit, ranked):
+        if ranked:
+            return connection.execute(_SELECT_RANKED, (*BM25_WEIGHTS, query, limit))
+        return connection.execute(_SELECT_FIRST, (query, limit))
+
+    @staticmethod
+    def _documents(connection):
+        # Highest row id: rows are never deleted, and COUNT(*) would scan the table
+        return connection.execute("SELECT COALESCE(MAX(id), 0) FROM lyrics").fetchone()[0]
+
+    def __len__(self):
+        try:
+            return self._connection().execute("SELECT COUNT(*) FROM lyrics").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def bulk_load(self, items, batch_size=50000):
+        """
+        Index an iterable of LRCLIB records in large transactions, with FTS5
+        segment merging deferred to one `optimize` at the end. Returns the
+        number of records written.
+        """
+        connection = self._connection()
+        connection.execute("INSERT INTO lyrics_fts (lyrics_fts, rank) VALUES ('automerge', 0)")
+        written, batch = 0, []
+        try:
+            for item in items:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    written += self.add(batch)
+                    batch = []
+            written += self.add(batch)
+        finally:
+            connection.execute("INSERT INTO lyrics_fts (lyrics_fts, rank) VALUES ('automerge', 4)")
+            self.optimize()
+        return written
+
+    def optimize(self):
+        """
+        Merge the FTS5 b-tree segments into one.
+        """
+        self._connection().execute("INSERT INTO lyrics_fts (lyrics_fts) VALUES ('optimize')")
+
+
+def read_dump(path):
+    """
+    Yield LRCLIB records from a dump: JSON lines, a JSON array, or LRCLIB's
+    SQLite database dump (`tracks` joined with their latest `lyrics`).
+    """
+    if path.endswith((".sqlite3", ".sqlite", ".db")):
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for row in connection.execute(
+                    "SELECT t.name, t.artist_name, t.album_name, t.duration, l.instrumental, "
+                    "l.plain_lyrics, l.synced_lyrics FROM tracks AS t JOIN lyrics AS l ON l.id = t.last_lyrics_id"):
+                yield _record(row)
+        finally:
+            connection.close()
+        return
+    with open(path, encoding='utf-8') as f:
+        if f.read(1) == "[":
+            f.seek(0)
+            yield from json.load(f)
+            return
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+    """
+    The process-wide index at SONG_RADAR_LYRICS_INDEX (or DEFAULT_PATH).
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = LyricsIndex(os.getenv("SONG_RADAR_LYRICS_INDEX", DEFAULT_PATH))
+    return _default
+
+
+def add(items):
+    return default_index().add(items)
+
+
+def search(query, limit=DEFAULT_LIMIT):
+    return default_index().search(query, limit)
+
+
+def stats():
+    return default_index().stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load or query the local lyrics index.")
+    parser.add_argument("--index", default=os.getenv("SONG_RADAR_LYRICS_INDEX", DEFAULT_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="Bulk-load an LRCLIB dump (JSON lines, JSON array or SQLite)")
+    load.add_argument("dump")
+    query = sub.add_parser("search", help="Search the index")
+    query.add_argument("query")
+    query.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    index = LyricsIndex(args.index)
+    if args.command == "load":
+        start = time.perf_counter()
+        written = index.bulk_load(read_dump(args.dump))
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {written} records in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f}/s), "
+              f"{len(index)} documents in {args.index}")
+        return
+
+    start = time.perf_counter()
+    results, strong = index.search(args.query, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for item in results:
+        print(f"{item['trackName']} - {item['artistName']}")
+    print(f"{len(results)} results, {'strong' if strong else 'weak'} match ({elapsed:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,32 +3,25 @@
 import streamlit as st
 from frontend import render_frontend
 from audio_utils import record_audio
-from api_handler import identify_song
-from PIL import Image
-import pandas as pd
 import time
 import os
-from music_llm import render_chat_interface
-from sklearn.preprocessing import MultiLabelBinarizer
-import ast
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Load the dataset
-def load_data():
-    df = pd.read_csv("data/clean/7_clustered_dataset.csv")
-    df['genres'] = df['genres'].apply(ast.literal_eval)  # Convert string to list
-    df['genres_str'] = df['genres'].apply(lambda x: ', '.join(x) if isinstance(x, list) else '')  # Convert to string
-    return df
-
-songs_df = load_data()
-
-# Genre Columns for Cosine Similarity
-genre_columns = ['rock', 'pop', 'blues', 'metal', 'hip-hop', 'country', 'punk', 
-                 'jazz', 'rap', 'reggae', 'folk', 'soul', 'latin', 'dance', 'indie', 'classical']
-
-# Compute Cosine Similarity
-genre_matrix = songs_df[genre_columns].values
-cosine_sim = cosine_similarity(genre_matrix)
+from music_llm import chat_stats, render_chat_interface
+import answer_cache
+import http_client
+import rate_limit
+import response_cache
+# Everything that needs numpy (api_handler, resources and the catalog and
+# index modules) and the heavy dependencies behind it (pandas, scipy,
+# scikit-learn, Groq) is imported by the functions that use it, so the first
+# page renders with little more than Streamlit loaded
+
+RECOMMENDATION_MODES = {
+    "🎤 Artist & Genre": "genre",
+    "🧬 Genre Cluster": "cluster",
+    "🧭 Genre, Era & Style": "hybrid",
+    "🎼 Genre Similarity": "similarity",
+}
+LYRICS_RESULTS_SHOWN = 20  # Lyrics matches rendered (and formatted) per search
 
 def display_song_details(song_details):
     """
@@ -148,6 +141,8 @@ def main():
     
     # Render the frontend design
     render_frontend()
+
+    st.sidebar.radio("🎵 Recommend songs by", list(RECOMMENDATION_MODES), key="recommendation_mode")
     
     st.title("🎤 Record a Song or Search by Lyrics")
     
@@ -185,8 +180,8 @@ def main():
             
             if st.button("🔍 Identify Song"):
                 with st.spinner("🕵️‍♂️ Identifying the song..."):
+                    from api_handler import identify_song
                     song_details = identify_song(audio_file_path)
-                    time.sleep(2)  # Simulate processing time
                 if "error" not in song_details:
                     st.success("🎉 **Song Identified!**")
                     display_song_details(song_details)
@@ -229,6 +224,11 @@ def main():
                                     st.markdown(f"**Genre:** {result.get('Genre', 'N/A')}")
                                     st.markdown(f"**Duration:** {format_duration(result.get('Duration', 0)*60)}")
                                     st.markdown(f"**Released:** {result.get('Release_date', 'N/A')}")
+                                    catalog_rows = resolve_catalog_rows(result)
+                                    if catalog_rows:
+                                        from resources import get_catalog
+                                        popularity = get_catalog().songs_df['popularity'].iat[catalog_rows[0]]
+                                        st.markdown(f"**📀 In our catalog** (🔥 Popularity: {popularity})")
                                     
                                     if result.get('preview_url'):
                                         st.audio(result['preview_url'])
@@ -255,29 +255,29 @@ def main():
         
         if st.button("🔍 Search Lyrics"):
             if lyrics_query:
-                with st.spinner("Searching for songs..."):
-                    from api_handler import search_by_lyrics
-                    lyrics_results = search_by_lyrics(lyrics_query)
-                    
-                    if lyrics_results:
-                        st.success(f"Found {len(lyrics_results)} matching songs")
+                from api_handler import stream_search_by_lyrics
+                status = st.empty()
+                status.info("Searching for songs...")
+                shown = 0
+                # Render each match as soon as its LRCLIB search returns
+                for result in stream_search_by_lyrics(lyrics_query, limit=LYRICS_RESULTS_SHOWN):
+                    shown += 1
+                    status.success(f"Found {shown} matching songs")
+                    with st.container():
+                        st.markdown(f"### {result['track_name']}")
+                        st.markdown(f"**Artist:** {result['artist']}")
+                        if result.get('album'):
+                            st.markdown(f"**Album:** {result['album']}")
                         
-                        for result in lyrics_results:
-                            with st.container():
-                                st.markdown(f"### {result['track_name']}")
-                                st.markdown(f"**Artist:** {result['artist']}")
-                                if result.get('album'):
-                                    st.markdown(f"**Album:** {result['album']}")
-                                
-                                if result.get('instrumental'):
-                                    st.info("🎼 This is an instrumental track")
-                                else:
-                                    with st.expander("📝 View Lyrics"):
-                                        st.markdown(result['lyrics'].replace('\n', '  \n'))
-                                
-                                st.divider()
-                    else:
-                        st.error("No songs found with those lyrics.")
+                        if result.get('instrumental'):
+                            st.info("🎼 This is an instrumental track")
+                        else:
+                            with st.expander("📝 View Lyrics"):
+                                st.markdown(result['lyrics'].replace('\n', '  \n'))
+                        
+                        st.divider()
+                if shown == 0:
+                    status.error("No songs found with those lyrics.")
             else:
                 st.warning("Please enter some lyrics to search.")
     
@@ -293,50 +293,99 @@ def main():
         """)
         render_chat_interface()
 
+    # Catalog, indexes and models are built once per process, not per rerun;
+    # their timings are shown (and numpy loaded) after the page has rendered
+    render_resource_stats()
+
+    # Load the catalog after the page has rendered, ready for the first recommendation
+    import resources
+    if not resources.loaded("catalog"):
+        resources.warm("catalog", "song_resolver")
+
+# Link an identified song to catalog rows (exact match first, then fuzzy)
+def resolve_catalog_rows(song_details):
+    from resources import get_catalog, get_song_resolver
+    artist_name = song_details.get("artist", "")
+    track_name = song_details.get("track_name", "")
+    rows = get_catalog().index.find_rows(artist_name, track_name)
+    if rows:
+        return rows
+    row = get_song_resolver().best_match(track_name, artist_name)
+    return [row] if row is not None else []
+
 # Function to Get Similar Songs Based on Artist or Genres
-def get_recommendations(song_details, num_recommendations=5):
+def get_recommendations(song_details, num_recommendations=5, mode="genre"):
     """
     Recommend similar songs based on genre similarity and artist match.
     If no genres are found, recommendations are based solely on the artist.
+    With mode="cluster", recommend the most popular songs of the song's
+    KMeans genre cluster instead; with mode="hybrid", the nearest songs by
+    genre, era, duration, popularity and explicitness; with mode="similarity",
+    the most genre-similar songs (a slice of the precomputed neighbour table
+    for catalog songs).
     """
-    artist_name = song_details.get("artist", "").strip().lower()
+    from resources import get_ann_index, get_catalog, get_cluster_recommender, get_neighbour_table
+    artist_name = song_details.get("artist", "")
     song_genres = song_details.get("Genre", "").strip()
-    track_name = song_details.get("track_name", "").strip().lower()
-
-    # Get songs by the same artist
-    artist_songs = songs_df[songs_df['artist'].str.lower().str.strip() == artist_name]
-
-    # Check if genres are available
-    if song_genres:
-        # Convert genre string to a list
-        song_genres_list = [g.strip().lower() for g in song_genres.split(",")]
-
-        # Filter songs with at least one matching genre
-        genre_songs = songs_df[songs_df['genres'].apply(lambda x: any(g in x for g in song_genres_list))]
-
-        # Combine artist-based and genre-based recommendations
-        recommended_songs = pd.concat([artist_songs, genre_songs]).drop_duplicates(subset=['track_name', 'genres_str'])
-    else:
-        # No genre found, recommend based on artist only
-        recommended_songs = artist_songs
-    # If no recommendations are found, return artist-based songs only
-    if recommended_songs.empty:
-        recommended_songs = artist_songs
+    track_name = song_details.get("track_name", "")
+
+    # Convert genre string to a list (empty -> artist-only recommendations)
+    song_genres_list = [g.strip().lower() for g in song_genres.split(",")] if song_genres else []
+
+    catalog = get_catalog()
+    catalog_rows = resolve_catalog_rows(song_details)
+    if catalog_rows:
+        # Use the catalog's spelling so artist postings and self-exclusion match
+        artist_name = catalog.songs_df['artist'].iat[catalog_rows[0]]
+        track_name = catalog.songs_df['track_name'].iat[catalog_rows[0]]
+
+    if mode == "cluster":
+        clusters = get_cluster_recommender()
+        if catalog_rows:
+            cluster = clusters.cluster_for_row(catalog_rows[0])
+        elif song_genres_list:
+            # Not in the catalog: assign a cluster with the saved model
+            cluster = clusters.cluster_for_genres(song_genres_list)
+        else:
+            cluster = None
+        if cluster is not None:
+            rows = clusters.recommend(cluster, exclude_rows=catalog_rows, limit=num_recommendations)
+            return catalog.songs_df.iloc[rows]
+
+    if mode == "hybrid":
+        index = get_ann_index()
+        if catalog_rows:
+            rows, _ = index.search_row(catalog_rows[0], k=num_recommendations)
+        else:
+            from ann_index import song_features
+            query = song_features(song_details, index.meta["stats"], index.meta["weights"])
+            rows, _ = index.search(query, k=num_recommendations)
+        return catalog.songs_df.iloc[rows]
+
+    if mode == "similarity":
+        table = get_neighbour_table()
+        if catalog_rows and table is not None and num_recommendations <= table.meta["top_n"]:
+            rows, _ = table.neighbours(catalog_rows[0], k=num_recommendations)
+        elif catalog_rows:
+            rows, _ = catalog.similarity.top_k(catalog_rows[0], k=num_recommendations, tie_break=catalog.tie_break)
+        else:
+            from catalog_store import genre_flags
+            rows, _ = catalog.similarity.top_k_for_vector(genre_flags(song_genres), k=num_recommendations,
+                                                          tie_break=catalog.tie_break)
+        return catalog.songs_df.iloc[rows]
 
-    
-    recommended_songs = recommended_songs[
-        recommended_songs['track_name'].str.lower().str.strip() != track_name
-]
-    # Sort by popularity
-    recommended_songs = recommended_songs.sort_values(by='popularity', ascending=False)
+    # Merge the popularity-ordered artist and genre postings
+    rows = catalog.index.recommend(artist_name, song_genres_list,
+                                   exclude_track=track_name, limit=num_recommendations)
 
-    return recommended_songs.head(num_recommendations)
+    return catalog.songs_df.iloc[rows]
 
 # Function to Display Recommendations in Streamlit
 def display_recommendations(song_details):
     st.subheader("🎵 Recommended Songs")
 
-    recommendations = get_recommendations(song_details)
+    mode = RECOMMENDATION_MODES.get(st.session_state.get("recommendation_mode"), "genre")
+    recommendations = get_recommendations(song_details, mode=mode)
 
     if recommendations.empty:
         st.info("No recommendations found.")
@@ -355,16 +404,63 @@ def display_recommendations(song_details):
             st.markdown(f"### {row['track_name']}")
             st.markdown(f"**Artist:** {row['artist']}")
             st.markdown(f"**Album:** {row['album']}")
-            st.markdown(f"**Genre:** {', '.join(row['genres']) if row['genres'] else 'N/A'}")
+            st.markdown(f"**Genre:** {row['genres_str'] or 'N/A'}")
             st.markdown(f"**Release Year:** {row.get('release_year', 'N/A')}")
             st.markdown(f"**Duration:** {format_duration(row.get('duration_seconds', 0))}")
             st.markdown(f"**🔥 Popularity:** {row['popularity']}")
 
         st.markdown("---")
 
+# Sidebar timings proving reruns reuse the process-wide resources
+def render_resource_stats():
+    import lyrics_index
+    import recording_cache
+    import resources
+    with st.sidebar.expander("⏱️ Load Timings"):
+        if resources.loaded("catalog"):
+            start = time.perf_counter()
+            resources.get_catalog()
+            st.write(f"**This rerun:** {(time.perf_counter() - start) * 1000:.2f} ms to acquire the catalog")
+        else:
+            st.write("**Catalog:** loading in the background")
+        for name, stats in resources.stats().items():
+            if stats["build_seconds"] is not None:
+                st.write(f"**{name}:** built {stats['builds']}x "
+                         f"({stats['build_seconds'] * 1000:.0f} ms), reused {stats['gets']}x")
+        for endpoint, calls in http_client.stats().items():
+            st.write(f"**{endpoint}:** {calls['calls']} calls, {calls['retries']} retries, "
+                     f"p50 {calls['p50_seconds'] * 1000:.0f} ms, p95 {calls['p95_seconds'] * 1000:.0f} ms")
+        recordings = recording_cache.stats()
+        st.write(f"**cache recordings:** {recordings['hits']} hits, {recordings['near_hits']} near hits, "
+                 f"{recordings['misses']} misses")
+        for upstream, limits in rate_limit.stats().items():
+            if limits["acquired"] or limits["rejected"]:
+                st.write(f"**rate limit {upstream}:** {limits['queued']}/{limits['acquired']} queued "
+                         f"(max {limits['max_wait_seconds']:.1f} s), {limits['rejected']} rejected")
+        for endpoint, counts in response_cache.stats().items():
+            st.write(f"**cache {endpoint}:** {counts['hits']} hits, {counts['misses']} misses, "
+                     f"{counts['coalesced']} coalesced, {counts['stale']} stale")
+        chat = chat_stats()
+        if chat["first_token_p50"] is not None:
+            st.write(f"**chat:** {chat['completed']}/{chat['streams']} replies streamed, "
+                     f"{chat['cancelled']} cancelled, first token p50 {chat['first_token_p50'] * 1000:.0f} ms")
+        if "chat_window" in st.session_state:
+            window = st.session_state.chat_window.stats()
+            st.write(f"**chat history:** ~{window['sent_tokens']} of {window['history_tokens']} history tokens sent, "
+                     f"{window['summaries']} summaries over {window['folded']} messages")
+        answers = answer_cache.stats()
+        st.write(f"**chat answer cache:** {answers['hits']} hits, {answers['near_hits']} near hits, "
+                 f"{answers['misses']} misses")
+        lyrics = lyrics_index.stats()
+        st.write(f"**lyrics index:** {lyrics['strong']} local answers, {lyrics['weak']} weak, "
+                 f"{lyrics['misses']} misses, {lyrics['indexed']} indexed")
+        if st.button("🔄 Reload Catalog"):
+            resources.reload("catalog")  # And what is built from it; not the landmark index or genre models
+            st.success("Catalog reloaded.")
+
 # Function to Format Duration in Minutes and Seconds
 def format_duration(seconds):
-    if pd.isnull(seconds) or seconds == 0:
+    if not seconds or seconds != seconds:  # None, 0 or NaN
         return "N/A"
     minutes = int(seconds // 60)
     seconds = int(seconds % 60)
@@ -1,13 +1,32 @@
 import os
+import queue
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
-from groq import Groq
 import streamlit as st
+import answer_cache
+import rate_limit
+from chat_history import ChatHistory
+from http_client import percentile
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client with API key from environment
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+MODEL = "mixtral-8x7b-32768"
+
+# The Groq SDK takes a few hundred ms to import; build the client on the first chat
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return _client
 
 SYSTEM_PROMPT = """You are MusicBot, an advanced AI music expert with deep knowledge of music across all genres, eras, and cultures. Your capabilities include:
 
@@ -44,29 +63,168 @@ SYSTEM_PROMPT = """You are MusicBot, an advanced AI music expert with deep knowl
 Format your responses with emojis and clear sections. Be conversational but informative.
 """
 
-def get_music_chat_response(user_input, history=[]):
+SUMMARY_PROMPT = """Summarize the conversation below between a user and MusicBot in a few sentences.
+Keep the user's tastes and moods, the artists, songs and playlists discussed and any request still open.
+If an earlier summary is given, extend it rather than starting over. Reply with the summary only."""
+SUMMARY_TOKENS = 200
+
+def summarize_history(summary, messages):
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    content = (f"Earlier summary:\n{summary}\n\n" if summary else "") + f"Conversation:\n{transcript}"
+    response = _completion([{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": content}],
+                           stream=False, temperature=0.2, max_tokens=SUMMARY_TOKENS)
+    return response.choices[0].message.content
+
+def new_chat_history():
+    # One per conversation: it caches the summary of the turns that fell out of the window
+    return ChatHistory(summarize_history)
+
+def _chat_messages(user_input, history, window=None):
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     
-    # Add chat history
-    for msg in history:
-        messages.append({"role": msg["role"], "content": msg["content"]})
+    # Add the recent chat history within the token budget, older turns summarized.
+    # Turns whose reply was stopped or failed are shown in the chat but never sent
+    history = [msg for msg in history if not msg.get("incomplete")]
+    messages += (window or new_chat_history()).window(history)
     
     # Add current user input
     messages.append({"role": "user", "content": user_input})
-    
+    return messages
+
+def _completion(messages, stream, temperature=0.7, max_tokens=800):
+    rate_limit.acquire("groq.chat")  # Queue rather than hit Groq's requests-per-minute limit
+    return get_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=1,
+        stream=stream
+    )
+
+def _answer_context(messages):
+    # What the answer depends on besides the prompt: the model, system prompt and history window
+    return [MODEL, messages[:-1]]
+
+def get_music_chat_response(user_input, history=[], window=None):
     try:
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=800,
-            top_p=1,
-            stream=False
-        )
-        return response.choices[0].message.content
+        messages = _chat_messages(user_input, history, window)
+        answer, _ = answer_cache.lookup(user_input, _answer_context(messages))
+        if answer is not None:
+            return answer
+        response = _completion(messages, stream=False)
+        answer = response.choices[0].message.content
+        if answer:
+            answer_cache.store(user_input, _answer_context(messages), answer)
+        return answer
     except Exception as e:
         return f"Error: {str(e)}"
 
+# While waiting for the next token the stream yields "" this often, so the
+# caller gets a chance to notice it was cancelled (Streamlit only stops a
+# run when the script calls back into it)
+STREAM_HEARTBEAT = 0.25
+_STREAM_DONE = object()
+_STATS_WINDOW = 256
+_stats_lock = threading.Lock()
+_stats = {"streams": 0, "completed": 0, "cancelled": 0, "errors": 0,
+          "first_token": deque(maxlen=_STATS_WINDOW), "total": deque(maxlen=_STATS_WINDOW)}
+
+class ChatError(str):
+    """
+    The "Error: ..." text a stream yields in place of a reply, so callers can
+    tell it from tokens.
+    """
+
+def _read_stream(user_input, history, window, tokens, cancel):
+    # Runs on its own thread so a slow first token (or a summary) never blocks the consumer
+    try:
+        messages = _chat_messages(user_input, history, window)
+        answer, _ = answer_cache.lookup(user_input, _answer_context(messages))
+        if answer is not None:
+            tokens.put(answer)
+            tokens.put(_STREAM_DONE)
+            return
+        parts = []
+        stream = _completion(messages, stream=True)
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    return
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    tokens.put(delta)
+        finally:
+            stream.close()
+        # Only complete replies are cached, never a stopped one
+        if parts:
+            answer_cache.store(user_input, _answer_context(messages), "".join(parts))
+        tokens.put(_STREAM_DONE)
+    except Exception as e:
+        tokens.put(e)
+
+def stream_music_chat_response(user_input, history=[], cancel=None, window=None):
+    """
+    Yield MusicBot's reply piece by piece as Groq streams it. While no token
+    has arrived for STREAM_HEARTBEAT seconds an empty string is yielded.
+    Setting `cancel` (a threading.Event) or closing the generator stops the
+    reply and closes the upstream stream. Errors are yielded as "Error: ...",
+    like get_music_chat_response returns them, but as a ChatError.
+    Pass the conversation's ChatHistory as `window` to reuse its summary of
+    older turns across calls (see chat_history.py). Answers already in the
+    answer cache are yielded at once, without calling Groq.
+    """
+    cancel = cancel or threading.Event()
+    tokens = queue.Queue()
+    start = time.perf_counter()
+    first_token = None
+    outcome = "cancelled"
+    with _stats_lock:
+        _stats["streams"] += 1
+    threading.Thread(target=_read_stream, args=(user_input, list(history), window, tokens, cancel),
+                     daemon=True).start()
+    try:
+        while not cancel.is_set():
+            try:
+                item = tokens.get(timeout=STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ""
+                continue
+            if item is _STREAM_DONE:
+                outcome = "completed"
+                break
+            if isinstance(item, Exception):
+                outcome = "errors"
+                yield ChatError(f"Error: {str(item)}")
+                break
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            yield item
+    finally:
+        cancel.set()
+        with _stats_lock:
+            _stats[outcome] += 1
+            if first_token is not None:
+                _stats["first_token"].append(first_token)
+            if outcome == "completed":
+                _stats["total"].append(time.perf_counter() - start)
+
+def chat_stats():
+    """
+    Streamed replies started / completed / cancelled / failed, and p50/p95
+    time to first token and to the full reply (seconds) over the last ones.
+    """
+    with _stats_lock:
+        counts = {name: _stats[name] for name in ("streams", "completed", "cancelled", "errors")}
+        first_token, total = sorted(_stats["first_token"]), sorted(_stats["total"])
+    counts.update({
+        "first_token_p50": percentile(first_token, 50),
+        "first_token_p95": percentile(first_token, 95),
+        "total_p50": percentile(total, 50),
+    })
+    return counts
+
 def render_chat_interface():
     st.subheader("💭 Chat with MusicBot")
     
@@ -104,6 +262,8 @@ def render_chat_interface():
     # Initialize chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "chat_window" not in st.session_state:
+        st.session_state.chat_window = new_chat_history()
 
     # Display chat history
     for message in st.session_state.messages:
@@ -119,9 +279,30 @@ def render_chat_interface():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Get bot response
+        # Stream the bot response. A new prompt reruns the script: Streamlit
+        # stops this run at the next render, and closing the generator
+        # cancels the upstream request
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_music_chat_response(prompt, st.session_state.messages[:-1])
-                st.markdown(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+            placeholder = st.empty()
+            parts = []
+            finished = failed = False
+            reply = stream_music_chat_response(prompt, st.session_state.messages[:-1],
+                                               window=st.session_state.chat_window)
+            try:
+                for token in reply:
+                    failed = failed or isinstance(token, ChatError)
+                    parts.append(token)
+                    placeholder.markdown("".join(parts) + "▌")
+                finished = True
+            finally:
+                reply.close()
+                response = "".join(parts)
+                if not finished:
+                    response += " *(stopped)*"
+                # Keep user/assistant turns paired even when the reply was cut short
+                # or failed, but mark both so the turn stays out of later prompts
+                reply_message = {"role": "assistant", "content": response}
+                if failed or not finished:
+                    st.session_state.messages[-1]["incomplete"] = reply_message["incomplete"] = True
+                st.session_state.messages.append(reply_message)
+            placeholder.markdown(response)
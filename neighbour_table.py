@@ -0,0 +1,198 @@
+# neighbour_table.py
+"""
+Offline top-N genre-similarity neighbour table for O(1) serving.
+
+For every catalog row the build stores its `top_n` most similar rows (cosine
+over the genre flags, popularity as tie-break) as an N x top_n int32 id matrix
+and a float16 score matrix, both memory-mapped `.npy` files. Serving a known
+track is then a slice read. The build is chunked and spread over worker
+processes; each scores only a block of distinct genre patterns against the
+catalog, so no N x N matrix is ever materialized.
+
+    python neighbour_table.py --top 50 --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalog_store import GENRE_COLUMNS, cache_dir_for, load_catalog
+from similarity import GenreSimilarity, popularity_tie_break
+
+DEFAULT_TOP_N = 50
+TABLE_FORMAT = 2  # Bumped when the neighbour order changes (2: exact score / popularity order)
+_INPUTS = ("matrix", "patterns", "tie_break", "pattern_ids", "pattern_scores")
+_OUTPUTS = ("ids", "scores")
+
+
+def table_fingerprint(matrix, popularity):
+    digest = hashlib.sha1(np.ascontiguousarray(matrix).tobytes())
+    digest.update(np.ascontiguousarray(popularity).tobytes())
+    return digest.hexdigest()
+
+
+_worker_state = {}
+
+
+def _init_worker(path):
+    # Inputs and outputs are memory-mapped, so every worker shares one copy
+    for name in _INPUTS:
+        mode = 'r+' if name.startswith("pattern_") else 'r'
+        _worker_state[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+    _worker_state["engine"] = GenreSimilarity.from_normalized(_worker_state["matrix"])
+
+
+def _build_block(bounds):
+    # Top-(n + 1) rows for a block of distinct genre patterns
+    start, stop = bounds
+    engine, ids, scores = _worker_state["engine"], _worker_state["pattern_ids"], _worker_state["pattern_scores"]
+    for offset, row_ids, row_scores in engine.iter_top_k_batch(
+            _worker_state["patterns"][start:stop], k=ids.shape[1], tie_break=_worker_state["tie_break"]):
+        ids[start + offset:start + offset + len(row_ids)] = row_ids
+        scores[start + offset:start + offset + len(row_ids)] = row_scores
+    ids.flush()
+    scores.flush()
+    return stop - start
+
+
+def build_table(songs_df, path, top_n=DEFAULT_TOP_N, workers=None, block_rows=256, expand_rows=65536):
+    """
+    Compute the neighbour table for `songs_df` into directory `path`.
+    Returns the table's metadata.
+
+    Rows with the same genre flags have the same neighbours (apart from
+    themselves), so only the distinct flag patterns are scored: each pattern
+    gets its top-(n + 1) rows, and every row then takes its pattern's list
+    minus itself. This is exact and scales with patterns x rows, not rows^2.
+    """
+    os.makedirs(path, exist_ok=True)
+    start_time = time.perf_counter()
+    matrix = GenreSimilarity(songs_df[GENRE_COLUMNS].to_numpy()).matrix
+    popularity = songs_df['popularity'].to_numpy(dtype=np.float64)
+    num_rows = len(matrix)
+    patterns, inverse = np.unique(matrix, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    width = min(top_n + 1, num_rows)
+
+    np.save(os.path.join(path, "matrix.npy"), matrix)
+    np.save(os.path.join(path, "patterns.npy"), patterns)
+    np.save(os.path.join(path, "tie_break.npy"), popularity_tie_break(popularity))
+    for name, dtype in (("pattern_ids", np.int64), ("pattern_scores", np.float32)):
+        np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode='w+', dtype=dtype,
+                                  shape=(len(patterns), width)).flush()
+
+    blocks = [(start, min(start + block_rows, len(patterns))) for start in range(0, len(patterns), block_rows)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(blocks) <= 1:
+        _init_worker(path)
+        for block in blocks:
+            _build_block(block)
+        _worker_state.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+            for _ in pool.map(_build_block, blocks):
+                pass
+
+    # Expand pattern lists to rows, dropping each row itself (or the extra last entry)
+    pattern_ids = np.load(os.path.join(path, "pattern_ids.npy"), mmap_mode='r')
+    pattern_scores = np.load(os.path.join(path, "pattern_scores.npy"), mmap_mode='r')
+    ids = np.lib.format.open_memmap(os.path.join(path, "ids.npy"), mode='w+', dtype=np.int32, shape=(num_rows, top_n))
+    scores = np.lib.format.open_memmap(os.path.join(path, "scores.npy"), mode='w+', dtype=np.float16, shape=(num_rows, top_n))
+    for start in range(0, num_rows, expand_rows):
+        stop = min(start + expand_rows, num_rows)
+        rows = np.arange(start, stop)
+        candidates = pattern_ids[inverse[start:stop]]
+        keep = candidates != rows[:, None]
+        if width == top_n + 1:
+            no_self = keep.all(axis=1)
+            keep[no_self, -1] = False
+        # Every row keeps width - 1 entries; pad when the catalog is smaller than top_n
+        ids[start:stop, :width - 1] = candidates[keep].reshape(len(rows), width - 1)
+        scores[start:stop, :width - 1] = pattern_scores[inverse[start:stop]][keep].reshape(len(rows), width - 1)
+        ids[start:stop, width - 1:] = -1
+        scores[start:stop, width - 1:] = 0
+    ids.flush()
+    scores.flush()
+    del ids, scores, pattern_ids, pattern_scores
+
+    for name in _INPUTS:
+        os.remove(os.path.join(path, f"{name}.npy"))
+    meta = {
+        "fingerprint": table_fingerprint(matrix, popularity),
+        "format": TABLE_FORMAT,
+        "num_rows": num_rows,
+        "num_patterns": len(patterns),
+        "top_n": top_n,
+        "workers": workers,
+        "build_seconds": round(time.perf_counter() - start_time, 3),
+    }
+    with open(os.path.join(path, "meta.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class NeighbourTable:
+    """
+    Memory-mapped neighbour table; `neighbours(row)` is a slice read.
+    """
+
+    def __init__(self, ids, scores, meta):
+        self.ids = ids
+        self.scores = scores
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _OUTPUTS), meta)
+
+    def neighbours(self, row, k=10):
+        """
+        Return (row_ids, scores) of the k most similar rows to catalog row `row`.
+        """
+        ids = self.ids[row, :k]
+        valid = ids >= 0
+        return ids[valid].astype(np.int64), self.scores[row, :k][valid].astype(np.float32)
+
+
+def load_table(songs_df, path):
+    """
+    Load the table at `path` if it was built from this catalog by this
+    version of the build, else None.
+    """
+    try:
+        table = NeighbourTable.load(path)
+    except (OSError, ValueError):
+        return None
+    matrix = GenreSimilarity(songs_df[GENRE_COLUMNS].to_numpy()).matrix
+    if table.meta.get("format") != TABLE_FORMAT or \
+            table.meta.get("fingerprint") != table_fingerprint(matrix, songs_df['popularity'].to_numpy(dtype=np.float64)):
+        return None
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the top-N genre neighbour table.")
+    parser.add_argument("--csv", default=None, help="Catalog CSV (defaults to the app's catalog)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="Neighbours stored per row")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--block-rows", type=int, default=256, help="Genre patterns per work item")
+    args = parser.parse_args()
+
+    from resources import CATALOG_CSV, NEIGHBOUR_TABLE_DIR
+    csv_path = args.csv or CATALOG_CSV
+    path = NEIGHBOUR_TABLE_DIR if args.csv is None else os.path.join(cache_dir_for(csv_path), "neighbours")
+    meta = build_table(load_catalog(csv_path), path, top_n=args.top,
+                       workers=args.workers, block_rows=args.block_rows)
+    print(f"Built top-{meta['top_n']} neighbours for {meta['num_rows']} rows "
+          f"in {meta['build_seconds']:.1f}s with {meta['workers']} workers -> {path}")
+
+
+if __name__ == "__main__":
+    main()
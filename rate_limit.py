@@ -0,0 +1,139 @@
+# rate_limit.py
+"""
+Client-side token-bucket rate limiting per upstream API.
+
+Each upstream (ACRCloud identify, ACRCloud metadata, LRCLIB, Groq) has a
+bucket refilled at `rate` tokens per second up to `burst`. Every outgoing
+request takes one token; when the bucket is empty the caller reserves the
+next token and sleeps until it is due, so concurrent callers are served in
+arrival order and the process never exceeds the provider's limit (and its
+429s). A caller that would wait longer than `max_wait` gets
+`RateLimitExceeded` instead of queueing indefinitely.
+
+Limits can be overridden with SONG_RADAR_RATE_LIMITS, e.g.
+"lrclib=10/20,groq=0.5/2" (rate per second / burst).
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+# (tokens per second, burst); conservative defaults below the providers' free tiers
+RATE_LIMITS = {
+    "acrcloud.identify": (2.0, 4),
+    "acrcloud.metadata": (5.0, 10),
+    "lrclib": (5.0, 10),
+    "groq": (0.5, 5),  # 30 requests per minute
+}
+MAX_WAIT = 15.0  # Seconds a caller may queue before giving up
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """
+    The request would have had to wait longer than the bucket's `max_wait`.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; see the module docstring.
+    """
+
+    def __init__(self, rate, burst, max_wait=MAX_WAIT, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "queued": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def reserve(self):
+        """
+        Take a token, returning the seconds until it may be used (0 if one is
+        available now), or None if that would exceed `max_wait`.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > self.max_wait:
+                self._stats["rejected"] += 1
+                return None
+            # Tokens may go negative: each queued caller owns the next slot
+            self._tokens -= 1
+            self._stats["acquired"] += 1
+            if wait > 0:
+                self._stats["queued"] += 1
+                self._stats["wait_seconds"] += wait
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+            return wait
+
+    def acquire(self):
+        """
+        Block until a token is available; returns the seconds waited.
+        """
+        wait = self.reserve()
+        if wait is None:
+            raise RateLimitExceeded(f"Rate limit queue longer than {self.max_wait:.0f}s")
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def configured_limits():
+    """
+    RATE_LIMITS with the overrides from SONG_RADAR_RATE_LIMITS applied.
+    """
+    limits = dict(RATE_LIMITS)
+    for entry in os.getenv("SONG_RADAR_RATE_LIMITS", "").split(","):
+        name, _, value = entry.strip().partition("=")
+        if value:
+            rate, _, burst = value.partition("/")
+            limits[name] = (float(rate), float(burst or 1))
+    return limits
+
+
+_lock = threading.Lock()
+_buckets = None
+
+
+def bucket_for(endpoint):
+    """
+    The bucket limiting `endpoint` ("acrcloud.identify", "lrclib.get", ...):
+    the one named after the endpoint itself, else after its upstream
+    (the part before the first dot), else None.
+    """
+    global _buckets
+    if _buckets is None:
+        with _lock:
+            if _buckets is None:
+                _buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in configured_limits().items()}
+    return _buckets.get(endpoint) or _buckets.get(endpoint.split(".", 1)[0])
+
+
+def acquire(endpoint):
+    """
+    Wait for `endpoint`'s bucket (if it has one); returns the seconds waited.
+    """
+    bucket = bucket_for(endpoint)
+    return bucket.acquire() if bucket is not None else 0.0
+
+
+def stats():
+    """
+    Per-bucket counters: tokens acquired, callers queued or rejected, and
+    total / longest wait in seconds.
+    """
+    with _lock:
+        buckets = dict(_buckets or {})
+    return {name: bucket.stats() for name, bucket in buckets.items()}
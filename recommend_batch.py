@@ -0,0 +1,145 @@
+# recommend_batch.py
+"""
+Batched genre-similarity recommendations for offline playlist seeding.
+
+Seeds are catalog row ids or song dicts (`track_name`, `artist`, `Genre`,
+as returned by api_handler). All seeds of a batch are scored with one
+matrix product against the normalized genre matrix plus a batched top-k;
+ties are broken by popularity.
+
+    python recommend_batch.py seeds.csv -o recommendations.jsonl -k 20
+    cat seeds.jsonl | python recommend_batch.py - > recommendations.jsonl
+
+CSV seeds use a `row_id` column or `track_name`/`artist`/`Genre` columns;
+JSONL seeds are one object per line with the same keys (or a bare row id).
+"""
+
+import argparse
+import csv
+import json
+import sys
+from itertools import chain, islice
+
+import numpy as np
+
+from catalog_store import genre_flags
+
+
+def _checked_row(catalog, row_id):
+    row = int(row_id)
+    if not 0 <= row < len(catalog.similarity):
+        raise ValueError(f"Bad seed: row id {row} is outside the catalog (0-{len(catalog.similarity) - 1})")
+    return row
+
+
+def _seed_row(catalog, seed):
+    if isinstance(seed, (int, np.integer)):
+        return _checked_row(catalog, seed)
+    row_id = seed.get("row_id")
+    if row_id not in (None, ""):
+        return _checked_row(catalog, row_id)
+    rows = catalog.index.find_rows(seed.get("artist", ""), seed.get("track_name", ""))
+    return rows[0] if rows else -1
+
+
+def resolve_seeds(catalog, seeds):
+    """
+    Map seeds to (query genre matrix, catalog row per seed or -1).
+    Seeds found in the catalog use their row's genre vector; others are
+    encoded from their `Genre` string. Raises ValueError for a row id
+    outside the catalog.
+    """
+    seed_rows = np.array([_seed_row(catalog, seed) for seed in seeds], dtype=np.int64)
+    queries = np.zeros((len(seeds), catalog.similarity.matrix.shape[1]), dtype=np.float32)
+    known = seed_rows >= 0
+    queries[known] = catalog.similarity.matrix[seed_rows[known]]
+    for i in np.flatnonzero(~known):
+        queries[i] = genre_flags(seeds[i].get("Genre", "") or "")
+    return queries, seed_rows
+
+
+def recommend_batch(seeds, k=10, catalog=None):
+    """
+    Yield (seed_index, seed_row, row_ids, scores) for every seed, in order.
+    `seed_row` is -1 for seeds outside the catalog.
+    """
+    if catalog is None:
+        from resources import get_catalog
+        catalog = get_catalog()
+    seeds = list(seeds)
+    if not seeds:
+        return
+    queries, seed_rows = resolve_seeds(catalog, seeds)
+    for start, row_ids, scores in catalog.similarity.iter_top_k_batch(
+            queries, k=k, exclude=seed_rows, tie_break=catalog.tie_break):
+        for offset in range(len(row_ids)):
+            i = start + offset
+            yield i, int(seed_rows[i]), row_ids[offset], scores[offset]
+
+
+def read_seeds(path):
+    """
+    Stream seeds from a CSV or JSONL file ('-' reads JSONL from stdin).
+    """
+    if path != "-" and path.lower().endswith(".csv"):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+        return
+    stream = sys.stdin if path == "-" else open(path, encoding='utf-8')
+    try:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch song recommendations to JSONL.")
+    parser.add_argument("seeds", help="CSV or JSONL file of seeds, '-' for JSONL on stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path (default: stdout)")
+    parser.add_argument("-k", type=int, default=10, help="Recommendations per seed")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Seeds scored per batch")
+    args = parser.parse_args()
+
+    from resources import get_catalog
+    catalog = get_catalog()
+    songs_df = catalog.songs_df
+    track_names = songs_df['track_name'].to_numpy(dtype=object)
+    artists = songs_df['artist'].to_numpy(dtype=object)
+    popularity = songs_df['popularity'].to_numpy()
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8')
+    seeds, seed_offset = read_seeds(args.seeds), 0
+    try:
+        while True:
+            batch = list(islice(seeds, args.batch_size))
+            if not batch:
+                break
+            results = recommend_batch(batch, k=args.k, catalog=catalog)
+            try:
+                first = next(results)  # Seeds are resolved before anything is yielded
+            except ValueError as e:
+                parser.error(f"{e} (in seeds {seed_offset}-{seed_offset + len(batch) - 1})")
+            for i, seed_row, row_ids, scores in chain([first], results):
+                record = {
+                    "seed": seed_offset + i,
+                    "seed_row_id": seed_row if seed_row >= 0 else None,
+                    "recommendations": [{
+                        "row_id": int(row),
+                        "track_name": track_names[row],
+                        "artist": artists[row],
+                        "popularity": int(popularity[row]),
+                        "score": round(float(score), 4),
+                    } for row, score in zip(row_ids, scores)],
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            seed_offset += len(batch)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# recording_cache.py
+"""
+Cache of ACRCloud identifications keyed on the recording itself.
+
+An exact lookup uses the SHA-256 of the audio file, so identifying the same
+take twice (or re-using `song.wav` / `test.wav`) never re-uploads it. A
+coarse spectral fingerprint also catches near-identical recordings (the
+same clip re-encoded, resampled or at another gain): the clip is cut into
+FINGERPRINT_FRAMES segments, each summarized by its energy in
+FINGERPRINT_BANDS log-spaced bands, and every bit records whether the
+energy difference between neighbouring bands rose or fell from one segment
+to the next. Two recordings of similar length whose fingerprints differ in
+at most `max_distance` of their bits share the cached result.
+
+Entries expire after `ttl` and the table holds at most `max_entries`
+recordings, evicting the least recently used.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_processing import read_pcm
+from response_cache import connect
+
+DEFAULT_PATH = os.path.join("data", "cache", "recordings.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_DISTANCE = 0.12  # Fraction of differing fingerprint bits
+DURATION_TOLERANCE = 0.1  # Near matches must be within 10% in length
+FINGERPRINT_FRAMES = 32
+FINGERPRINT_BANDS = 16
+_BAND_EDGES_HZ = np.geomspace(300, 5000, FINGERPRINT_BANDS + 1)
+_FFT_SIZE = 2048
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    sha256 TEXT PRIMARY KEY,
+    fingerprint BLOB,
+    duration REAL NOT NULL,
+    result TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_accessed_at ON recordings (accessed_at);
+"""
+
+
+def coarse_fingerprint(samples, rate):
+    """
+    Packed (FINGERPRINT_FRAMES - 1) x (FINGERPRINT_BANDS - 1) bit fingerprint,
+    or None for clips too short to fill every segment.
+    """
+    hop = _FFT_SIZE // 2
+    num_windows = (len(samples) - _FFT_SIZE) // hop + 1
+    if num_windows < FINGERPRINT_FRAMES:
+        return None
+    windows = np.lib.stride_tricks.sliding_window_view(samples, _FFT_SIZE)[::hop][:num_windows]
+    power = np.abs(np.fft.rfft(windows * np.hanning(_FFT_SIZE), axis=1)) ** 2
+    band_of_bin = np.searchsorted(_BAND_EDGES_HZ, np.fft.rfftfreq(_FFT_SIZE, 1 / rate)) - 1
+    in_band = (band_of_bin >= 0) & (band_of_bin < FINGERPRINT_BANDS)
+    bands = np.zeros((num_windows, FINGERPRINT_BANDS))
+    np.add.at(bands.T, band_of_bin[in_band], power[:, in_band].T)
+
+    # Average the windows into fixed segments, so clips of any length compare
+    segment_of_window = np.arange(num_windows) * FINGERPRINT_FRAMES // num_windows
+    segments = np.zeros((FINGERPRINT_FRAMES, FINGERPRINT_BANDS))
+    np.add.at(segments, segment_of_window, bands)
+    energy = np.log(segments + 1e-10)
+    band_delta = energy[:, :-1] - energy[:, 1:]
+    return np.packbits(np.diff(band_delta, axis=0) > 0).tobytes()
+
+
+def fingerprint_distance(a, b):
+    """
+    Fraction of differing bits between two packed fingerprints.
+    """
+    bits = np.unpackbits(np.bitwise_xor(np.frombuffer(a, dtype=np.uint8), np.frombuffer(b, dtype=np.uint8)))
+    return bits.sum() / ((FINGERPRINT_FRAMES - 1) * (FINGERPRINT_BANDS - 1))
+
+
+def recording_key(path):
+    """
+    (sha256, fingerprint or None, duration in seconds) of a WAV recording.
+    """
+    with open(path, 'rb') as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    try:
+        samples, rate = read_pcm(path)
+    except (wave.Error, ValueError, EOFError):
+        return sha256, None, 0.0  # Not a PCM WAV: exact matches only
+    return sha256, coarse_fingerprint(samples, rate), len(samples) / rate
+
+
+class RecordingCache:
+    """
+    SQLite-backed identification cache; see the module docstring.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_distance=DEFAULT_MAX_DISTANCE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0}
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path, _SCHEMA)
+        return connection
+
+    def lookup(self, sha256, fingerprint, duration):
+        """
+        Cached result for the recording, exact hash first, then the nearest
+        fingerprint of similar length. Returns (result or None, kind) with
+        kind in "hits", "near_hits", "misses".
+        """
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute("SELECT sha256, result FROM recordings WHERE sha256 = ? AND expires_at > ?",
+                                 (sha256, now)).fetchone()
+        kind = "hits"
+        if row is None and fingerprint is not None:
+            best = None
+            for candidate, other, result in connection.execute(
+                    "SELECT sha256, fingerprint, result FROM recordings "
+                    "WHERE fingerprint IS NOT NULL AND expires_at > ? AND duration BETWEEN ? AND ?",
+                    (now, duration * (1 - DURATION_TOLERANCE), duration * (1 + DURATION_TOLERANCE))):
+                distance = fingerprint_distance(fingerprint, other)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate, result)
+            row, kind = (best[1:], "near_hits") if best else (None, "misses")
+        if row is None:
+            kind = "misses"
+        else:
+            try:
+                connection.execute("UPDATE recordings SET accessed_at = ? WHERE sha256 = ?", (now, row[0]))
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            self._stats[kind] += 1
+        return (json.loads(row[1]) if row else None), kind
+
+    def store(self, sha256, fingerprint, duration, result):
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO recordings (sha256, fingerprint, duration, result, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (sha256, fingerprint, duration, json.dumps(result), now + self.ttl, now))
+                connection.execute("DELETE FROM recordings WHERE expires_at <= ?", (now,))
+                connection.execute(
+                    "DELETE FROM recordings WHERE sha256 IN (SELECT sha256 FROM recordings "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            pass
+
+    def identify(self, path, loader, should_store=bool):
+        """
+        Return the cached identification of the recording at `path`, or call
+        `loader()` and cache its result when `should_store(result)` is true.
+        """
+        sha256, fingerprint, duration = recording_key(path)
+        try:
+            result, _ = self.lookup(sha256, fingerprint, duration)
+        except sqlite3.Error:
+            result = None
+        if result is not None:
+            return result
+        result = loader()
+        if should_store(result):
+            self.store(sha256, fingerprint, duration, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    The process-wide cache at SONG_RADAR_RECORDING_CACHE (or DEFAULT_PATH).
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = RecordingCache(os.getenv("SONG_RADAR_RECORDING_CACHE", DEFAULT_PATH))
+    return _default
+
+
+def identify(path, loader, should_store=bool):
+    return default_cache().identify(path, loader, should_store)
+
+
+def stats():
+    return default_cache().stats()
@@ -0,0 +1,266 @@
+# resources.py
+"""
+Process-wide resources shared by every Streamlit rerun and session.
+
+Streamlit re-executes `main.py` on every interaction, but imported modules stay
+in `sys.modules`, so anything cached here is built once per process. Builders
+are registered by name; `get` builds lazily under a lock and hands back the
+same read-only object to every caller, and `warm` builds in the background.
+`invalidate` drops cached values and `reload` rebuilds them and runs the
+registered reload hooks.
+
+Importing this module is cheap: the catalog modules load pandas, scipy and
+scikit-learn only inside the functions that build resources.
+"""
+
+import os
+import threading
+import time
+
+import ann_index
+import landmark_index
+import neighbour_table
+import shared_catalog
+from catalog_index import CatalogIndex
+from catalog_store import GENRE_COLUMNS, GenreLists, cache_dir_for, catalog_to_dataframe, load_catalog_arrays
+from cluster_recommender import ClusterRecommender, load_genre_models
+from fuzzy_index import FuzzySongIndex
+from similarity import GenreSimilarity, popularity_tie_break
+
+CATALOG_CSV = "data/clean/7_clustered_dataset.csv"
+# Set to 1 to load the compact catalog (categoricals, narrow ints, CSR genres)
+COMPACT_ENV_VAR = "SONG_RADAR_COMPACT_CATALOG"
+NEIGHBOUR_TABLE_DIR = os.path.join(cache_dir_for(CATALOG_CSV), "neighbours")
+
+_lock = threading.RLock()
+_builders = {}
+_dependencies = {}
+_values = {}
+_stats = {}
+_reload_hooks = []
+
+
+def register(name, builder, depends_on=()):
+    """
+    Register (or replace) the zero-argument builder for a resource.
+    `depends_on` names resources that, when invalidated, invalidate this one too.
+    """
+    with _lock:
+        _builders[name] = builder
+        _dependencies[name] = tuple(depends_on)
+        _values.pop(name, None)
+
+
+def get(name):
+    """
+    Return the cached resource, building it on first use.
+    """
+    start = time.perf_counter()
+    value = _values.get(name, _MISSING)
+    if value is _MISSING:
+        with _lock:
+            value = _values.get(name, _MISSING)
+            if value is _MISSING:
+                value = _build(name)
+    stats = _stats.setdefault(name, _new_stats())
+    stats["gets"] += 1
+    stats["last_get_seconds"] = time.perf_counter() - start
+    return value
+
+
+def loaded(name):
+    """
+    Whether the resource is built (without building it).
+    """
+    return _values.get(name, _MISSING) is not _MISSING
+
+
+def warm(*names):
+    """
+    Build resources in a background thread, so a later `get` finds them
+    ready without the caller (e.g. the first page render) waiting.
+    """
+    def build_all():
+        for name in names:
+            try:
+                get(name)
+            except Exception:
+                pass  # The first real `get` builds again and surfaces the error
+
+    thread = threading.Thread(target=build_all, name="resources-warm", daemon=True)
+    thread.start()
+    return thread
+
+
+def _build(name):
+    start = time.perf_counter()
+    value = _builders[name]()
+    elapsed = time.perf_counter() - start
+    _values[name] = value
+    stats = _stats.setdefault(name, _new_stats())
+    stats["builds"] += 1
+    stats["build_seconds"] = elapsed
+    stats["built_at"] = time.time()
+    return value
+
+
+def _new_stats():
+    return {"builds": 0, "build_seconds": None, "built_at": None, "gets": 0, "last_get_seconds": None}
+
+
+def invalidate(name=None):
+    """
+    Drop one cached resource (or all of them); the next `get` rebuilds it.
+    """
+    with _lock:
+        for resource_name in _with_dependents(name):
+            _values.pop(resource_name, None)
+
+
+def _with_dependents(name):
+    # `name` plus everything depending on it, in registration (= build) order
+    if name is None:
+        return list(_builders)
+    affected = {name}
+    for resource_name in _builders:
+        if affected.intersection(_dependencies[resource_name]):
+            affected.add(resource_name)
+    return [resource_name for resource_name in _builders if resource_name in affected]
+
+
+def reload(name=None):
+    """
+    Rebuild one resource (or every registered one) and its dependents now,
+    then run the reload hooks.
+    """
+    with _lock:
+        names = _with_dependents(name)
+        for resource_name in names:
+            _values.pop(resource_name, None)
+            _build(resource_name)
+        hooks = list(_reload_hooks)
+    for hook in hooks:
+        hook(names)
+
+
+def on_reload(hook):
+    """
+    Register `hook(names)` to run after `reload`. Usable as a decorator.
+    """
+    with _lock:
+        _reload_hooks.append(hook)
+    return hook
+
+
+def stats():
+    """
+    Snapshot of build/get timings per resource.
+    """
+    with _lock:
+        return {name: dict(values) for name, values in _stats.items()}
+
+
+_MISSING = object()
+
+
+class Catalog:
+    """
+    Read-only handles over the song catalog: the DataFrame, the genre
+    similarity engine and the artist/genre indexes. `genres` holds the
+    per-row genre lists (a `GenreLists` when the DataFrame is compact).
+    `shared_arrays` are the views of an attached shared catalog, which
+    also hold the prebuilt indexes.
+    """
+
+    def __init__(self, songs_df, similarity=None, shared_memory=None, genres=None, shared_arrays=None):
+        self.songs_df = songs_df
+        self.genres = songs_df['genres'].to_numpy(dtype=object) if genres is None else genres
+        if similarity is None:
+            similarity = GenreSimilarity(songs_df[GENRE_COLUMNS].to_numpy())
+            similarity.matrix.flags.writeable = False
+        self.similarity = similarity
+        # Orders equal similarity scores by popularity, as the neighbour table does
+        self.tie_break = popularity_tie_break(songs_df['popularity'].to_numpy())
+        self.shared_arrays = shared_arrays
+        if shared_arrays is not None:
+            self.index = CatalogIndex.from_arrays(shared_catalog.section(shared_arrays, shared_catalog.INDEX_PREFIX))
+        else:
+            self.index = CatalogIndex(songs_df, self.genres)
+        # Keeps an attached shared memory segment alive while its views are in use
+        self._shared_memory = shared_memory
+
+
+def build_catalog():
+    compact = os.getenv(COMPACT_ENV_VAR, "") not in ("", "0")
+    shared_name = os.getenv(shared_catalog.ENV_VAR)
+    if shared_name:
+        # Zero-copy views over the catalog published by `shared_catalog.py publish`:
+        # numeric columns, string codes and vocabularies, genre CSR and both indexes
+        shm, manifest, arrays = shared_catalog.attach(shared_name)
+        songs_df = catalog_to_dataframe(manifest, arrays, copy=False, compact=compact, arrow_strings=True)
+        similarity = GenreSimilarity.from_normalized(arrays[shared_catalog.NORMALIZED_GENRES])
+        return Catalog(songs_df, similarity, shared_memory=shm, genres=GenreLists.from_arrays(arrays),
+                       shared_arrays=arrays)
+    manifest, arrays = load_catalog_arrays(CATALOG_CSV)
+    songs_df = catalog_to_dataframe(manifest, arrays, compact=compact)
+    return Catalog(songs_df, genres=GenreLists.from_arrays(arrays) if compact else None)
+
+
+def build_cluster_recommender():
+    kmeans, scaler = get("genre_models")
+    return ClusterRecommender(get_catalog().songs_df, kmeans, scaler)
+
+
+def build_ann_index():
+    # Persisted beside the compiled catalog; rebuilt when the features change
+    return ann_index.load_or_build(get_catalog().songs_df, os.path.join(cache_dir_for(CATALOG_CSV), "ann"))
+
+
+def build_song_resolver():
+    catalog = get_catalog()
+    if catalog.shared_arrays is not None:
+        return FuzzySongIndex.from_arrays(shared_catalog.section(catalog.shared_arrays, shared_catalog.FUZZY_PREFIX))
+    return FuzzySongIndex(catalog.songs_df)
+
+
+def build_neighbour_table():
+    # Built offline with `python neighbour_table.py`; None if missing or stale
+    return neighbour_table.load_table(get_catalog().songs_df, NEIGHBOUR_TABLE_DIR)
+
+
+def build_landmark_index():
+    # Built offline with `python landmark_index.py build <dir>`; None if missing
+    return landmark_index.load_index(landmark_index.DEFAULT_INDEX_DIR)
+
+
+def get_catalog():
+    return get("catalog")
+
+
+def get_cluster_recommender():
+    return get("cluster_recommender")
+
+
+def get_ann_index():
+    return get("ann_index")
+
+
+def get_song_resolver():
+    return get("song_resolver")
+
+
+def get_neighbour_table():
+    return get("neighbour_table")
+
+
+def get_landmark_index():
+    return get("landmark_index")
+
+
+register("catalog", build_catalog)
+register("genre_models", load_genre_models)
+register("cluster_recommender", build_cluster_recommender, depends_on=("catalog", "genre_models"))
+register("ann_index", build_ann_index, depends_on=("catalog",))
+register("song_resolver", build_song_resolver, depends_on=("catalog",))
+register("neighbour_table", build_neighbour_table, depends_on=("catalog",))
+register("landmark_index", build_landmark_index)
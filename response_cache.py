@@ -0,0 +1,237 @@
+# response_cache.py
+"""
+Persistent cache for upstream API responses (ACRCloud metadata, LRCLIB).
+
+Entries live in one SQLite file shared by every Streamlit process (WAL mode,
+so readers never block each other and writers wait on a busy timeout). Keys
+are the endpoint name plus its normalized query parameters; values are the
+already formatted JSON results. Each endpoint has its own TTL, empty results
+("not found") expire sooner, and the file is kept under `max_bytes` by
+evicting least recently used entries.
+
+Concurrent misses for the same key share one upstream call (single flight),
+so a trending song costs one request however many sessions ask at once.
+When the upstream call fails, an expired entry is served instead of the
+error. Hits, misses, coalesced waits, stale serves and failures are counted
+per endpoint.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from single_flight import SingleFlight
+
+DEFAULT_PATH = os.path.join("data", "cache", "responses.sqlite3")
+DEFAULT_MAX_BYTES = 64 * 2**20
+DAY = 24 * 3600
+TTLS = {
+    "acrcloud.search": 7 * DAY,
+    "acrcloud.metadata": 7 * DAY,
+    "lrclib.get": 30 * DAY,
+    "lrclib.search": 1 * DAY,
+}
+DEFAULT_TTL = DAY
+NEGATIVE_TTL = 3600  # Empty results: the song may show up upstream soon (loaders raise on other failures)
+_TOUCH_INTERVAL = 60  # Seconds between LRU timestamp updates of one entry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def normalize_params(params):
+    """
+    Canonical form of query parameters: strings stripped, lowercased and
+    whitespace-collapsed, floats that are whole numbers as ints, None dropped.
+    """
+    if isinstance(params, dict):
+        return {key: normalize_params(value) for key, value in params.items() if value is not None}
+    if isinstance(params, (list, tuple)):
+        return [normalize_params(value) for value in params]
+    if isinstance(params, str):
+        return " ".join(params.lower().split())
+    if isinstance(params, float) and params.is_integer():
+        return int(params)
+    return params
+
+
+def cache_key(endpoint, params):
+    payload = json.dumps(normalize_params(params), sort_keys=True, ensure_ascii=False)
+    return f"{endpoint}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+def connect(path, schema):
+    """
+    Open a SQLite connection for cross-process sharing (WAL, busy timeout,
+    autocommit) and make sure `schema` exists.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(schema)
+    return connection
+
+
+class ResponseCache:
+    """
+    SQLite-backed TTL + LRU cache; see the module docstring.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(TTLS if ttls is None else ttls)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._flights = SingleFlight()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path, _SCHEMA)
+        return connection
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            counts = self._stats.setdefault(endpoint, {"hits": 0, "misses": 0, "coalesced": 0, "stale": 0,
+                                                       "errors": 0})
+            counts[outcome] += 1
+
+    def get(self, endpoint, params, allow_stale=False):
+        """
+        Return (found, value); expired entries only with `allow_stale`.
+        """
+        key = cache_key(endpoint, params)
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at, accessed_at FROM responses WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return False, None
+        now = time.time()
+        if row is None or (row[1] < now and not allow_stale):
+            return False, None
+        if now - row[2] > _TOUCH_INTERVAL:
+            try:
+                self._connection().execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.Error:
+                pass  # Recency is best effort; another process may hold the write lock
+        return True, json.loads(row[0])
+
+    def put(self, endpoint, params, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttls.get(endpoint, DEFAULT_TTL) if value else NEGATIVE_TTL
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, endpoint, value, expires_at, accessed_at, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (cache_key(endpoint, params), endpoint, payload, now + ttl, now, len(payload)))
+                self._evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            pass  # A full or locked cache must never fail the lookup itself
+
+    def _evict(self, connection):
+        # Drop least recently used entries until the payloads fit in max_bytes
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess, doomed = total - int(self.max_bytes * 0.9), []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def fetch(self, endpoint, params, loader, ttl=None):
+        """
+        Return the cached value for (endpoint, params), or call `loader()`,
+        cache and return its result; concurrent callers with the same key
+        wait for a single `loader()` call and each get its own copy of the
+        result. If `loader` raises, an expired entry is served instead; without
+        one the exception propagates.
+        """
+        found, value = self.get(endpoint, params)
+        if found:
+            self._count(endpoint, "hits")
+            return value
+        self._count(endpoint, "misses")
+        try:
+            value, shared = self._flights.do(cache_key(endpoint, params),
+                                             lambda: self._load(endpoint, params, loader, ttl))
+        except Exception:
+            found, stale = self.get(endpoint, params, allow_stale=True)
+            if found:
+                self._count(endpoint, "stale")
+                return stale
+            self._count(endpoint, "errors")
+            raise
+        if shared:
+            self._count(endpoint, "coalesced")
+        return copy.deepcopy(value)  # Coalesced callers must not share one mutable result
+
+    def _load(self, endpoint, params, loader, ttl):
+        # Run by one caller per key at a time; a flight that just finished may
+        # already have stored the value
+        found, value = self.get(endpoint, params)
+        if not found:
+            value = loader()
+            self.put(endpoint, params, value, ttl)
+        return value
+
+    def stats(self):
+        """
+        Per-endpoint hit/miss/coalesced/stale/error counters of this process.
+        """
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+
+    def clear(self):
+        self._connection().execute("DELETE FROM responses")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    The process-wide cache at SONG_RADAR_RESPONSE_CACHE (or DEFAULT_PATH).
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ResponseCache(os.getenv("SONG_RADAR_RESPONSE_CACHE", DEFAULT_PATH))
+    return _default
+
+
+def fetch(endpoint, params, loader, ttl=None):
+    return default_cache().fetch(endpoint, params, loader, ttl)
+
+
+def stats():
+    return default_cache().stats()
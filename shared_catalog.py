@@ -0,0 +1,161 @@
+# shared_catalog.py
+"""
+Share one copy of the catalog and its indexes across Streamlit worker processes.
+
+A loader process publishes every compiled catalog array (numeric columns,
+string codes and UTF-8 vocabularies, CSR genre ids) plus the L2-normalized
+genre matrix, the vocabularies' byte offsets and the arrays of a prebuilt
+CatalogIndex and FuzzySongIndex into a single
+`multiprocessing.shared_memory` segment. Workers started with
+SONG_RADAR_SHARED_CATALOG=<segment name> attach to it and get read-only,
+zero-copy NumPy views instead of loading their own copy.
+
+The worker's DataFrame wraps the views as well: string columns become Arrow
+dictionary arrays over the shared codes and vocabularies and genre lists are
+read through `GenreLists`, so the catalog and song resolver add ~0.7 MB
+private per worker instead of ~16 MB (see benchmarks/bench_shared_catalog.py).
+
+Publish (keeps running until interrupted, then unlinks the segment):
+    python shared_catalog.py publish
+Then start the workers:
+    SONG_RADAR_SHARED_CATALOG=song-radar-catalog streamlit run main.py
+"""
+
+import argparse
+import json
+import signal
+import struct
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from catalog_index import CatalogIndex
+from catalog_store import GENRE_COLUMNS, byte_offsets, catalog_to_dataframe, load_catalog_arrays
+from fuzzy_index import FuzzySongIndex
+from similarity import GenreSimilarity
+
+ENV_VAR = "SONG_RADAR_SHARED_CATALOG"
+DEFAULT_NAME = "song-radar-catalog"
+NORMALIZED_GENRES = "genre_matrix.normalized"
+# Key prefixes of the prebuilt CatalogIndex and FuzzySongIndex arrays
+INDEX_PREFIX = "index."
+FUZZY_PREFIX = "fuzzy."
+ALIGNMENT = 64
+_HEADER_SIZE = struct.calcsize("<Q")
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def publish(csv_path, name=DEFAULT_NAME):
+    """
+    Copy the compiled catalog arrays of `csv_path`, the byte offsets of its
+    string vocabularies and the arrays of its prebuilt CatalogIndex and
+    FuzzySongIndex into a new shared memory segment. The caller owns the
+    returned SharedMemory and must `unlink` it.
+    """
+    manifest, arrays = load_catalog_arrays(csv_path)
+    arrays = dict(arrays)
+    genre_matrix = np.column_stack([arrays[column] for column in GENRE_COLUMNS])
+    arrays[NORMALIZED_GENRES] = GenreSimilarity(genre_matrix).matrix
+    for column in manifest["columns"]:
+        if column["kind"] == "string":
+            key = column["name"]
+            arrays[f"{key}.vocab_byte_offsets"] = byte_offsets(arrays[f"{key}.vocab"], arrays[f"{key}.vocab_offsets"])
+    songs_df = catalog_to_dataframe(manifest, arrays)
+    for prefix, index in ((INDEX_PREFIX, CatalogIndex(songs_df)), (FUZZY_PREFIX, FuzzySongIndex(songs_df))):
+        arrays.update((prefix + key, array) for key, array in index.to_arrays().items())
+
+    layout, offset = {}, 0
+    for key, array in arrays.items():
+        layout[key] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"manifest": manifest, "arrays": layout}).encode('utf-8')
+    data_start = _align(_HEADER_SIZE + len(header))
+
+    shm = SharedMemory(name=name, create=True, size=max(data_start + offset, 1))
+    struct.pack_into("<Q", shm.buf, 0, len(header))
+    shm.buf[_HEADER_SIZE:_HEADER_SIZE + len(header)] = header
+    for key, array in arrays.items():
+        start = data_start + layout[key]["offset"]
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=start)
+        target[...] = array
+        del target  # Release the exported buffer so the segment can be closed later
+    return shm
+
+
+def _open_untracked(name):
+    # Attaching must not register the segment with this process's resource
+    # tracker, otherwise it is unlinked as soon as the first worker exits.
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def attach(name=DEFAULT_NAME):
+    """
+    Attach to a published catalog.
+    Returns (shm, manifest, {array name: read-only np.ndarray view}).
+    Keep `shm` referenced for as long as the views are in use.
+    """
+    shm = _open_untracked(name)
+    (header_len,) = struct.unpack_from("<Q", shm.buf, 0)
+    header = json.loads(bytes(shm.buf[_HEADER_SIZE:_HEADER_SIZE + header_len]).decode('utf-8'))
+    data_start = _align(_HEADER_SIZE + header_len)
+
+    arrays = {}
+    for key, spec in header["arrays"].items():
+        view = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]),
+                          buffer=shm.buf, offset=data_start + spec["offset"])
+        view.flags.writeable = False
+        arrays[key] = view
+    return shm, header["manifest"], arrays
+
+
+def section(arrays, prefix):
+    """
+    The arrays stored under `prefix`, keyed without it.
+    """
+    return {key[len(prefix):]: array for key, array in arrays.items() if key.startswith(prefix)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the song catalog into shared memory.")
+    parser.add_argument("command", choices=["publish", "info"])
+    parser.add_argument("--csv", default=None, help="Catalog CSV (defaults to the app's catalog)")
+    parser.add_argument("--name", default=DEFAULT_NAME, help="Shared memory segment name")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        shm, manifest, arrays = attach(args.name)
+        print(f"{args.name}: {manifest['num_rows']} rows, {shm.size / 2**20:.1f} MB, {len(arrays)} arrays")
+        del arrays
+        shm.close()
+        return
+
+    if args.csv is None:
+        from resources import CATALOG_CSV
+        args.csv = CATALOG_CSV
+    shm = publish(args.csv, args.name)
+    print(f"Published {args.csv} as '{args.name}' ({shm.size / 2**20:.1f} MB). "
+          f"Start workers with {ENV_VAR}={args.name}. Ctrl+C to unpublish.", flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+if __name__ == "__main__":
+    main()
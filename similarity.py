@@ -0,0 +1,173 @@
+# similarity.py
+
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+
+class GenreSimilarity:
+    """
+    On-demand cosine similarity over the binary genre columns.
+
+    Only the L2-normalized genre matrix is kept in memory (N x 16 float32),
+    so a top-k query costs one matrix-vector product plus an argpartition
+    instead of a precomputed N x N matrix.
+    """
+
+    def __init__(self, genre_matrix):
+        matrix = np.asarray(genre_matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0  # Rows without genres stay all-zero
+        self.matrix = np.ascontiguousarray(matrix / norms)
+
+    @classmethod
+    def from_normalized(cls, matrix):
+        """
+        Wrap an already L2-normalized float32 matrix without copying it.
+        """
+        engine = cls.__new__(cls)
+        engine.matrix = matrix
+        return engine
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def normalize(self, vector):
+        """
+        L2-normalize an arbitrary genre vector (same column order as the matrix).
+        """
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores_for_vector(self, vector):
+        """
+        Cosine similarity of every row against a genre vector.
+        """
+        return self.matrix @ self.normalize(vector)
+
+    def top_k_for_vector(self, vector, k=10, exclude=None, tie_break=None):
+        """
+        Return (row_ids, scores) of the k rows most similar to a genre vector,
+        best first. `exclude` is an optional iterable of row ids to skip;
+        `tie_break` orders equal scores as in `iter_top_k_batch`.
+        """
+        scores = self.scores_for_vector(vector)
+        if exclude is not None:
+            scores[np.asarray(list(exclude), dtype=np.int64)] = -np.inf
+        return self._top_k(scores, k, tie_break)
+
+    def top_k(self, row, k=10, exclude_self=True, tie_break=None):
+        """
+        Return (row_ids, scores) of the k rows most similar to catalog row `row`.
+        """
+        scores = self.matrix @ self.matrix[row]
+        if exclude_self:
+            scores[row] = -np.inf
+        return self._top_k(scores, k, tie_break)
+
+    def _top_k(self, scores, k, tie_break):
+        if tie_break is None:
+            return _top_k(scores, k)
+        keys = _tie_break_keys(scores, _tie_buckets(tie_break), self.matrix.shape[1])
+        keys[~np.isfinite(scores)] = -1  # Below every real key
+        return _top_k(scores, k, keys)
+
+    def iter_top_k_batch(self, queries, k=10, exclude=None, tie_break=None, max_chunk_bytes=64 << 20):
+        """
+        Batched top-k for many genre vectors at once.
+
+        `queries` is (n x 16); rows are normalized here. `exclude` optionally
+        gives one row id per query to skip (-1 for none), and `tie_break` a
+        per-catalog-row value in [0, 1) that orders rows with equal scores
+        (compared exactly, which assumes binary genre vectors).
+        Yields (start, row_ids, scores) per chunk of queries, each (chunk x k),
+        so the score block never exceeds `max_chunk_bytes`.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        num_rows = len(self)
+        k = min(k, num_rows - (1 if exclude is not None else 0))
+        if tie_break is not None:
+            tie_break = _tie_buckets(tie_break)
+        # float32 scores + 32-bit keys + int64 argpartition output per cell
+        chunk = max(1, max_chunk_bytes // max(1, num_rows * 16))
+        for start in range(0, len(queries), chunk):
+            scores = queries[start:start + chunk] @ self.matrix.T
+            keys = scores if tie_break is None else _tie_break_keys(scores, tie_break, self.matrix.shape[1])
+            if exclude is not None:
+                excluded = np.asarray(exclude[start:start + chunk])
+                hits = np.flatnonzero(excluded >= 0)
+                keys[hits, excluded[hits]] = -np.inf if tie_break is None else -np.iinfo(np.int32).max
+            if k < num_rows:
+                candidates = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(num_rows), keys.shape).copy()
+            order = np.argsort(-np.take_along_axis(keys, candidates, axis=1), axis=1, kind='stable')
+            row_ids = np.take_along_axis(candidates, order, axis=1)
+            yield start, row_ids, np.take_along_axis(scores, row_ids, axis=1)
+
+
+_TIE_BUCKETS = 1024
+_LEVEL_GRID = 1 << 17  # Grid steps per unit score (7.6e-6, well under half the level gap)
+
+
+@lru_cache(maxsize=None)
+def _level_ranks(num_flags):
+    # Every cosine two binary vectors of `num_flags` flags can have is
+    # a / sqrt(b * c) with 0 <= a <= min(b, c) <= num_flags. Distinct levels
+    # are >= 5.7e-5 apart for 16 flags, far above float32 noise (~1e-7), so
+    # a computed score's nearest level is its exact value. Returns, for each
+    # point of a fine grid over [0, 1], the rank of the nearest level.
+    squares = {Fraction(a * a, b * c) for b in range(1, num_flags + 1) for c in range(1, num_flags + 1)
+               for a in range(min(b, c) + 1)}
+    levels = np.sqrt(np.array(sorted(float(square) for square in squares)))
+    grid = np.arange(_LEVEL_GRID + 1) / _LEVEL_GRID
+    return np.searchsorted((levels[:-1] + levels[1:]) / 2, grid).astype(np.int32)
+
+
+def popularity_tie_break(popularity):
+    """
+    Popularity scaled into the [0, 1) tie-break the top-k methods take.
+    """
+    popularity = np.asarray(popularity, dtype=np.float64)
+    return popularity / (popularity.max() + 1) if len(popularity) else popularity
+
+
+def _tie_buckets(tie_break):
+    return np.floor(np.asarray(tie_break, dtype=np.float64) * _TIE_BUCKETS).astype(np.int32)
+
+
+def _tie_break_keys(scores, tie_buckets, num_flags):
+    # Exact two-key order: the rank of each score's cosine level (equal
+    # scores share a rank, distinct ones never do), then the tie-break
+    # bucket in the low bits, which only reorders equal scores.
+    grid = np.rint(np.clip(scores, 0.0, 1.0) * _LEVEL_GRID).astype(np.int32)
+    keys = _level_ranks(num_flags).take(grid)
+    keys *= _TIE_BUCKETS
+    keys += tie_buckets
+    return keys
+
+
+def _top_k(scores, k, keys=None):
+    """
+    Select the k highest scores (by `keys` when given) without sorting the full array.
+    """
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    keys = scores if keys is None else keys
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-keys, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    order = candidates[np.argsort(-keys[candidates], kind="stable")]
+    return order, scores[order]
@@ -0,0 +1,67 @@
+# single_flight.py
+"""
+Process-wide coalescing of identical in-flight calls ("single flight").
+
+When several Streamlit sessions ask for the same thing at the same moment
+(a trending song's metadata or lyrics), the first caller for a key runs the
+function and every caller that arrives while it is running waits for that
+result instead of starting its own upstream request. Exceptions are shared
+the same way. Once the call finishes the key is released, so a later call
+runs again (callers put a cache in front for that).
+"""
+
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent `do(key, fn)` calls with equal keys.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run `fn()` once for all concurrent callers with `key`. Returns
+        (value, shared) where `shared` is true for callers that waited on
+        another caller's run; re-raises that run's exception. Every caller
+        gets the same value object, so mutable results must be copied.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self):
+        """
+        Number of keys currently running.
+        """
+        with self._lock:
+            return len(self._calls)
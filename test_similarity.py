@@ -0,0 +1,125 @@
+# test_similarity.py
+"""
+Top-k order of GenreSimilarity against a brute-force reference: best score
+first, equal scores by popularity, excluded rows never returned.
+"""
+
+import numpy as np
+import pytest
+
+from similarity import GenreSimilarity, popularity_tie_break
+
+NUM_FLAGS = 16
+K = 25
+
+
+def random_catalog(seed, rows=2000, flags_per_row=4):
+    # Few flags per row, so many rows share a score and the tie-break decides
+    rng = np.random.default_rng(seed)
+    matrix = (rng.random((rows, NUM_FLAGS)) < flags_per_row / NUM_FLAGS).astype(np.int8)
+    return matrix, popularity_tie_break(rng.integers(0, 100, rows))
+
+
+def exact_scores(matrix, vector):
+    # float64 cosines rounded far below the smallest gap between distinct ones
+    matrix = matrix.astype(np.float64)
+    vector = np.asarray(vector, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(vector) or 1.0)
+    return np.round(matrix @ vector / np.where(norms == 0, 1.0, norms), 9)
+
+
+def keys_of(matrix, vector, tie_break, rows):
+    # (score, popularity bucket) per row; rows with equal keys may come in any order
+    scores = exact_scores(matrix, vector)
+    buckets = np.floor(tie_break * 1024).astype(int)
+    return [(scores[row], buckets[row]) for row in rows]
+
+
+def reference(matrix, vector, tie_break, k, exclude=()):
+    rows = [row for row in range(len(matrix)) if row not in exclude]
+    return sorted(keys_of(matrix, vector, tie_break, rows), reverse=True)[:k]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_top_k_matches_reference(seed):
+    matrix, tie_break = random_catalog(seed)
+    engine = GenreSimilarity(matrix)
+    for row in range(0, len(matrix), 97):
+        rows, scores = engine.top_k(row, k=K, tie_break=tie_break)
+        assert row not in rows
+        assert keys_of(matrix, matrix[row], tie_break, rows) == reference(matrix, matrix[row], tie_break, K, {row})
+        assert np.all(np.diff(scores) <= 1e-6)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_top_k_for_vector_matches_reference(seed):
+    matrix, tie_break = random_catalog(seed)
+    engine = GenreSimilarity(matrix)
+    rng = np.random.default_rng(seed + 100)
+    for _ in range(20):
+        vector = (rng.random(NUM_FLAGS) < 0.3).astype(np.int8)
+        exclude = set(rng.integers(0, len(matrix), 5).tolist())
+        rows, _ = engine.top_k_for_vector(vector, k=K, exclude=exclude, tie_break=tie_break)
+        assert not exclude & set(rows.tolist())
+        assert keys_of(matrix, vector, tie_break, rows) == reference(matrix, vector, tie_break, K, exclude)
+
+
+def test_iter_top_k_batch_matches_reference():
+    matrix, tie_break = random_catalog(3)
+    engine = GenreSimilarity(matrix)
+    queries = matrix[:60]
+    exclude = np.arange(60)
+    exclude[::7] = -1  # Some queries exclude nothing
+    seen = 0
+    # A small chunk size so the queries span several chunks
+    for start, row_ids, scores in engine.iter_top_k_batch(queries, k=K, exclude=exclude, tie_break=tie_break,
+                                                          max_chunk_bytes=len(matrix) * 16 * 8):
+        assert row_ids.shape == scores.shape == (len(row_ids), K)
+        for offset, rows in enumerate(row_ids):
+            query = start + offset
+            skip = {exclude[query]} if exclude[query] >= 0 else set()
+            assert not skip & set(rows.tolist())
+            assert keys_of(matrix, queries[query], tie_break, rows) == \
+                reference(matrix, queries[query], tie_break, K, skip)
+            seen += 1
+    assert seen == len(queries)
+
+
+def test_close_scores_are_not_reordered_by_popularity():
+    # Two of the closest distinct cosines for an 8-flag query:
+    # 6 / sqrt(8 * 11) = 0.63960 beats 7 / sqrt(8 * 15) = 0.63901 by 5.9e-4
+    query = np.zeros(NUM_FLAGS, dtype=np.int8)
+    query[:8] = 1
+    higher = np.zeros(NUM_FLAGS, dtype=np.int8)
+    higher[:6] = higher[8:13] = 1
+    lower = np.zeros(NUM_FLAGS, dtype=np.int8)
+    lower[:7] = lower[8:16] = 1
+    engine = GenreSimilarity(np.stack([lower, higher]))
+    tie_break = popularity_tie_break(np.array([99, 0]))  # The lower score is far more popular
+    rows, scores = engine.top_k_for_vector(query, k=2, tie_break=tie_break)
+    assert rows.tolist() == [1, 0]
+    assert scores[0] > scores[1]
+    (_, row_ids, _), = engine.iter_top_k_batch(query[None], k=2, tie_break=tie_break)
+    assert row_ids[0].tolist() == [1, 0]
+
+
+def test_equal_scores_ordered_by_popularity():
+    # Same genres (and a permutation with the same overlap): equal scores
+    rows = np.zeros((4, NUM_FLAGS), dtype=np.int8)
+    rows[:3, :3] = 1
+    rows[3, [0, 1, 5]] = 1  # Lower score: two shared flags of three
+    engine = GenreSimilarity(rows)
+    tie_break = popularity_tie_break(np.array([10, 90, 50, 100]))
+    found, scores = engine.top_k_for_vector(rows[0], k=4, tie_break=tie_break)
+    assert found.tolist() == [1, 2, 0, 3]
+    assert scores[0] == pytest.approx(scores[2])
+
+
+def test_without_tie_break_scores_descend():
+    matrix, _ = random_catalog(4)
+    engine = GenreSimilarity(matrix)
+    rows, scores = engine.top_k(0, k=K)
+    assert 0 not in rows
+    assert np.all(np.diff(scores) <= 0)
+    expected = sorted(exact_scores(matrix[1:], matrix[0]), reverse=True)[:K]
+    assert exact_scores(matrix, matrix[0])[rows].tolist() == expected